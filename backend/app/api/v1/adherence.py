@@ -25,6 +25,7 @@ from app.services.adherence_service import (
     apply_adherence_discount,
 )
 from app.services.adherence_reminder_service import send_refill_reminders
+from app.services import discount_tiers
 
 router = APIRouter(prefix="/adherence", tags=["adherence"])
 
@@ -182,6 +183,7 @@ def set_discount_cap(
         db.add(cap)
 
     db.commit()
+    discount_tiers.invalidate()
     return {"status": "updated"}
 
 
@@ -260,6 +262,7 @@ def create_program(
     program = AdherenceProgram(**body.model_dump())
     db.add(program)
     db.commit()
+    discount_tiers.invalidate()
     db.refresh(program)
     return program
 
@@ -277,6 +280,7 @@ def add_tier(
     )
     db.add(tier)
     db.commit()
+    discount_tiers.invalidate()
     db.refresh(tier)
     return tier
 
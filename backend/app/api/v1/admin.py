@@ -10,10 +10,8 @@ from app.core.database import get_db
 from app.core.deps import require_admin
 from app.models.user import User
 from app.models.order import Order
-from app.models.medication import Medication
-from app.models.pharmacy import Pharmacy
-from app.models.price import Price
 from app.models.scrape_run import ScrapeRun
+from app.services import stat_counters
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -23,8 +21,13 @@ def admin_stats(
     db: Session = Depends(get_db),
     _admin: User = Depends(require_admin),
 ):
-    total_users = db.query(func.count(User.id)).scalar() or 0
-    total_orders = db.query(func.count(Order.id)).scalar() or 0
+    """Dashboard cards from the counters snapshot (see ``stat_counters``).
+
+    Only ``orders_today`` is counted live, over the created_at index.
+    """
+    counters = stat_counters.get_snapshot(db)
+    total_orders = int(counters.get("orders_total"))
+    paid_count = int(counters.get("orders_paid"))
 
     today_start = datetime.now(timezone.utc).replace(
         hour=0, minute=0, second=0, microsecond=0
@@ -36,35 +39,19 @@ def admin_stats(
         or 0
     )
 
-    total_revenue = (
-        db.query(func.coalesce(func.sum(Order.total), 0))
-        .filter(Order.status.in_(["confirmed", "delivering", "completed"]))
-        .scalar()
-    )
-
-    paid_count = (
-        db.query(func.count(Order.id))
-        .filter(Order.status.in_(["confirmed", "delivering", "completed"]))
-        .scalar()
-        or 0
-    )
     payment_success_rate = (
         round(paid_count / total_orders * 100, 1) if total_orders > 0 else 0
     )
 
-    total_medications = db.query(func.count(Medication.id)).scalar() or 0
-    total_pharmacies = db.query(func.count(Pharmacy.id)).scalar() or 0
-    total_prices = db.query(func.count(Price.id)).scalar() or 0
-
     return {
-        "total_users": total_users,
+        "total_users": int(counters.get("users_total")),
         "total_orders": total_orders,
         "orders_today": orders_today,
-        "total_revenue": total_revenue,
+        "total_revenue": counters.get("orders_paid_revenue"),
         "payment_success_rate": payment_success_rate,
-        "total_medications": total_medications,
-        "total_pharmacies": total_pharmacies,
-        "total_prices": total_prices,
+        "total_medications": counters.row_estimates.get("medications", 0),
+        "total_pharmacies": counters.row_estimates.get("pharmacies", 0),
+        "total_prices": counters.row_estimates.get("prices", 0),
     }
 
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.services import analytics as svc
 from app.schemas.analytics import (
     DashboardSummary,
@@ -21,7 +21,7 @@ router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/summary", response_model=DashboardSummary)
-def dashboard_summary(db: Session = Depends(get_db)):
+def dashboard_summary(db: Session = Depends(get_read_db)):
     return svc.get_dashboard_summary(db)
 
 
@@ -29,12 +29,12 @@ def dashboard_summary(db: Session = Depends(get_db)):
 
 
 @router.get("/market-share", response_model=list[MarketShareItem])
-def market_share(market: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def market_share(market: Optional[str] = Query(None), db: Session = Depends(get_read_db)):
     return svc.get_market_share(db, market=market)
 
 
 @router.get("/trends", response_model=list[SalesTrendItem])
-def sales_trends(drug: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def sales_trends(drug: Optional[str] = Query(None), db: Session = Depends(get_read_db)):
     return svc.get_sales_trends(db, drug=drug)
 
 
@@ -42,18 +42,18 @@ def sales_trends(drug: Optional[str] = Query(None), db: Session = Depends(get_db
 def top_institutions(
     limit: int = Query(20, ge=1, le=100),
     region: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_top_institutions(db, limit=limit, region=region)
 
 
 @router.get("/regions", response_model=list[RegionalDistribution])
-def regional_distribution(db: Session = Depends(get_db)):
+def regional_distribution(db: Session = Depends(get_read_db)):
     return svc.get_regional_distribution(db)
 
 
 @router.get("/drug-prices", response_model=list[DrugPriceComparison])
-def drug_prices(drug: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def drug_prices(drug: Optional[str] = Query(None), db: Session = Depends(get_read_db)):
     return svc.get_drug_prices(db, drug=drug)
 
 
@@ -61,7 +61,7 @@ def drug_prices(drug: Optional[str] = Query(None), db: Session = Depends(get_db)
 
 
 @router.get("/cenabast/trends", response_model=list[CenabastTrendItem])
-def cenabast_trends(product: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def cenabast_trends(product: Optional[str] = Query(None), db: Session = Depends(get_read_db)):
     return svc.get_cenabast_trends(db, product=product)
 
 
@@ -69,7 +69,7 @@ def cenabast_trends(product: Optional[str] = Query(None), db: Session = Depends(
 def cenabast_top_pharmacies(
     limit: int = Query(20, ge=1, le=100),
     region: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_cenabast_top_pharmacies(db, limit=limit, region=region)
 
@@ -77,11 +77,11 @@ def cenabast_top_pharmacies(
 @router.get("/cenabast/top-products", response_model=list[CenabastTopProduct])
 def cenabast_top_products(
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_cenabast_top_products(db, limit=limit)
 
 
 @router.get("/cenabast/regions", response_model=list[CenabastRegionalItem])
-def cenabast_regional(db: Session = Depends(get_db)):
+def cenabast_regional(db: Session = Depends(get_read_db)):
     return svc.get_cenabast_regional(db)
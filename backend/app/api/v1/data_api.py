@@ -2,11 +2,11 @@ import csv
 import io
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.deps import get_api_key
 from app.services import analytics as svc
 
@@ -19,7 +19,7 @@ def get_prices(
     pharmacy: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.models.price import Price
     from app.models.medication import Medication
@@ -58,7 +58,7 @@ def get_prices(
 def get_market_share(
     market: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_market_share(db, market=market)
 
@@ -68,7 +68,7 @@ def get_procurement(
     region: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=200),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_top_institutions(db, limit=limit, region=region)
 
@@ -77,7 +77,7 @@ def get_procurement(
 def get_trends(
     drug: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_sales_trends(db, drug=drug)
 
@@ -87,7 +87,7 @@ def get_institutions(
     region: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=200),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_top_institutions(db, limit=limit, region=region)
 
@@ -95,7 +95,7 @@ def get_institutions(
 @router.get("/regions")
 def get_regions(
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_regional_distribution(db)
 
@@ -106,7 +106,7 @@ def get_forecasts(
     product: Optional[str] = Query(None),
     region: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.services.forecasting_service import get_upcoming_opportunities
     return get_upcoming_opportunities(db, days_ahead=days_ahead, product=product, region=region)
@@ -117,7 +117,7 @@ def get_market_share_trends(
     product: Optional[str] = Query(None),
     months: int = Query(24, ge=1, le=60),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.services.competitive_intel_service import get_market_share_trends as _get
     return _get(db, product=product, months=months)
@@ -127,7 +127,7 @@ def get_market_share_trends(
 def get_supplier_win_rates(
     supplier: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.services.competitive_intel_service import get_supplier_win_rates as _get
     return _get(db, supplier=supplier)
@@ -137,7 +137,7 @@ def get_supplier_win_rates(
 def get_new_entrants(
     lookback_months: int = Query(6, ge=1, le=24),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.services.competitive_intel_service import detect_new_entrants
     return detect_new_entrants(db, lookback_months=lookback_months)
@@ -148,7 +148,7 @@ def get_price_positioning(
     product: Optional[str] = Query(None),
     supplier: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from app.services.competitive_intel_service import get_price_positioning as _get
     return _get(db, product=product, supplier=supplier)
@@ -158,11 +158,29 @@ def get_price_positioning(
 def get_regional_heatmap(
     product: Optional[str] = Query(None),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     return svc.get_regional_demand_heatmap(db, product=product)
 
 
+@router.get("/regional-heatmap/geojson")
+def get_regional_heatmap_geojson(
+    request: Request,
+    level: str = Query("region", pattern="^(region|comuna)$"),
+    product: Optional[str] = Query(None),
+    org=Depends(get_api_key),
+    db: Session = Depends(get_db),
+):
+    """Pre-rendered demand heatmap as GeoJSON points, cacheable via ETag."""
+    from app.services.demand_grid import get_tile
+
+    etag, body = get_tile(db, level, product)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers, media_type="application/geo+json")
+
+
 @router.post("/export")
 def export_csv(
     dataset: str = Query(..., description="prices|market-share|procurement|trends|institutions|regions"),
@@ -171,7 +189,7 @@ def export_csv(
     region: Optional[str] = Query(None),
     limit: int = Query(1000, ge=1, le=10000),
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     data_map = {
         "market-share": lambda: svc.get_market_share(db, market=market),
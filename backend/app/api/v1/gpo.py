@@ -20,6 +20,7 @@ from app.schemas.gpo import (
 from app.services.gpo_service import (
     get_aggregated_demand,
     create_group_order_from_demand,
+    create_group_orders_for_month,
     update_group_order_status,
     get_group_savings,
     get_member_savings,
@@ -243,6 +244,20 @@ def create_order(
     return order
 
 
+@router.post("/groups/{slug}/orders/aggregate", response_model=list[GroupOrderOut])
+def aggregate_month(
+    slug: str,
+    target_month: str = Query(...),
+    threshold_only: bool = Query(True),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Create group orders for every product with demand in the month."""
+    group = _get_group(db, slug)
+    _require_admin(db, group.id, user)
+    return create_group_orders_for_month(db, str(group.id), target_month, threshold_only)
+
+
 @router.get("/groups/{slug}/orders", response_model=list[GroupOrderOut])
 def list_orders(slug: str, db: Session = Depends(get_db)):
     group = _get_group(db, slug)
@@ -1,15 +1,18 @@
+import base64
 import logging
+import uuid
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core.database import get_db, get_async_db
 from app.core.deps import get_current_user
 from app.models.user import User
 from app.models.order import Order, OrderStatus
 from app.models.order_item import OrderItem
-from app.models.medication import Medication
-from app.models.pharmacy import Pharmacy
 from app.schemas.order import OrderCreate, OrderOut
 from app.services.order_service import create_order
 from app.services.referral_service import track_event
@@ -38,13 +41,13 @@ class StatusUpdate(BaseModel):
 @router.post("/", response_model=OrderOut)
 async def create(
     body: OrderCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
     order = await create_order(db, str(user.id), user.phone_number, body)
 
-    track_event(
-        db,
+    await db.run_sync(
+        track_event,
         ReferralEventType.order_created,
         user_id=str(user.id),
         pharmacy_id=str(body.pharmacy_id),
@@ -87,23 +90,33 @@ def get_order(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    """Get order with full details including items, pharmacy, and medication names."""
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
+    """Get order with full details including items, pharmacy, and medication names.
+
+    Two queries whatever the cart size: the order joined to its pharmacy,
+    then its items joined to their medications.
+    """
+    order = (
+        db.query(Order)
+        .options(
+            joinedload(Order.pharmacy),
+            selectinload(Order.items).joinedload(OrderItem.medication),
+        )
+        .filter(Order.id == order_id, Order.user_id == user.id)
+        .first()
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    pharmacy = db.query(Pharmacy).filter(Pharmacy.id == order.pharmacy_id).first()
-
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    items_out = []
-    for item in items:
-        med = db.query(Medication).filter(Medication.id == item.medication_id).first()
-        items_out.append({
+    pharmacy = order.pharmacy
+    items_out = [
+        {
             "medication_id": str(item.medication_id),
-            "medication_name": med.name if med else "Unknown",
+            "medication_name": item.medication.name if item.medication else "Unknown",
             "quantity": item.quantity,
             "subtotal": item.subtotal,
-        })
+        }
+        for item in order.items
+    ]
 
     return {
         "id": str(order.id),
@@ -127,10 +140,10 @@ def get_order(
 async def update_order_status(
     order_id: str,
     body: StatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update order status (admin endpoint). Validates transitions and sends WhatsApp notifications."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -147,10 +160,10 @@ async def update_order_status(
         )
 
     order.status = new_status
-    db.commit()
+    await db.commit()
 
     # Send WhatsApp notification
-    user = db.query(User).filter(User.id == order.user_id).first()
+    user = await db.get(User, order.user_id)
     if user:
         try:
             status_map = {
@@ -171,26 +184,54 @@ async def update_order_status(
     }
 
 
+def _encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/admin/all")
 def list_all_orders(
+    response: Response,
     db: Session = Depends(get_db),
     status: str | None = Query(None),
     limit: int = Query(50, ge=1, le=200),
+    before: str | None = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
 ):
-    """List all orders (admin). Optionally filter by status."""
-    query = db.query(Order).order_by(Order.created_at.desc())
+    """List all orders (admin), newest first. Optionally filter by status.
+
+    Keyset-paginated on (created_at, id): pass the ``X-Next-Cursor`` response
+    header back as ``before`` for the next page.
+    """
+    query = (
+        db.query(Order)
+        .options(joinedload(Order.pharmacy))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
     if status:
         try:
             status_enum = OrderStatus(status)
             query = query.filter(Order.status == status_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    if before:
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(*_decode_cursor(before)))
     orders = query.limit(limit).all()
+    if len(orders) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(orders[-1])
     return [
         {
             "id": str(o.id),
             "user_id": str(o.user_id),
             "pharmacy_id": str(o.pharmacy_id),
+            "pharmacy_name": o.pharmacy.name if o.pharmacy else None,
             "status": o.status.value if o.status else "pending",
             "payment_provider": o.payment_provider.value if o.payment_provider else None,
             "payment_status": o.payment_status,
@@ -204,10 +245,10 @@ def list_all_orders(
 @router.patch("/{order_id}/confirm-payment")
 async def confirm_payment(
     order_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Admin: confirm bank transfer payment."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status != OrderStatus.pending_transfer:
@@ -215,9 +256,9 @@ async def confirm_payment(
 
     order.status = OrderStatus.confirmed
     order.payment_status = "verified"
-    db.commit()
+    await db.commit()
 
-    user = db.query(User).filter(User.id == order.user_id).first()
+    user = await db.get(User, order.user_id)
     if user:
         try:
             await whatsapp.send_payment_confirmed(user.phone_number, str(order.id))
@@ -230,10 +271,10 @@ async def confirm_payment(
 @router.patch("/{order_id}/reject-payment")
 async def reject_payment(
     order_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Admin: reject bank transfer (cancel order)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status != OrderStatus.pending_transfer:
@@ -241,6 +282,6 @@ async def reject_payment(
 
     order.status = OrderStatus.cancelled
     order.payment_status = "rejected"
-    db.commit()
+    await db.commit()
 
     return {"id": str(order.id), "status": "cancelled", "message": "Payment rejected"}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -8,7 +8,7 @@ from app.models.price_alert import PriceAlert
 from app.models.medication import Medication
 from app.schemas.premium import (
     PriceAlertCreate, PriceAlertOut,
-    PriceHistoryItem, GenericAlternative,
+    PriceHistoryItem, PriceTrendItem, GenericAlternative,
     UserSubscriptionOut, PremiumCheckoutRequest,
 )
 from app.services import premium_service
@@ -125,10 +125,22 @@ def delete_alert(
 @router.get("/price-history/{medication_id}", response_model=list[PriceHistoryItem])
 def price_history(
     medication_id: str,
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    days: int = Query(90, ge=1, le=730),
     user: User = Depends(require_premium_user),
     db: Session = Depends(get_db),
 ):
-    return premium_service.get_price_history(db, medication_id)
+    return premium_service.get_price_history(db, medication_id, bucket=bucket, days=days)
+
+
+@router.get("/price-trend/{medication_id}", response_model=list[PriceTrendItem])
+def price_trend(
+    medication_id: str,
+    days: int = Query(90, ge=1, le=730),
+    user: User = Depends(require_premium_user),
+    db: Session = Depends(get_db),
+):
+    return premium_service.get_price_trend(db, medication_id, days=days)
 
 
 @router.get("/generics/{medication_id}", response_model=list[GenericAlternative])
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.deps import get_api_key
 from app.schemas.report import ReportExecuteRequest, SavedReportCreate, SavedReportOut
 from app.services.report_service import (
@@ -20,7 +20,7 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 def execute(
     body: ReportExecuteRequest,
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     config = {
         "dataset": body.dataset,
@@ -36,7 +36,7 @@ def execute(
 def execute_csv(
     body: ReportExecuteRequest,
     org=Depends(get_api_key),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     config = {
         "dataset": body.dataset,
@@ -1,22 +1,25 @@
-import asyncio
-
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from app.core.deps import get_db
+from app.core.deps import get_db, require_admin
+from app.models.background_job import BackgroundJob
+from app.models.job_run import JobRun
 from app.models.scrape_run import ScrapeRun
+from app.models.user import User
+from app.tasks import job_queue
 
 router = APIRouter(prefix="/scraping", tags=["scraping"])
 
 
 @router.post("/run")
-async def trigger_scrape(
+def trigger_scrape(
     chains: list[str] | None = Query(None),
     query_limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
 ):
-    """Trigger a scraping run in background via asyncio task."""
-    from app.tasks.scraping import run_scrape_with_session
-    asyncio.create_task(run_scrape_with_session(chains, query_limit))
-    return {"status": "started", "chains": chains or ["all"], "query_limit": query_limit}
+    """Queue a scraping run for the worker process."""
+    job = job_queue.enqueue(db, "scrape", {"chains": chains, "query_limit": query_limit}, dedupe=True)
+    return {"status": "queued", "job_id": str(job.id), "chains": chains or ["all"], "query_limit": query_limit}
 
 
 @router.get("/runs")
@@ -67,26 +70,26 @@ def get_scrape_run(run_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/locations")
-async def trigger_location_scrape(
+def trigger_location_scrape(
     chains: list[str] | None = Query(None),
+    db: Session = Depends(get_db),
 ):
-    """Trigger a location scraping run in background."""
-    from app.tasks.scraping import run_location_scrape_with_session
-    asyncio.create_task(run_location_scrape_with_session(chains))
-    return {"status": "started", "type": "locations", "chains": chains or ["all"]}
+    """Queue a location scraping run for the worker process."""
+    job = job_queue.enqueue(db, "locations", {"chains": chains}, dedupe=True)
+    return {"status": "queued", "job_id": str(job.id), "type": "locations", "chains": chains or ["all"]}
 
 
 @router.post("/catalog")
-async def trigger_catalog_scrape(
+def trigger_catalog_scrape(
     chains: list[str] | None = Query(None),
+    db: Session = Depends(get_db),
 ):
-    """Trigger a full catalog scraping run in background.
+    """Queue a full catalog scraping run for the worker process.
 
     Browses the entire Medicamentos category for each chain.
     """
-    from app.tasks.scraping import run_catalog_scrape_with_session
-    asyncio.create_task(run_catalog_scrape_with_session(chains))
-    return {"status": "started", "type": "catalog", "chains": chains or ["all"]}
+    job = job_queue.enqueue(db, "catalog", {"chains": chains}, dedupe=True)
+    return {"status": "queued", "job_id": str(job.id), "type": "catalog", "chains": chains or ["all"]}
 
 
 @router.get("/schedule")
@@ -102,6 +105,7 @@ def get_schedule(db: Session = Depends(get_db)):
         "schedule": {
             "catalog_scrape": "Daily at 3:00 AM UTC",
             "price_alerts": "Every 6 hours",
+            "adherence_sweeps": "Daily at 9:00 AM UTC",
         },
         "last_run": {
             "id": str(last_run.id),
@@ -111,3 +115,115 @@ def get_schedule(db: Session = Depends(get_db)):
             "finished_at": str(last_run.finished_at) if last_run.finished_at else None,
         } if last_run else None,
     }
+
+
+@router.get("/job-runs")
+def list_job_runs(
+    db: Session = Depends(get_db),
+    job_name: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Recent scheduled job executions with their timings."""
+    q = db.query(JobRun)
+    if job_name:
+        q = q.filter(JobRun.job_name == job_name)
+    runs = q.order_by(JobRun.started_at.desc()).limit(limit).all()
+    return [
+        {
+            "id": str(r.id),
+            "job_name": r.job_name,
+            "status": r.status,
+            "host": r.host,
+            "started_at": str(r.started_at),
+            "finished_at": str(r.finished_at) if r.finished_at else None,
+            "duration_ms": r.duration_ms,
+            "error": r.error,
+        }
+        for r in runs
+    ]
+
+
+# ── Job queue ──
+
+class JobCreate(BaseModel):
+    job_type: str
+    params: dict = {}
+
+
+def _job_out(job: BackgroundJob, run: ScrapeRun | None = None) -> dict:
+    return {
+        "id": str(job.id),
+        "job_type": job.job_type,
+        "params": job.params,
+        "status": job.status,
+        "attempts": job.attempts,
+        "worker": job.worker,
+        "cancel_requested": job.cancel_requested,
+        "scrape_run_id": str(job.scrape_run_id) if job.scrape_run_id else None,
+        "progress": {
+            "queries_total": run.queries_total,
+            "queries_completed": run.queries_completed,
+            "products_found": run.products_found,
+        } if run else None,
+        "result": job.result,
+        "error": job.error,
+        "created_at": str(job.created_at),
+        "started_at": str(job.started_at) if job.started_at else None,
+        "finished_at": str(job.finished_at) if job.finished_at else None,
+    }
+
+
+@router.post("/jobs")
+def create_job(
+    body: JobCreate,
+    db: Session = Depends(get_db),
+    _admin: User = Depends(require_admin),
+):
+    """Queue any job type (imports, Cenabast sync, geocoding, scrapes)."""
+    try:
+        job = job_queue.enqueue(db, body.job_type, body.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _job_out(job)
+
+
+@router.get("/jobs")
+def list_jobs(
+    db: Session = Depends(get_db),
+    status: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Recent queued, running and finished jobs, with scrape progress."""
+    q = db.query(BackgroundJob, ScrapeRun).outerjoin(
+        ScrapeRun, ScrapeRun.id == BackgroundJob.scrape_run_id
+    )
+    if status:
+        q = q.filter(BackgroundJob.status == status)
+    rows = q.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+    return [_job_out(job, run) for job, run in rows]
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    row = db.query(BackgroundJob, ScrapeRun).outerjoin(
+        ScrapeRun, ScrapeRun.id == BackgroundJob.scrape_run_id
+    ).filter(BackgroundJob.id == job_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(*row)
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    _admin: User = Depends(require_admin),
+):
+    """Cancel a queued job, or ask the worker to stop a running one."""
+    try:
+        job = job_queue.request_cancel(db, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
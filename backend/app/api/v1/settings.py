@@ -6,20 +6,16 @@ from app.core.database import get_db
 from app.core.deps import require_admin
 from app.models.site_setting import SiteSetting
 from app.models.user import User
+from app.services import site_settings
+from app.services.site_settings import BANK_KEYS
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
-BANK_KEYS = [
-    "bank_name", "bank_account_type", "bank_account_number",
-    "bank_rut", "bank_holder_name", "bank_email",
-]
-
 
 @router.get("/bank-details")
 def get_bank_details(db: Session = Depends(get_db)):
     """Public endpoint — needed at checkout and order detail."""
-    rows = db.query(SiteSetting).filter(SiteSetting.key.in_(BANK_KEYS)).all()
-    return {row.key: row.value for row in rows}
+    return site_settings.get_bank_details(db)
 
 
 class BankDetailsUpdate(BaseModel):
@@ -46,4 +42,5 @@ def update_bank_details(
         else:
             db.add(SiteSetting(key=key, value=value))
     db.commit()
+    site_settings.invalidate()
     return {"status": "ok"}
@@ -1,16 +1,18 @@
+import asyncio
 import hashlib
 import hmac
+import json
 import logging
 
 import mercadopago
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.order import Order, OrderStatus
 from app.models.user import User
-from app.services import whatsapp
+from app.services import inbound_queue, whatsapp
 from app.services.commission_service import record_commission
 from app.services.adherence_service import record_refill_from_order
 
@@ -22,20 +24,20 @@ router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 # ── WhatsApp incoming (from ServiceTsunami / OpenClaw) ───────────────
 
 @router.post("/whatsapp")
-async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
+async def whatsapp_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Receive incoming WhatsApp messages forwarded by ServiceTsunami.
 
     OpenClaw receives the WhatsApp Cloud API webhook, parses the message,
-    and forwards it here so Remedia can handle domain-specific logic
-    (medication search, order status, etc.).
+    and forwards it here. Messages are stored (deduplicated on message id)
+    and acknowledged immediately; the inbound worker handles the
+    domain-specific logic (medication search, order status, etc.).
     """
-    body = await request.json()
+    raw = await request.body()
 
     # Verify webhook signature if configured
     if settings.PHARMAPP_WEBHOOK_SECRET:
         signature = request.headers.get("X-Webhook-Signature", "")
-        raw = await request.body()
         expected = hmac.new(
             settings.PHARMAPP_WEBHOOK_SECRET.encode(), raw, hashlib.sha256
         ).hexdigest()
@@ -43,31 +45,12 @@ async def whatsapp_webhook(request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=401, detail="Invalid signature")
 
     # WhatsApp Cloud API format (forwarded by OpenClaw)
-    entries = body.get("entry", [])
-    for entry in entries:
-        for change in entry.get("changes", []):
-            value = change.get("value", {})
-            messages = value.get("messages", [])
-            for msg in messages:
-                sender_phone = msg.get("from", "")
-                message_body = msg.get("text", {}).get("body", "")
-                message_id = msg.get("id", "")
-                message_type = msg.get("type", "text")
-
-                if not sender_phone or not message_body:
-                    continue
-
-                logger.info("WhatsApp from %s: %s", sender_phone, message_body[:100])
-
-                # Route to conversational handler
-                try:
-                    await whatsapp.handle_incoming_message(
-                        sender_phone=sender_phone,
-                        message_body=message_body,
-                        message_id=message_id,
-                    )
-                except Exception:
-                    logger.exception("Error handling WhatsApp from %s", sender_phone)
+    messages = inbound_queue.parse_webhook(json.loads(raw or b"{}"))
+    if messages:
+        queued = await db.run_sync(inbound_queue.enqueue_many, messages)
+        await db.commit()
+        inbound_queue.notify()
+        logger.info("WhatsApp webhook: %d messages, %d new", len(messages), queued)
 
     return {"status": "ok"}
 
@@ -104,7 +87,7 @@ def _fetch_mp_payment(payment_id: str) -> dict | None:
 
 
 @router.post("/mercadopago")
-async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
+async def mercadopago_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     body = await request.json()
     if body.get("type") != "payment":
         return {"status": "ok"}
@@ -116,7 +99,7 @@ async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
         return {"status": "ok"}
 
     # Verify payment via MercadoPago API
-    payment = _fetch_mp_payment(str(payment_id))
+    payment = await asyncio.to_thread(_fetch_mp_payment, str(payment_id))
     if not payment:
         logger.error("Could not verify MercadoPago payment %s", payment_id)
         return {"status": "ok"}
@@ -128,7 +111,7 @@ async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
         logger.warning("MercadoPago payment %s has no external_reference", payment_id)
         return {"status": "ok"}
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         logger.warning("Order not found for MercadoPago payment: %s", order_id)
         return {"status": "ok"}
@@ -136,19 +119,19 @@ async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
     if mp_status == "approved":
         order.status = OrderStatus.confirmed
         order.payment_status = "approved"
-        db.commit()
+        await db.commit()
 
         # Record commission
-        record_commission(db, order)
+        await db.run_sync(record_commission, order)
 
         # Record adherence refill
         try:
-            record_refill_from_order(db, order)
+            await db.run_sync(record_refill_from_order, order)
         except Exception:
             logger.exception("Error recording refill for order %s", order.id)
 
         # Notify user via WhatsApp
-        user = db.query(User).filter(User.id == order.user_id).first()
+        user = await db.get(User, order.user_id)
         if user:
             try:
                 await whatsapp.send_payment_confirmed(
@@ -160,11 +143,11 @@ async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
     elif mp_status == "rejected":
         order.status = OrderStatus.cancelled
         order.payment_status = "rejected"
-        db.commit()
+        await db.commit()
 
     elif mp_status in ("pending", "in_process"):
         order.payment_status = mp_status
-        db.commit()
+        await db.commit()
 
     else:
         logger.info("MercadoPago payment %s status: %s", payment_id, mp_status)
@@ -175,7 +158,7 @@ async def mercadopago_webhook(request: Request, db: Session = Depends(get_db)):
 # ── Transbank Webpay ─────────────────────────────────────────────────
 
 @router.post("/transbank")
-async def transbank_webhook(request: Request, db: Session = Depends(get_db)):
+async def transbank_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Handle Transbank return_url redirect (POST with token_ws)."""
     from transbank.webpay.webpay_plus.transaction import Transaction
 
@@ -187,26 +170,26 @@ async def transbank_webhook(request: Request, db: Session = Depends(get_db)):
         return RedirectResponse(url=f"{frontend_url}/?error=transbank_no_token", status_code=303)
 
     tx = Transaction()
-    resp = tx.commit(token)
+    resp = await asyncio.to_thread(tx.commit, token)
 
     buy_order = resp.get("buy_order", "")
-    order = db.query(Order).filter(Order.id == buy_order).first() if buy_order else None
+    order = await db.get(Order, buy_order) if buy_order else None
 
     if resp.get("status") == "AUTHORIZED" and order:
         order.status = OrderStatus.confirmed
         order.payment_status = "authorized"
-        db.commit()
+        await db.commit()
 
         # Record commission
-        record_commission(db, order)
+        await db.run_sync(record_commission, order)
 
         # Record adherence refill
         try:
-            record_refill_from_order(db, order)
+            await db.run_sync(record_refill_from_order, order)
         except Exception:
             logger.exception("Error recording refill for order %s", order.id)
 
-        user = db.query(User).filter(User.id == order.user_id).first()
+        user = await db.get(User, order.user_id)
         if user:
             try:
                 await whatsapp.send_payment_confirmed(
@@ -221,7 +204,7 @@ async def transbank_webhook(request: Request, db: Session = Depends(get_db)):
     else:
         if order:
             order.payment_status = resp.get("status", "failed")
-            db.commit()
+            await db.commit()
         return RedirectResponse(
             url=f"{frontend_url}/orders/{buy_order}?status=failure", status_code=303
         )
@@ -2,6 +2,20 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/pharmapp"
+    # Async (asyncpg) URL; derived from DATABASE_URL when empty
+    ASYNC_DATABASE_URL: str = ""
+
+    # Connection pool (applied to both the sync and async engines)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 = no timeout (ETL imports run long)
+
+    # Read replica for analytics / transparency / data API reads (optional)
+    DATABASE_REPLICA_URL: str = ""
+    DB_REPLICA_MAX_LAG_SECONDS: int = 30
+    DB_REPLICA_LAG_CHECK_SECONDS: int = 10
     SECRET_KEY: str = "dev-secret-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 1440
@@ -17,12 +31,51 @@ class Settings(BaseSettings):
     PHARMAPP_WEBHOOK_URL: str = "http://localhost:8000/api/v1/webhooks/whatsapp"
     PHARMAPP_WEBHOOK_SECRET: str = ""
 
+    # Outbound WhatsApp queue (app.services.outbound_queue)
+    OUTBOUND_WORKER_ENABLED: bool = True
+    OUTBOUND_CONCURRENCY: int = 8
+    OUTBOUND_POLL_SECONDS: float = 2.0
+    OUTBOUND_MAX_ATTEMPTS: int = 6
+    OUTBOUND_RETRY_BASE_SECONDS: int = 30
+
+    # Inbound WhatsApp processing (app.services.inbound_queue)
+    INBOUND_WORKER_ENABLED: bool = True
+    INBOUND_CONCURRENCY: int = 8  # distinct senders handled at once
+    INBOUND_POLL_SECONDS: float = 1.0
+    INBOUND_MAX_ATTEMPTS: int = 3
+
+    # Buffered funnel-event ingestion (app.services.event_ingest)
+    EVENT_BUFFER_ENABLED: bool = True
+    EVENT_BUFFER_CAPACITY: int = 10000  # producers write inline beyond this
+    EVENT_FLUSH_SECONDS: float = 1.0
+    EVENT_FLUSH_BATCH: int = 1000
+
+    # Scheduled jobs (app.tasks.scheduler), normally run by `python -m app.worker`
+    SCHEDULER_IN_API: bool = False  # single-process setups: run the scheduler in the API
+    SCHEDULER_LEADER_CHECK_SECONDS: int = 30
+
+    # Scrape/ETL job queue (app.tasks.job_queue), run by `python -m app.worker`
+    JOB_WORKER_SLOTS: int = 2  # jobs run at once per worker process
+    JOB_POLL_SECONDS: float = 5.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_HEARTBEAT_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 2  # a job is retried only if its worker dies
+
     # Payments
     MERCADOPAGO_ACCESS_TOKEN: str = ""
     TRANSBANK_COMMERCE_CODE: str = ""
     TRANSBANK_API_KEY: str = ""
     GOOGLE_MAPS_API_KEY: str = ""
 
+    # Pharmacy geocoding (app.etl.geocode_pharmacies)
+    GEOCODER_PROVIDER: str = "nominatim"  # nominatim | gazetteer
+    GEOCODER_URL: str = "https://nominatim.openstreetmap.org/search"
+    GEOCODER_CONCURRENCY: int = 1  # raise for a self-hosted Nominatim
+    GEOCODER_RATE_LIMIT_SECONDS: float = 1.1  # public Nominatim: max 1 req/sec
+    GEOCODER_GAZETTEER_PATH: str = ""  # CSV with address,lat,lng columns
+    GEOCODE_CACHE_TTL_DAYS: int = 180
+    GEOCODE_NEGATIVE_TTL_DAYS: int = 30
+
     # Backend public URL (for webhook notification URLs — must be reachable by payment providers)
     BACKEND_PUBLIC_URL: str = "http://localhost:8000"
 
@@ -1,13 +1,126 @@
-from sqlalchemy import create_engine
+import logging
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+
+def _async_url(url: str) -> str:
+    """Swap the sync driver for asyncpg, keeping the rest of the URL."""
+    scheme, rest = url.split("://", 1)
+    return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgresql") else url
+
+
+_pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+}
+
+_timeout = settings.DB_STATEMENT_TIMEOUT_MS
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args={"options": f"-c statement_timeout={_timeout}"} if _timeout else {},
+    **_pool_options,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or _async_url(settings.DATABASE_URL),
+    connect_args={"server_settings": {"statement_timeout": str(_timeout)}} if _timeout else {},
+    **_pool_options,
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+)
+
+# Optional read replica. Read-only reporting routes use get_read_db, which
+# falls back to the primary when no replica is configured, it is unreachable,
+# or its replay lag exceeds DB_REPLICA_MAX_LAG_SECONDS.
+replica_engine = (
+    create_engine(
+        settings.DATABASE_REPLICA_URL,
+        connect_args={"options": f"-c statement_timeout={_timeout}"} if _timeout else {},
+        **_pool_options,
+    )
+    if settings.DATABASE_REPLICA_URL else None
+)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else SessionLocal
+)
+
+# Lag is zero while the standby has replayed everything it received, so a
+# quiet primary (old last-replay timestamp) does not read as lagging. A
+# standalone database (not in recovery) also reports zero lag.
+_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+# Tables the replica-routed reports read; a replica missing any is unhealthy
+REPLICA_REQUIRED_TABLES = ("medications", "pharmacies", "prices", "cenabast_invoices", "bms_distributions")
+_MISSING_TABLES_SQL = text(
+    "SELECT t FROM unnest(CAST(:tables AS text[])) AS t WHERE to_regclass(t) IS NULL"
+)
+_replica_state = {"checked_at": 0.0, "healthy": False}
+
+
+def replica_healthy() -> bool:
+    """Whether the replica is reachable and within the allowed lag (cached)."""
+    if replica_engine is None:
+        return False
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < settings.DB_REPLICA_LAG_CHECK_SECONDS:
+        return _replica_state["healthy"]
+
+    healthy = False
+    try:
+        with replica_engine.connect() as conn:
+            missing = conn.execute(_MISSING_TABLES_SQL, {"tables": list(REPLICA_REQUIRED_TABLES)}).scalars().all()
+            lag = float(conn.execute(_LAG_SQL).scalar() or 0)
+        if missing:
+            logger.warning("Replica is missing tables %s, reading from primary", ", ".join(missing))
+        else:
+            healthy = lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+            if not healthy:
+                logger.warning("Replica lag %.1fs over limit, reading from primary", lag)
+    except Exception:
+        logger.warning("Replica unavailable, reading from primary", exc_info=True)
+
+    _replica_state.update(checked_at=now, healthy=healthy)
+    return healthy
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Session for read-only reporting queries, routed to the replica when healthy."""
+    db = ReadSessionLocal() if replica_healthy() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Async counterpart of ``get_db`` for ``async def`` routes.
+
+    Sync service code can still run on this session through
+    ``await db.run_sync(fn, *args)``.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,184 @@
+"""In-process metrics rendered in Prometheus text format at ``/metrics``.
+
+Values live in this worker's memory (like the rate limiter windows), so each
+uvicorn worker exposes its own series; scrape every worker or run one.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_lock = threading.Lock()
+_registry: list["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: dict[tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        for key, state in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, state["counts"]):
+                le = _format_labels(self.labels, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {count}")
+            le = _format_labels(self.labels, key, 'le="+Inf"')
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_bucket{le} {state['count']}")
+            lines.append(f"{self.name}_sum{labels} {state['sum']}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+@contextmanager
+def timer(histogram: Histogram, **labels):
+    """Observe the wall time of the ``with`` block in ``histogram``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def render() -> str:
+    with _lock:
+        lines = [line for metric in _registry for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP ---
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+db_queries_per_request = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+)
+db_time_per_request = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request",
+    ("method", "route"),
+)
+
+# --- Scrapers ---
+
+scraper_fetch_duration = Histogram(
+    "scraper_fetch_seconds", "Scraper HTTP fetch time (including retries)", ("chain",),
+)
+scraper_parse_duration = Histogram(
+    "scraper_parse_seconds", "Scraper response parse time", ("chain",),
+)
+
+# --- ETL ---
+
+etl_stage_duration = Gauge(
+    "etl_stage_duration_seconds", "Duration of the last run of an ETL stage", ("pipeline", "stage"),
+)
+etl_stage_rows = Gauge(
+    "etl_stage_rows", "Rows handled by the last run of an ETL stage", ("pipeline", "stage"),
+)
+etl_stage_last_success = Gauge(
+    "etl_stage_last_success_timestamp_seconds", "Unix time the ETL stage last succeeded",
+    ("pipeline", "stage"),
+)
+
+
+@contextmanager
+def etl_stage(pipeline: str, stage: str):
+    """Record duration and last-success time of an ETL stage.
+
+    The yielded dict takes an optional ``rows`` count.
+    """
+    info = {"rows": None}
+    start = time.perf_counter()
+    yield info
+    etl_stage_duration.set(round(time.perf_counter() - start, 3), pipeline=pipeline, stage=stage)
+    etl_stage_last_success.set(int(time.time()), pipeline=pipeline, stage=stage)
+    if info["rows"] is not None:
+        etl_stage_rows.set(info["rows"], pipeline=pipeline, stage=stage)
+
+
+# --- Per-request SQL accounting ---
+
+# Set by MetricsMiddleware; sync routes see it too because Starlette copies
+# the context into its threadpool.
+request_db_stats: ContextVar[dict | None] = ContextVar("request_db_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["seconds"] += elapsed
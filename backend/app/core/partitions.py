@@ -0,0 +1,68 @@
+"""Helpers for tables range-partitioned by calendar month.
+
+Partitions are named ``<table>_YYYY_MM`` and created on demand. Every
+partitioned table also gets a ``<table>_default`` catch-all so an insert
+never fails because the month partition was not created in time.
+
+Ensured months are remembered per process, but only once the transaction
+that created them commits; a rollback forgets them so they are created again.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# (table, month) pairs ensured by committed transactions in this process
+_known: set[tuple[str, date]] = set()
+
+_PENDING_KEY = "partitions_pending"
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_pending(session: Session) -> None:
+    _known.update(session.info.pop(_PENDING_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    idx = month.year * 12 + (month.month - 1) + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def ensure_monthly_partition(db: Session, table: str, month: date | datetime) -> str:
+    """Create the partition of *table* covering *month* if it does not exist."""
+    start = month_start(month)
+    name = partition_name(table, start)
+    pending = db.info.setdefault(_PENDING_KEY, set())
+    if (table, start) in _known or (table, start) in pending:
+        return name
+
+    end = add_months(start, 1)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    pending.add((table, start))
+    return name
+
+
+def ensure_monthly_partitions(
+    db: Session, table: str, months_back: int = 1, months_ahead: int = 2
+) -> None:
+    """Ensure the default partition plus a window of month partitions around today."""
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+    current = month_start(date.today())
+    for n in range(-months_back, months_ahead + 1):
+        ensure_monthly_partition(db, table, add_months(current, n))
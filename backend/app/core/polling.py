@@ -0,0 +1,35 @@
+"""Shared loop for the in-process queue workers (outbound/inbound WhatsApp)."""
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def poll_loop(
+    name: str,
+    process_batch: Callable[[], Awaitable[int]],
+    stop: asyncio.Event,
+    wakeup: asyncio.Event,
+    interval: float,
+) -> None:
+    """Run ``process_batch`` until ``stop`` is set.
+
+    Busy batches loop immediately; when a batch finds nothing the loop sleeps
+    for ``interval`` seconds or until ``wakeup`` is set by an enqueuer.
+    """
+    logger.info("%s worker started", name)
+    while not stop.is_set():
+        try:
+            handled = await process_batch()
+        except Exception:
+            logger.exception("%s worker batch failed", name)
+            handled = 0
+        if handled:
+            continue
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("%s worker stopped", name)
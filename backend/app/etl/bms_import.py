@@ -8,6 +8,7 @@ re-imports: each run truncates the target BMS tables before inserting.
 Usage:
     python -m app.etl.bms_import                         # default path
     python -m app.etl.bms_import /path/to/report.xlsx    # custom path
+    python -m app.etl.bms_import --rollups-only          # rebuild rollups only
 """
 
 import os
@@ -28,6 +29,9 @@ from app.models.bms_distribution import BmsDistribution
 from app.models.bms_institution import BmsInstitution
 from app.models.bms_purchase_order import BmsPurchaseOrder
 from app.models.medication import Medication
+from app.services.competitive_intel_service import refresh_rollups
+from app.services.demand_grid import prerender_tiles, refresh_demand_grid
+from app.services.stat_counters import refresh_source_counters
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -36,6 +40,11 @@ from app.models.medication import Medication
 BATCH_SIZE = 1000
 PROGRESS_EVERY = 5000
 
+# backend/data/bms_report.xlsx (app/etl/bms_import.py → ../../data/bms_report.xlsx)
+DEFAULT_FILE = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "data", "bms_report.xlsx")
+)
+
 DATE_FORMATS = [
     "%Y-%m-%d",
     "%d-%m-%Y",
@@ -494,10 +503,12 @@ def import_adjudications(db: Session, wb) -> int:
 # ---------------------------------------------------------------------------
 
 
-def import_all(file_path: str) -> None:
+def import_all(file_path: Optional[str] = None) -> None:
     """Open the BMS Excel workbook, connect to the database, and import all
     sheets in order.  The entire import runs inside a single transaction.
+    ``file_path`` defaults to ``DEFAULT_FILE``.
     """
+    file_path = file_path or DEFAULT_FILE
     print(f"Opening workbook: {file_path}")
     wb = load_workbook(file_path, read_only=True, data_only=True)
     print(f"  Sheets found: {wb.sheetnames}")
@@ -515,7 +526,14 @@ def import_all(file_path: str) -> None:
         n_po = import_purchase_orders(db, wb)
         n_adj = import_adjudications(db, wb)
 
+        print("Refreshing competitive-intel rollups …")
+        refresh_rollups(db)
+        print("Refreshing demand grid …")
+        refresh_demand_grid(db, "bms")
+        refresh_source_counters(db, "bms")
+
         db.commit()
+        prerender_tiles(db)
         print("\n--- Import Summary ---")
         print(
             f"Imported {n_inst} institutions, {n_dist} distribution records, "
@@ -534,15 +552,26 @@ def import_all(file_path: str) -> None:
 # CLI entry-point
 # ---------------------------------------------------------------------------
 
+def refresh_rollups_only() -> None:
+    """Rebuild the competitive-intel rollups and demand grid from already-imported data."""
+    db: Session = SessionLocal()
+    try:
+        refresh_rollups(db)
+        refresh_demand_grid(db, "bms")
+        refresh_source_counters(db, "bms")
+        db.commit()
+        prerender_tiles(db)
+        print("Competitive-intel rollups and demand grid refreshed.")
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        path = sys.argv[1]
-    else:
-        # Default: backend/data/bms_report.xlsx relative to this file's
-        # location (app/etl/bms_import.py → ../../data/bms_report.xlsx)
-        here = os.path.dirname(os.path.abspath(__file__))
-        path = os.path.join(here, os.pardir, os.pardir, "data", "bms_report.xlsx")
-        path = os.path.normpath(path)
+    if sys.argv[1:] == ["--rollups-only"]:
+        refresh_rollups_only()
+        sys.exit(0)
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE
 
     if not os.path.isfile(path):
         print(f"File not found: {path}")
@@ -27,6 +27,8 @@ from app.core.database import SessionLocal, engine
 from app.models import Base
 from app.models.cenabast_product import CenabastProduct
 from app.models.cenabast_invoice import CenabastInvoice
+from app.services.demand_grid import prerender_tiles, refresh_demand_grid
+from app.services.stat_counters import refresh_source_counters
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -538,10 +540,16 @@ def import_all(
 
         if os.path.isfile(invoices_path):
             n_invoices = import_cenabast_invoices(db, invoices_path)
+            n_cells = refresh_demand_grid(db, "cenabast")
             db.commit()
+            prerender_tiles(db)
+            print(f"  [OK] Demand grid: {n_cells} cells")
         else:
             print(f"[SKIP] Invoices file not found: {invoices_path}")
 
+        refresh_source_counters(db, "cenabast")
+        db.commit()
+
         print("\n--- Import Summary ---")
         print(f"Imported {n_products} products, {n_active} active PMVP, {n_invoices} invoices")
     except Exception:
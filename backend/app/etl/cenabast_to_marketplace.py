@@ -8,21 +8,31 @@ Usage:
     python -m app.etl.cenabast_to_marketplace
 """
 
-import re
+import uuid
 from collections import defaultdict
+from datetime import datetime, timezone
 from sqlalchemy import func, distinct, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from geoalchemy2.elements import WKTElement
 
 from app.core.database import SessionLocal, engine
+from app.core.metrics import etl_stage
 from app.models import Base
 from app.models.medication import Medication
 from app.models.pharmacy import Pharmacy
 from app.models.price import Price
 from app.models.cenabast_product import CenabastProduct
 from app.models.cenabast_invoice import CenabastInvoice
+from app.services.pharmacy_classifier import is_retail
+from app.services.price_history import observation, price_changed, record_observations
+from app.utils.normalize import FORMS_MAP, parse_product_name  # noqa: F401 (re-exported)
+from app.utils.slugify import medication_slug
 
 
+# Rows per multi-row INSERT
+BATCH_SIZE = 1000
+
 # ── Chilean region approximate center coordinates ──────────────────────
 # Used as fallback when no specific address geocoding is available
 REGION_COORDS = {
@@ -44,130 +54,97 @@ REGION_COORDS = {
     "16": (-72.1033, -36.6066),  # Ñuble
 }
 
-# ── Parsing helpers ────────────────────────────────────────────────────
-
-# Common pharmaceutical forms in Spanish
-FORMS_MAP = {
-    "CM REC": "comprimido recubierto",
-    "CM": "comprimido",
-    "CP": "cápsula",
-    "CAP": "cápsula",
-    "SOL INY": "solución inyectable",
-    "S.INY": "solución inyectable",
-    "P. LIOF": "polvo liofilizado",
-    "SOL. INY": "solución inyectable",
-    "SOL ORAL": "solución oral",
-    "SUSP": "suspensión",
-    "UNG": "ungüento",
-    "CMA": "crema",
-    "GEL": "gel",
-    "JBE": "jarabe",
-    "GOT": "gotas",
-    "INH": "inhalador",
-    "PARCHE": "parche",
-    "SUP": "supositorio",
-    "AMP": "ampolla",
-    "FAM": "frasco ampolla",
-    "FRA": "frasco",
-    "DISP": "dispositivo",
-    "CGE": "cartucho",
-    "TU": "tubo",
-}
+def ensure_sync_indexes(db: Session) -> None:
+    """Functional indexes behind the case-insensitive name matching."""
+    db.execute(text("CREATE INDEX IF NOT EXISTS ix_medications_name_lower ON medications (lower(name))"))
+    db.execute(text("CREATE INDEX IF NOT EXISTS ix_pharmacies_name_lower ON pharmacies (lower(name))"))
 
 
-def parse_product_name(name):
-    """Parse a Cenabast product name into medication components.
+def _chunks(rows: list, size: int = BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
 
-    Examples:
-        "JARDIANCE 25 MG CAJ 30 CM REC" → ("Jardiance", "25mg", "comprimido recubierto")
-        "OMNITROPE 10 MG/1,5 ML SOL INY CGE 30 UI" → ("Omnitrope", "10mg/1.5ml", "solución inyectable")
-    """
-    if not name:
-        return None, None, None
-
-    # Extract dosage pattern (e.g., "25 MG", "10 MG/1,5 ML", "100 MCG")
-    dosage_match = re.search(
-        r'(\d+[\.,]?\d*)\s*(MG|MCG|G|ML|UI|UG)(?:/(\d+[\.,]?\d*)\s*(ML|MG|G))?',
-        name, re.IGNORECASE
-    )
-    dosage = None
-    if dosage_match:
-        amt = dosage_match.group(1).replace(",", ".")
-        unit = dosage_match.group(2).lower()
-        dosage = f"{amt}{unit}"
-        if dosage_match.group(3):
-            amt2 = dosage_match.group(3).replace(",", ".")
-            unit2 = dosage_match.group(4).lower()
-            dosage += f"/{amt2}{unit2}"
-
-    # Extract drug name (everything before the first number)
-    name_match = re.match(r'^([A-Za-zÁÉÍÓÚÑáéíóúñ\s\-\.]+)', name)
-    drug_name = name_match.group(1).strip().title() if name_match else name.split()[0].title()
-
-    # Extract form
-    form = None
-    name_upper = name.upper()
-    for key, value in FORMS_MAP.items():
-        if key in name_upper:
-            form = value
-            break
-
-    return drug_name, dosage, form
+
+def _ids_by_lower_name(db: Session, model, names) -> dict:
+    """lower(name) → id for existing rows, in one query."""
+    if not names:
+        return {}
+    found = {}
+    for row_id, name in db.query(model.id, func.lower(model.name)).filter(
+        func.lower(model.name).in_(list(names))
+    ):
+        found.setdefault(name, row_id)
+    return found
 
 
 def sync_medications(db: Session) -> dict:
     """Create Medication records from CenabastProduct entries.
 
-    Returns a mapping of codigo_producto → medication_id.
+    Existing medications are matched by lower(name) in one query and the
+    missing ones are bulk-inserted. Returns a mapping of
+    codigo_producto → medication_id.
     """
-    products = db.query(CenabastProduct).all()
+    products = db.query(
+        CenabastProduct.codigo_producto,
+        CenabastProduct.nombre_producto,
+        CenabastProduct.nombre_generico,
+        CenabastProduct.nombre_proveedor,
+    ).all()
     print(f"  Processing {len(products)} Cenabast products...")
 
-    code_to_med_id = {}
-    created = 0
+    code_to_key = {}   # codigo_producto → lower(name)
+    candidates = {}    # lower(name) → row for a new medication
     skipped = 0
 
-    # Group by (drug_name, dosage) to avoid duplicates
-    seen = {}  # (name_lower, dosage_lower) → medication_id
-
     for prod in products:
         drug_name, dosage, form = parse_product_name(prod.nombre_producto)
         if not drug_name:
             skipped += 1
             continue
 
-        key = (drug_name.lower(), (dosage or "").lower())
-
-        if key in seen:
-            code_to_med_id[prod.codigo_producto] = seen[key]
-            continue
-
-        # Check if medication already exists
-        existing = db.query(Medication).filter(
-            func.lower(Medication.name) == f"{drug_name} {dosage or ''}".strip().lower()
-        ).first()
-
-        if existing:
-            seen[key] = existing.id
-            code_to_med_id[prod.codigo_producto] = existing.id
+        name = f"{drug_name} {dosage or ''}".strip()
+        key = name.lower()
+        code_to_key[prod.codigo_producto] = key
+        if key not in candidates:
+            candidates[key] = {
+                "id": uuid.uuid4(),
+                "name": name,
+                "active_ingredient": prod.nombre_generico or drug_name,
+                "dosage": dosage,
+                "form": form,
+                "lab": prod.nombre_proveedor,
+                # Core inserts bypass the ORM before_insert slug hook
+                "slug": medication_slug(name, dosage, prod.nombre_proveedor),
+                "requires_prescription": True,  # Cenabast products generally require prescription
+            }
+
+    med_ids = _ids_by_lower_name(db, Medication, candidates)
+    skipped += len(med_ids)
+
+    new_rows = [row for key, row in candidates.items() if key not in med_ids]
+    created = 0
+    for chunk in _chunks(new_rows):
+        stmt = insert(Medication).values(chunk).on_conflict_do_nothing(
+            index_elements=[Medication.slug]
+        ).returning(Medication.id)
+        inserted = {row_id for (row_id,) in db.execute(stmt)}
+        created += len(inserted)
+        for row in chunk:
+            if row["id"] in inserted:
+                med_ids[row["name"].lower()] = row["id"]
+
+    # Rows whose slug already belonged to another medication reuse that one
+    slug_keys = {row["slug"]: key for key, row in candidates.items() if key not in med_ids}
+    if slug_keys:
+        for row_id, slug in db.query(Medication.id, Medication.slug).filter(
+            Medication.slug.in_(list(slug_keys))
+        ):
+            med_ids[slug_keys[slug]] = row_id
             skipped += 1
-            continue
-
-        med = Medication(
-            name=f"{drug_name} {dosage or ''}".strip(),
-            active_ingredient=prod.nombre_generico or drug_name,
-            dosage=dosage,
-            form=form,
-            lab=prod.nombre_proveedor,
-            requires_prescription=True,  # Cenabast products generally require prescription
-        )
-        db.add(med)
-        db.flush()
-
-        seen[key] = med.id
-        code_to_med_id[prod.codigo_producto] = med.id
-        created += 1
 
+    code_to_med_id = {
+        code: med_ids[key] for code, key in code_to_key.items() if key in med_ids
+    }
     print(f"  [OK] Medications: {created} created, {skipped} already existed/skipped")
     return code_to_med_id
 
@@ -175,7 +152,8 @@ def sync_medications(db: Session) -> dict:
 def sync_pharmacies(db: Session) -> dict:
     """Create Pharmacy records from unique pharmacies in cenabast_invoices.
 
-    Returns a mapping of rut → pharmacy_id.
+    Existing pharmacies are matched by lower(name) in one query and the
+    missing ones are bulk-inserted. Returns a mapping of rut → pharmacy_id.
     """
     # Get distinct pharmacies from invoices
     pharmacies = db.query(
@@ -193,8 +171,8 @@ def sync_pharmacies(db: Session) -> dict:
 
     print(f"  Processing {len(pharmacies)} unique pharmacies from invoices...")
 
-    rut_to_pharm_id = {}
-    created = 0
+    rut_to_key = {}   # rut → lower(name)
+    candidates = {}   # lower(name) → row for a new pharmacy
     skipped = 0
 
     for ph in pharmacies:
@@ -202,52 +180,79 @@ def sync_pharmacies(db: Session) -> dict:
             skipped += 1
             continue
 
-        # Check if pharmacy already exists by name + comuna
-        existing = db.query(Pharmacy).filter(
-            func.lower(Pharmacy.name) == ph.nombre.strip().lower()
-        ).first()
-
-        if existing:
-            rut_to_pharm_id[ph.rut_cliente_solicitante] = existing.id
-            skipped += 1
+        key = ph.nombre.strip().lower()
+        rut_to_key[ph.rut_cliente_solicitante] = key
+        if key in candidates:
             continue
 
         # Get coordinates from region
         region = str(ph.region).strip() if ph.region else "13"
         lng, lat = REGION_COORDS.get(region, (-70.6506, -33.4378))
 
-        pharmacy = Pharmacy(
-            chain="cenabast",
-            name=ph.nombre.strip()[:200],
-            address=ph.direccion.strip()[:200] if ph.direccion else f"Comuna {ph.comuna or 'N/A'}",
-            comuna=ph.comuna.strip().title() if ph.comuna else "Santiago",
-            location=WKTElement(f"POINT({lng} {lat})", srid=4326),
-            phone=None,
-        )
-        db.add(pharmacy)
-        db.flush()
-
-        rut_to_pharm_id[ph.rut_cliente_solicitante] = pharmacy.id
-        created += 1
-
-    print(f"  [OK] Pharmacies: {created} created, {skipped} already existed/skipped")
+        candidates[key] = {
+            "id": uuid.uuid4(),
+            "chain": "cenabast",
+            "name": ph.nombre.strip()[:200],
+            "address": ph.direccion.strip()[:200] if ph.direccion else f"Comuna {ph.comuna or 'N/A'}",
+            "comuna": ph.comuna.strip().title() if ph.comuna else "Santiago",
+            "location": WKTElement(f"POINT({lng} {lat})", srid=4326),
+            "phone": None,
+            "is_retail": is_retail("cenabast", ph.nombre),
+        }
+
+    pharm_ids = _ids_by_lower_name(db, Pharmacy, candidates)
+    skipped += len(pharm_ids)
+
+    new_rows = [row for key, row in candidates.items() if key not in pharm_ids]
+    for chunk in _chunks(new_rows):
+        db.execute(insert(Pharmacy).values(chunk))
+    for key, row in candidates.items():
+        pharm_ids.setdefault(key, row["id"])
+
+    rut_to_pharm_id = {rut: pharm_ids[key] for rut, key in rut_to_key.items()}
+    print(f"  [OK] Pharmacies: {len(new_rows)} created, {skipped} already existed/skipped")
     return rut_to_pharm_id
 
 
+_UPDATE_PRICES_SQL = text("""
+    UPDATE prices p
+    SET price = u.price, in_stock = true, source_url = 'cenabast', updated_at = now()
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:prices AS float8[])) AS u(id, price)
+    WHERE p.id = u.id
+""")
+
+# Prices an order points at cannot be deleted; they are taken out of stock
+_RETIRE_REFERENCED_PRICES_SQL = text("""
+    UPDATE prices p
+    SET in_stock = false, updated_at = now()
+    WHERE p.id = ANY(CAST(:ids AS uuid[]))
+      AND EXISTS (SELECT 1 FROM order_items oi WHERE oi.price_id = p.id)
+""")
+
+_DELETE_PRICES_SQL = text("""
+    DELETE FROM prices p
+    WHERE p.id = ANY(CAST(:ids AS uuid[]))
+      AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.price_id = p.id)
+""")
+
+
 def sync_prices(db: Session, code_to_med_id: dict, rut_to_pharm_id: dict):
-    """Create Price records using PMVP (retail price cap) from CenabastProduct.
+    """Sync Price records using PMVP (retail price cap) from CenabastProduct.
 
     Uses the precio_maximo_publico (Precio Máximo de Venta al Público) as the
     consumer-facing price, joined with invoice data to determine which
-    pharmacies stock each product.
+    pharmacies stock each product. The result is diffed against the prices
+    already stored for those pharmacies: unchanged rows are left alone,
+    changed ones are updated in place, new ones inserted and only pairs no
+    longer stocked are removed.
     """
     # Build PMVP lookup: codigo_producto → precio_maximo_publico
-    pmvp_lookup = {}
-    for prod in db.query(CenabastProduct).filter(
+    pmvp_lookup = dict(db.query(
+        CenabastProduct.codigo_producto, CenabastProduct.precio_maximo_publico
+    ).filter(
         CenabastProduct.precio_maximo_publico.isnot(None),
         CenabastProduct.precio_maximo_publico > 0,
-    ).all():
-        pmvp_lookup[prod.codigo_producto] = prod.precio_maximo_publico
+    ).all())
 
     print(f"  Loaded {len(pmvp_lookup)} products with PMVP prices")
 
@@ -266,18 +271,10 @@ def sync_prices(db: Session, code_to_med_id: dict, rut_to_pharm_id: dict):
 
     print(f"  Processing {len(stock_data)} product-pharmacy combinations...")
 
-    # Delete existing cenabast-sourced prices
-    cenabast_pharm_ids = list(rut_to_pharm_id.values())
-    if cenabast_pharm_ids:
-        db.query(Price).filter(Price.pharmacy_id.in_(cenabast_pharm_ids)).delete(
-            synchronize_session=False
-        )
-        db.flush()
-
-    batch = []
-    created = 0
+    # (medication_id, pharmacy_id) → price; when several products map to one
+    # medication the lowest PMVP wins
+    desired = {}
     skipped = 0
-
     for row in stock_data:
         med_id = code_to_med_id.get(row.codigo_producto_comercial)
         pharm_id = rut_to_pharm_id.get(row.rut_cliente_solicitante)
@@ -292,25 +289,63 @@ def sync_prices(db: Session, code_to_med_id: dict, rut_to_pharm_id: dict):
             skipped += 1
             continue
 
-        batch.append(Price(
-            medication_id=med_id,
-            pharmacy_id=pharm_id,
-            price=price_val,
-            in_stock=True,
-            source_url="cenabast",
-        ))
-        created += 1
+        key = (med_id, pharm_id)
+        if key not in desired or price_val < desired[key]:
+            desired[key] = price_val
 
-        if len(batch) >= 1000:
-            db.bulk_save_objects(batch)
-            db.flush()
-            batch.clear()
-
-    if batch:
-        db.bulk_save_objects(batch)
-        db.flush()
-
-    print(f"  [OK] Prices: {created} created, {skipped} skipped (using PMVP retail prices)")
+    # Current prices at these pharmacies; duplicate rows for a pair are stale
+    cenabast_pharm_ids = list(set(rut_to_pharm_id.values()))
+    current = {}
+    stale_ids = []
+    if cenabast_pharm_ids:
+        for p in db.query(
+            Price.id, Price.medication_id, Price.pharmacy_id, Price.price, Price.in_stock, Price.source_url
+        ).filter(Price.pharmacy_id.in_(cenabast_pharm_ids)):
+            key = (p.medication_id, p.pharmacy_id)
+            if key in current or key not in desired:
+                stale_ids.append(p.id)
+            else:
+                current[key] = p
+
+    now = datetime.now(timezone.utc)
+    observations = []
+    update_ids, update_prices = [], []
+    new_rows = []
+    for (med_id, pharm_id), price_val in desired.items():
+        existing = current.get((med_id, pharm_id))
+        if existing is None:
+            new_rows.append({
+                "id": uuid.uuid4(),
+                "medication_id": med_id,
+                "pharmacy_id": pharm_id,
+                "price": price_val,
+                "in_stock": True,
+                "source_url": "cenabast",
+            })
+            old_price, old_in_stock = None, None
+        else:
+            if existing.price == price_val and existing.in_stock and existing.source_url == "cenabast":
+                continue
+            update_ids.append(existing.id)
+            update_prices.append(price_val)
+            old_price, old_in_stock = existing.price, existing.in_stock
+        if price_changed(old_price, old_in_stock, price_val, True):
+            observations.append(observation(med_id, pharm_id, price_val, True, "cenabast", now))
+
+    for chunk in _chunks(new_rows):
+        db.execute(insert(Price).values(chunk))
+    if update_ids:
+        db.execute(_UPDATE_PRICES_SQL, {"ids": update_ids, "prices": update_prices})
+    if stale_ids:
+        db.execute(_RETIRE_REFERENCED_PRICES_SQL, {"ids": stale_ids})
+        db.execute(_DELETE_PRICES_SQL, {"ids": stale_ids})
+    db.flush()
+
+    changes = record_observations(db, observations)
+    unchanged = len(desired) - len(new_rows) - len(update_ids)
+    print(f"  [OK] Prices: {len(new_rows)} created, {len(update_ids)} updated, {unchanged} unchanged, "
+          f"{len(stale_ids)} removed, {skipped} skipped (using PMVP retail prices)")
+    print(f"  [OK] Price history: {changes} changes recorded")
 
 
 def sync_all():
@@ -320,17 +355,23 @@ def sync_all():
 
     db = SessionLocal()
     try:
-        print("\n1/3 Syncing medications...")
-        code_to_med_id = sync_medications(db)
+        ensure_sync_indexes(db)
         db.commit()
 
+        print("\n1/3 Syncing medications...")
+        with etl_stage("cenabast", "medications"):
+            code_to_med_id = sync_medications(db)
+            db.commit()
+
         print("\n2/3 Syncing pharmacies...")
-        rut_to_pharm_id = sync_pharmacies(db)
-        db.commit()
+        with etl_stage("cenabast", "pharmacies"):
+            rut_to_pharm_id = sync_pharmacies(db)
+            db.commit()
 
         print("\n3/3 Syncing prices...")
-        sync_prices(db, code_to_med_id, rut_to_pharm_id)
-        db.commit()
+        with etl_stage("cenabast", "prices"):
+            sync_prices(db, code_to_med_id, rut_to_pharm_id)
+            db.commit()
 
         # Print summary
         med_count = db.query(func.count(Medication.id)).scalar()
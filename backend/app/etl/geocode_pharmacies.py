@@ -1,4 +1,7 @@
-"""Geocode Cenabast pharmacies using their addresses via Nominatim (OpenStreetMap).
+"""Geocode Cenabast pharmacies using their addresses.
+
+Uses the provider configured by GEOCODER_PROVIDER (Nominatim by default) and
+caches results, including misses, in geocode_cache.
 
 Usage:
     python -m app.etl.geocode_pharmacies
@@ -7,15 +10,17 @@ import asyncio
 import logging
 import re
 
-import httpx
 from sqlalchemy import text
 
 from app.core.database import SessionLocal
+from app.services.geocoding import get_cached, get_provider, normalize_key, store_results
 
 logger = logging.getLogger(__name__)
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
-RATE_LIMIT = 1.1  # Nominatim requires max 1 req/sec
+BATCH_SIZE = 500
+# Addresses sent to the provider between commits, so an interrupted run
+# keeps what it resolved and a re-run resumes from the cache
+QUERY_CHUNK_SIZE = 50
 
 
 def clean_address(address: str, comuna: str) -> str:
@@ -29,28 +34,29 @@ def clean_address(address: str, comuna: str) -> str:
     return f"{addr}, {comuna}, Chile"
 
 
-async def geocode_address(client: httpx.AsyncClient, address: str) -> tuple[float, float] | None:
-    """Geocode a single address using Nominatim. Returns (lng, lat) or None."""
-    try:
-        resp = await client.get(NOMINATIM_URL, params={
-            "q": address,
-            "format": "json",
-            "limit": 1,
-            "countrycodes": "cl",
-        })
-        resp.raise_for_status()
-        results = resp.json()
-        if results:
-            lat = float(results[0]["lat"])
-            lng = float(results[0]["lon"])
-            return (lng, lat)
-    except Exception as e:
-        logger.warning("Geocode failed for '%s': %s", address, e)
-    return None
+def _apply_updates(db, updates: list[tuple[str, float, float]]) -> None:
+    """Set pharmacy locations for many rows in a single UPDATE."""
+    if not updates:
+        return
+    ids, lngs, lats = zip(*updates)
+    db.execute(text("""
+        UPDATE pharmacies p
+        SET location = ST_SetSRID(ST_MakePoint(v.lng, v.lat), 4326)
+        FROM unnest(CAST(:ids AS uuid[]), CAST(:lngs AS float8[]), CAST(:lats AS float8[]))
+             AS v(id, lng, lat)
+        WHERE p.id = v.id
+    """), {"ids": list(ids), "lngs": list(lngs), "lats": list(lats)})
 
 
 async def geocode_all():
-    """Geocode all Cenabast pharmacies that still have region-level coordinates."""
+    """Geocode all Cenabast pharmacies that still have region-level coordinates.
+
+    Addresses are resolved from ``geocode_cache`` first; only unseen or
+    expired addresses go to the configured provider, and each distinct
+    address is queried once even if several pharmacies share it. Provider
+    results are cached and applied every ``QUERY_CHUNK_SIZE`` addresses, so
+    an interrupted run loses at most one chunk.
+    """
     db = SessionLocal()
     try:
         # Find pharmacies with region-level coords (duplicated coords = not geocoded)
@@ -76,34 +82,52 @@ async def geocode_all():
             print("Nothing to geocode.")
             return
 
-        updated = 0
-        failed = 0
-
-        async with httpx.AsyncClient(
-            timeout=15,
-            headers={"User-Agent": "Remedia/1.0 (pharmacy geocoding)"},
-        ) as client:
-            for i, row in enumerate(to_geocode):
-                address_str = clean_address(row.address, row.comuna)
-                coords = await geocode_address(client, address_str)
-
-                if coords:
-                    lng, lat = coords
-                    db.execute(text(
-                        "UPDATE pharmacies SET location = ST_SetSRID(ST_MakePoint(:lng, :lat), 4326) WHERE id = :id"
-                    ), {"lng": lng, "lat": lat, "id": str(row.id)})
-                    updated += 1
-                    if updated % 50 == 0:
-                        db.commit()
-                        print(f"  [{i+1}/{len(to_geocode)}] Updated {updated} pharmacies...")
-                else:
-                    failed += 1
-
-                if i < len(to_geocode) - 1:
-                    await asyncio.sleep(RATE_LIMIT)
-
-        db.commit()
-        print(f"\nDone: {updated} geocoded, {failed} failed out of {len(to_geocode)}")
+        keyed = [(row, normalize_key(clean_address(row.address, row.comuna))) for row in to_geocode]
+        cached = get_cached(db, list({k for _, k in keyed}))
+
+        pending: dict[str, str] = {}  # address key -> address sent to the provider
+        for row, key in keyed:
+            if key not in cached and key not in pending:
+                pending[key] = clean_address(row.address, row.comuna)
+        print(f"  {len(cached)} addresses cached, {len(pending)} to query")
+
+        rows_by_key: dict[str, list] = {}
+        for row, key in keyed:
+            rows_by_key.setdefault(key, []).append(row)
+
+        def _save(keys) -> int:
+            updates = [
+                (str(row.id), *cached[key])
+                for key in keys if cached.get(key)
+                for row in rows_by_key[key]
+            ]
+            for i in range(0, len(updates), BATCH_SIZE):
+                _apply_updates(db, updates[i:i + BATCH_SIZE])
+            db.commit()
+            return len(updates)
+
+        geocoded = _save([key for key in rows_by_key if key in cached])
+
+        errors: list[str] = []
+        if pending:
+            items = list(pending.items())
+            async with get_provider() as provider:
+                for i in range(0, len(items), QUERY_CHUNK_SIZE):
+                    chunk = dict(items[i:i + QUERY_CHUNK_SIZE])
+                    by_address, chunk_errors = await provider.geocode_many(list(chunk.values()))
+                    errors.extend(chunk_errors)
+                    fresh = {
+                        key: by_address[address]
+                        for key, address in chunk.items() if address in by_address
+                    }
+                    store_results(db, provider.NAME, fresh)
+                    cached.update(fresh)
+                    geocoded += _save(fresh)
+                    print(f"  {min(i + QUERY_CHUNK_SIZE, len(items))}/{len(items)} addresses queried")
+
+        not_found = sum(1 for _, key in keyed if key in cached and cached[key] is None)
+        print(f"\nDone: {geocoded} geocoded, {not_found} not found, "
+              f"{len(errors)} errors out of {len(to_geocode)}")
 
     finally:
         db.close()
@@ -1,29 +1,74 @@
 """Normalize scraped pharmacy locations into the marketplace tables."""
 import logging
 
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from geoalchemy2.elements import WKTElement
 
-from app.models.pharmacy import Pharmacy
 from app.scrapers.locations.base import ScrapedLocation
+from app.services.pharmacy_classifier import is_retail
 
 logger = logging.getLogger(__name__)
 
+# Coordinates are compared at ~1 cm precision
+COORD_DECIMALS = 7
+
+_EXISTING_SQL = text("""
+    SELECT id, chain, branch_code, name, address, comuna, phone, hours, is_retail,
+           ST_X(location::geometry) AS lng, ST_Y(location::geometry) AS lat
+    FROM pharmacies
+    WHERE chain = ANY(:chains) AND branch_code IS NOT NULL
+""")
+
+_UPSERT_SQL = text("""
+    INSERT INTO pharmacies AS p
+        (id, chain, branch_code, name, address, comuna, location, phone, hours, is_retail)
+    SELECT gen_random_uuid(), v.chain, v.branch_code, v.name, v.address, v.comuna,
+           CAST(ST_SetSRID(ST_MakePoint(v.lng, v.lat), 4326) AS geography),
+           v.phone, v.hours, v.is_retail
+    FROM unnest(
+        CAST(:chains AS text[]), CAST(:branch_codes AS text[]), CAST(:names AS text[]),
+        CAST(:addresses AS text[]), CAST(:comunas AS text[]), CAST(:phones AS text[]),
+        CAST(:hours AS text[]), CAST(:lngs AS float8[]), CAST(:lats AS float8[]),
+        CAST(:is_retail AS boolean[])
+    ) AS v(chain, branch_code, name, address, comuna, phone, hours, lng, lat, is_retail)
+    ON CONFLICT (chain, branch_code) DO UPDATE SET
+        name = EXCLUDED.name,
+        address = EXCLUDED.address,
+        comuna = EXCLUDED.comuna,
+        location = EXCLUDED.location,
+        phone = EXCLUDED.phone,
+        hours = EXCLUDED.hours,
+        is_retail = EXCLUDED.is_retail,
+        updated_at = now()
+    RETURNING p.id, p.chain, p.branch_code
+""")
+
+_FIELDS = ("name", "address", "comuna", "phone", "hours")
+
+
+def _same_point(a: tuple, b: tuple) -> bool:
+    return all(round(x, COORD_DECIMALS) == round(y, COORD_DECIMALS) for x, y in zip(a, b))
+
 
 def upsert_scraped_locations(db: Session, locations: list[ScrapedLocation]) -> dict:
     """Upsert scraped physical pharmacy locations into Pharmacy table.
 
-    Dedup key: (chain, branch_code). Updates existing records, creates new ones.
-    Returns stats dict.
+    Dedup key: (chain, branch_code). Existing rows for the scraped chains are
+    loaded in one query and compared in memory; only new pharmacies and those
+    whose details, coordinates or retail classification differ are written,
+    in one ``INSERT ... ON CONFLICT (chain, branch_code)``. Returns a stats dict that
+    also carries ``changed_pharmacy_ids`` (created or updated) and
+    ``moved_pharmacy_ids`` (created or relocated) for downstream refreshes.
     """
     stats = {
         "pharmacies_created": 0,
         "pharmacies_updated": 0,
+        "pharmacies_unchanged": 0,
         "skipped": 0,
     }
 
     seen = set()
-
+    valid = []
     for loc in locations:
         key = (loc.chain, loc.branch_code)
         if key in seen or not loc.branch_code:
@@ -34,37 +79,65 @@ def upsert_scraped_locations(db: Session, locations: list[ScrapedLocation]) -> d
         if not loc.lat or not loc.lng:
             stats["skipped"] += 1
             continue
+        valid.append(loc)
 
-        existing = db.query(Pharmacy).filter(
-            Pharmacy.chain == loc.chain,
-            Pharmacy.branch_code == loc.branch_code,
-        ).first()
-
-        point = WKTElement(f"POINT({loc.lng} {loc.lat})", srid=4326)
-
-        if existing:
-            existing.name = loc.name or existing.name
-            existing.address = loc.address or existing.address
-            existing.comuna = loc.comuna or existing.comuna
-            existing.location = point
-            existing.phone = loc.phone or existing.phone
-            existing.hours = loc.hours or existing.hours
-            existing.is_retail = True
-            stats["pharmacies_updated"] += 1
-        else:
-            db.add(Pharmacy(
-                chain=loc.chain,
-                branch_code=loc.branch_code,
-                name=loc.name or f"{loc.chain} {loc.branch_code}",
-                address=loc.address or "",
-                comuna=loc.comuna or "",
-                location=point,
-                phone=loc.phone or "",
-                hours=loc.hours or "",
-                is_retail=True,
-            ))
+    existing = {}
+    if valid:
+        for row in db.execute(_EXISTING_SQL, {"chains": sorted({loc.chain for loc in valid})}):
+            existing[(row.chain, row.branch_code)] = row
+
+    rows = []
+    moved_keys = set()
+    for loc in valid:
+        key = (loc.chain, loc.branch_code)
+        point = (float(loc.lng), float(loc.lat))
+        current = existing.get(key)
+        if current is None:
+            values = {
+                "name": loc.name or f"{loc.chain} {loc.branch_code}",
+                "address": loc.address or "",
+                "comuna": loc.comuna or "",
+                "phone": loc.phone or "",
+                "hours": loc.hours or "",
+            }
+            values["is_retail"] = is_retail(loc.chain, values["name"])
             stats["pharmacies_created"] += 1
+            moved_keys.add(key)
+        else:
+            # Empty scraped fields keep what is stored
+            values = {field: getattr(loc, field) or getattr(current, field) for field in _FIELDS}
+            values["is_retail"] = is_retail(loc.chain, values["name"], default=True)
+            relocated = current.lng is None or not _same_point(point, (current.lng, current.lat))
+            if (not relocated and current.is_retail == values["is_retail"]
+                    and all(values[field] == getattr(current, field) for field in _FIELDS)):
+                stats["pharmacies_unchanged"] += 1
+                continue
+            stats["pharmacies_updated"] += 1
+            if relocated:
+                moved_keys.add(key)
+        rows.append((key, values, point))
+
+    ids = {}
+    if rows:
+        result = db.execute(_UPSERT_SQL, {
+            "chains": [key[0] for key, _, _ in rows],
+            "branch_codes": [key[1] for key, _, _ in rows],
+            "names": [values["name"] for _, values, _ in rows],
+            "addresses": [values["address"] for _, values, _ in rows],
+            "comunas": [values["comuna"] for _, values, _ in rows],
+            "phones": [values["phone"] for _, values, _ in rows],
+            "hours": [values["hours"] for _, values, _ in rows],
+            "lngs": [point[0] for _, _, point in rows],
+            "lats": [point[1] for _, _, point in rows],
+            "is_retail": [values["is_retail"] for _, values, _ in rows],
+        })
+        ids = {(r.chain, r.branch_code): r.id for r in result}
 
     db.commit()
-    logger.info("Location upsert complete: %s", stats)
+    stats["changed_pharmacy_ids"] = set(ids.values())
+    stats["moved_pharmacy_ids"] = {ids[key] for key in moved_keys if key in ids}
+    logger.info(
+        "Location upsert complete: %s",
+        {k: v for k, v in stats.items() if not k.endswith("_ids")},
+    )
     return stats
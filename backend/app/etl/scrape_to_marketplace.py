@@ -10,6 +10,7 @@ from app.models.medication import Medication
 from app.models.pharmacy import Pharmacy
 from app.models.price import Price
 from app.scrapers.base import ScrapedProduct
+from app.services.price_history import observation, price_changed, record_observations
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +71,7 @@ def upsert_scraped_products(db: Session, products: list[ScrapedProduct]) -> dict
         "medications_created": 0,
         "pharmacies_created": 0,
         "prices_upserted": 0,
+        "price_changes": 0,
         "skipped": 0,
     }
 
@@ -110,8 +112,9 @@ def upsert_scraped_products(db: Session, products: list[ScrapedProduct]) -> dict
     for med in db.query(Medication).all():
         med_cache[med.name.strip().lower()] = med
 
-    # 4. Upsert each product
+    # 4. Upsert each product, collecting price changes for the history table
     now = datetime.now(timezone.utc)
+    observations = []
     for p in unique_products:
         if p.price <= 0:
             stats["skipped"] += 1
@@ -133,6 +136,12 @@ def upsert_scraped_products(db: Session, products: list[ScrapedProduct]) -> dict
             Price.pharmacy_id == pharmacy_id,
         ).first()
 
+        old_price, old_in_stock = (
+            (existing_price.price, existing_price.in_stock) if existing_price else (None, None)
+        )
+        if price_changed(old_price, old_in_stock, p.price, p.in_stock):
+            observations.append(observation(med.id, pharmacy_id, p.price, p.in_stock, "scrape", now))
+
         if existing_price:
             existing_price.price = p.price
             existing_price.in_stock = p.in_stock
@@ -149,5 +158,6 @@ def upsert_scraped_products(db: Session, products: list[ScrapedProduct]) -> dict
             ))
         stats["prices_upserted"] += 1
 
+    stats["price_changes"] = record_observations(db, observations)
     db.commit()
     return stats
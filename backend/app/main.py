@@ -1,12 +1,18 @@
+import asyncio
 import logging
+import time
 from datetime import datetime, timezone
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy import text
 from app.api.v1.routes import api_router
 from app.models import Base
 from app.core.database import engine
+from app.core import metrics
+from app.core.config import settings
+from app.middleware.metrics import MetricsMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.request_id import RequestIdMiddleware
 
@@ -16,48 +22,66 @@ app = FastAPI(title="Remedia API")
 
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(api_router)
 
 
+HEALTH_CACHE_SECONDS = 10
+_health_cache = {"at": 0.0, "body": None}
+
+
 @app.get("/health")
 def health_check():
-    """Health check for monitoring and Docker."""
-    from app.core.database import SessionLocal
-    from app.models.scrape_run import ScrapeRun
+    """Health check for monitoring and Docker (cached for a few seconds)."""
+    now = time.monotonic()
+    if _health_cache["body"] is not None and now - _health_cache["at"] < HEALTH_CACHE_SECONDS:
+        return _health_cache["body"]
 
     db_ok = False
     scrape_age_hours = None
 
     try:
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db_ok = True
-
-        last_scrape = db.query(ScrapeRun).order_by(ScrapeRun.finished_at.desc()).first()
-        if last_scrape and last_scrape.finished_at:
-            age = (datetime.now(timezone.utc) - last_scrape.finished_at).total_seconds()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            db_ok = True
+            last_finished = conn.execute(text(
+                "SELECT max(finished_at) FROM scrape_runs"
+            )).scalar()
+        if last_finished:
+            age = (datetime.now(timezone.utc) - last_finished).total_seconds()
             scrape_age_hours = round(age / 3600, 1)
-        db.close()
     except Exception:
         pass
 
-    return {
+    body = {
         "status": "healthy" if db_ok else "unhealthy",
         "database": "ok" if db_ok else "error",
         "last_scrape_hours_ago": scrape_age_hours,
     }
+    _health_cache.update(at=now, body=body)
+    return body
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+_background: dict = {}
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     # Add new enum values to PostgreSQL (idempotent)
     from app.core.database import SessionLocal
     db = SessionLocal()
@@ -74,16 +98,116 @@ def on_startup():
 
     Base.metadata.create_all(bind=engine)
 
-    # Start background scheduler for price alerts and auto-scraping
+    # Month partitions for append-only history tables (idempotent)
+    from app.services.price_history import ensure_partitions
+    db = SessionLocal()
+    try:
+        ensure_partitions(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to ensure history partitions", exc_info=True)
+    finally:
+        db.close()
+
+    # Trigram indexes for medication search (idempotent)
+    from app.services.medication_search import ensure_search_indexes
+    db = SessionLocal()
+    try:
+        ensure_search_indexes(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to ensure search indexes", exc_info=True)
+    finally:
+        db.close()
+
+    # Monthly partitions for funnel events; converts a legacy table once
+    from app.services import event_ingest
+    db = SessionLocal()
     try:
-        from apscheduler.schedulers.asyncio import AsyncIOScheduler
-        from app.tasks.price_alerts import check_price_alerts
-        from app.tasks.scheduled import run_scheduled_scrape
-
-        scheduler = AsyncIOScheduler()
-        scheduler.add_job(check_price_alerts, "interval", hours=6, id="price_alerts")
-        scheduler.add_job(run_scheduled_scrape, "cron", hour=3, id="daily_scrape")
-        scheduler.start()
-        logger.info("Scheduler started: price alerts every 6h, catalog scrape daily at 3AM")
+        event_ingest.ensure_partitions(db)
+        db.commit()
     except Exception:
-        logger.warning("Scheduler failed to start (non-fatal)", exc_info=True)
+        db.rollback()
+        logger.warning("Failed to ensure referral event partitions", exc_info=True)
+    finally:
+        db.close()
+
+    # Pending-refill index for the adherence sweeps (idempotent)
+    from app.services.adherence_service import ensure_adherence_indexes
+    db = SessionLocal()
+    try:
+        ensure_adherence_indexes(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to ensure adherence indexes", exc_info=True)
+    finally:
+        db.close()
+
+    # Keyset-pagination indexes for the admin order list (idempotent)
+    from app.services.order_service import ensure_order_indexes
+    db = SessionLocal()
+    try:
+        ensure_order_indexes(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to ensure order indexes", exc_info=True)
+    finally:
+        db.close()
+
+    # Dashboard counter triggers and first seeding (idempotent)
+    from app.services.stat_counters import ensure_counters
+    db = SessionLocal()
+    try:
+        ensure_counters(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to ensure dashboard counters", exc_info=True)
+    finally:
+        db.close()
+
+    # GPO savings ledger backfill (no-op once populated)
+    from app.services.gpo_service import ensure_savings_ledger
+    db = SessionLocal()
+    try:
+        ensure_savings_ledger(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Failed to build GPO savings ledger", exc_info=True)
+    finally:
+        db.close()
+
+    # In-process queue workers (outbound sends, inbound webhook messages,
+    # buffered funnel events)
+    from app.services import inbound_queue, outbound_queue
+    workers = [
+        (settings.OUTBOUND_WORKER_ENABLED, outbound_queue.run_worker),
+        (settings.INBOUND_WORKER_ENABLED, inbound_queue.run_worker),
+        (settings.EVENT_BUFFER_ENABLED, event_ingest.run_flusher),
+    ]
+    _background["stop"] = asyncio.Event()
+    _background["tasks"] = [
+        asyncio.create_task(run_worker(_background["stop"]))
+        for enabled, run_worker in workers if enabled
+    ]
+
+    # Scheduled jobs run in the worker process (python -m app.worker); leader
+    # election keeps them single-run even when also enabled here
+    if settings.SCHEDULER_IN_API:
+        from app.tasks.scheduler import run_scheduler
+        _background["tasks"].append(asyncio.create_task(run_scheduler(_background["stop"])))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    from app.services.servicetsunami import tsunami_client
+
+    if "stop" in _background:
+        _background["stop"].set()
+        await asyncio.gather(*_background["tasks"])
+    await tsunami_client.aclose()
@@ -0,0 +1,34 @@
+import time
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.core import metrics
+
+# Probes and the scrape itself would dominate the histograms
+SKIP_PATHS = {"/metrics", "/health"}
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in SKIP_PATHS:
+            return await call_next(request)
+
+        stats = {"queries": 0, "seconds": 0.0}
+        token = metrics.request_db_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.request_db_stats.reset(token)
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            metrics.http_request_duration.observe(
+                elapsed, method=request.method, route=path, status=status,
+            )
+            metrics.db_queries_per_request.observe(stats["queries"], method=request.method, route=path)
+            metrics.db_time_per_request.observe(stats["seconds"], method=request.method, route=path)
@@ -5,6 +5,7 @@ from app.models.delivery_address import DeliveryAddress
 from app.models.medication import Medication
 from app.models.pharmacy import Pharmacy
 from app.models.price import Price
+from app.models.price_observation import PriceObservation
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.order_delivery import OrderDelivery
@@ -14,8 +15,12 @@ from app.models.bms_institution import BmsInstitution
 from app.models.bms_distribution import BmsDistribution
 from app.models.bms_purchase_order import BmsPurchaseOrder
 from app.models.bms_adjudication import BmsAdjudication
+from app.models.bms_provider_monthly import BmsProviderMonthly
+from app.models.bms_supplier_bids_monthly import BmsSupplierBidsMonthly
 from app.models.cenabast_product import CenabastProduct
 from app.models.cenabast_invoice import CenabastInvoice
+from app.models.demand_grid import DemandGridCell
+from app.models.demand_tile import DemandTile
 # Monetization models
 from app.models.organization import Organization
 from app.models.org_member import OrgMember
@@ -28,6 +33,8 @@ from app.models.user_subscription import UserSubscription
 from app.models.price_alert import PriceAlert
 # Layer 1: Transparency
 from app.models.referral_event import ReferralEvent
+from app.models.referral_funnel_daily import ReferralFunnelDaily
+from app.models.referral_funnel_user_sketch import ReferralFunnelUserSketch
 # Layer 2: Intelligence
 from app.models.saved_report import SavedReport
 # Layer 3: GPO
@@ -37,6 +44,7 @@ from app.models.gpo_purchase_intent import GpoPurchaseIntent
 from app.models.gpo_group_order import GpoGroupOrder
 from app.models.gpo_allocation import GpoAllocation
 from app.models.gpo_facilitation_fee import GpoFacilitationFee
+from app.models.gpo_member_savings import GpoMemberSavings
 # Layer 4: Adherence
 from app.models.adherence_program import AdherenceProgram
 from app.models.adherence_discount_tier import AdherenceDiscountTier
@@ -47,5 +55,16 @@ from app.models.adherence_sponsor_charge import AdherenceSponsorCharge
 from app.models.pharmacy_discount_cap import PharmacyDiscountCap
 # Scraping
 from app.models.scrape_run import ScrapeRun
+from app.models.geocode_cache import GeocodeCache
+# Background jobs
+from app.models.job_run import JobRun
+from app.models.background_job import BackgroundJob
+# Messaging
+from app.models.outbound_message import OutboundMessage
+from app.models.inbound_message import InboundMessage
+from app.models.whatsapp_chat_session import WhatsappChatSession
 # Site configuration
 from app.models.site_setting import SiteSetting
+# Dashboard counters
+from app.models.stat_counter import StatCounter
+from app.models.stat_counter_delta import StatCounterDelta
@@ -0,0 +1,38 @@
+import enum
+from sqlalchemy import Column, String, Integer, Boolean, Enum, DateTime, JSON, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.base import Base, TimestampMixin
+
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+class BackgroundJob(TimestampMixin, Base):
+    """Queued scrape/ETL job, executed by the worker process (app.tasks.job_queue).
+
+    A running job's lease is renewed by its worker's heartbeat; a job whose
+    lease lapses (worker died) is picked up again until it runs out of attempts.
+    """
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_due", "status", "run_after"),
+    )
+
+    job_type = Column(String, nullable=False, index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.queued)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    worker = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    scrape_run_id = Column(UUID(as_uuid=True), ForeignKey("scrape_runs.id"), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Date, Float, BigInteger, Integer, String
+
+from app.models.base import Base, TimestampMixin
+
+
+class BmsProviderMonthly(TimestampMixin, Base):
+    """Per-provider monthly totals of ``bms_distributions``.
+
+    Rebuilt by ``bms_import`` after each import (see
+    ``competitive_intel_service.refresh_rollups``). ``month`` is null for
+    rows without a delivery date.
+    """
+    __tablename__ = "bms_provider_monthly"
+
+    provider_name = Column(String, nullable=False, index=True)
+    month = Column(Date, nullable=True)
+    first_delivery = Column(Date, nullable=True)
+    units = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    row_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Integer, String
+
+from app.models.base import Base, TimestampMixin
+
+
+class BmsSupplierBidsMonthly(TimestampMixin, Base):
+    """Per-supplier monthly bid and win counts of ``bms_adjudications``.
+
+    Rebuilt by ``bms_import`` after each import. ``month`` is null for
+    adjudications without a date.
+    """
+    __tablename__ = "bms_supplier_bids_monthly"
+
+    supplier = Column(String, nullable=False, index=True)
+    month = Column(Date, nullable=True)
+    bids = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
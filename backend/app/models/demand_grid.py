@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Date, Float, BigInteger, String, Index
+
+from app.models.base import Base, TimestampMixin
+
+
+class DemandGridCell(TimestampMixin, Base):
+    """Precomputed demand per (source, region, comuna, month, product).
+
+    Rebuilt per source after each Cenabast invoice or BMS import (see
+    ``app.services.demand_grid``); heatmap queries read this instead of the
+    raw invoice tables.
+    """
+    __tablename__ = "demand_grid"
+    __table_args__ = (
+        Index("ix_demand_grid_source_region", "source", "region"),
+    )
+
+    source = Column(String(16), nullable=False)  # cenabast | bms
+    region = Column(String, nullable=False)
+    comuna = Column(String, nullable=True)
+    month = Column(Date, nullable=True)
+    product = Column(String, nullable=True, index=True)
+    units = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
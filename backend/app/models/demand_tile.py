@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime, JSON, func
+
+from app.models.base import Base
+
+
+class DemandTile(Base):
+    """Rendered GeoJSON for an unfiltered demand heatmap view, served with
+    its ETag.
+
+    Cleared whenever the demand grid is rebuilt.
+    """
+    __tablename__ = "demand_tiles"
+
+    key = Column(String, primary_key=True)
+    etag = Column(String, nullable=False)
+    body = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
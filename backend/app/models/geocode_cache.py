@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Float, DateTime, func
+from app.models.base import Base
+
+
+class GeocodeCache(Base):
+    """Geocoding results keyed by normalized address.
+
+    Rows with null coordinates are negative results (the provider found
+    nothing) and are only retried once ``expires_at`` has passed.
+    """
+    __tablename__ = "geocode_cache"
+
+    address_key = Column(String, primary_key=True)
+    provider = Column(String(32), nullable=False)
+    lng = Column(Float, nullable=True)
+    lat = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.base import Base
+
+
+class GpoMemberSavings(Base):
+    """Per-member savings ledger: PMVP cost vs. group cost over all allocations.
+
+    Maintained by ``gpo_service.refresh_savings_ledger`` whenever a group's
+    orders are created or change status, so savings reads are one row per
+    member regardless of order history.
+    """
+    __tablename__ = "gpo_member_savings"
+
+    gpo_member_id = Column(UUID(as_uuid=True), ForeignKey("gpo_members.id", ondelete="CASCADE"), primary_key=True)
+    gpo_group_id = Column(UUID(as_uuid=True), ForeignKey("gpo_groups.id"), nullable=False, index=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_pmvp_cost = Column(Float, nullable=False, default=0)
+    total_group_cost = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
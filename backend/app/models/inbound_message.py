@@ -0,0 +1,33 @@
+import enum
+from sqlalchemy import Column, String, Integer, Enum, DateTime, Text, Index, func
+from app.models.base import Base, TimestampMixin
+
+
+class InboundStatus(str, enum.Enum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    failed = "failed"
+
+
+class InboundMessage(TimestampMixin, Base):
+    """Incoming WhatsApp message, acknowledged by the webhook and handled later.
+
+    ``message_id`` is the WhatsApp message id; upstream redeliveries of the
+    same id are ignored. Messages from one sender are handled in order.
+    """
+    __tablename__ = "inbound_messages"
+    __table_args__ = (
+        Index("ix_inbound_messages_sender_received", "sender_phone", "received_at"),
+        Index("ix_inbound_messages_due", "status", "next_attempt_at"),
+    )
+
+    message_id = Column(String, nullable=False, unique=True)
+    sender_phone = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    status = Column(Enum(InboundStatus), nullable=False, default=InboundStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
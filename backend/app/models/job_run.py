@@ -0,0 +1,25 @@
+import enum
+from sqlalchemy import Column, String, Integer, Enum, DateTime, Index
+from app.models.base import Base, TimestampMixin
+
+
+class JobRunStatus(str, enum.Enum):
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class JobRun(TimestampMixin, Base):
+    """One execution of a scheduled job (app.tasks.scheduler)."""
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        Index("ix_job_runs_job_started", "job_name", "started_at"),
+    )
+
+    job_name = Column(String, nullable=False)
+    status = Column(Enum(JobRunStatus), nullable=False, default=JobRunStatus.running)
+    host = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
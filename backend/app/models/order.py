@@ -1,6 +1,7 @@
 import enum
 from sqlalchemy import Column, String, Float, Enum, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
 from app.models.base import Base, TimestampMixin
 
 class OrderStatus(str, enum.Enum):
@@ -28,3 +29,8 @@ class Order(TimestampMixin, Base):
     payment_url = Column(String, nullable=True)
     payment_status = Column(String, nullable=True)
     total = Column(Float, nullable=False, default=0)
+
+    # lazy="raise": load these explicitly (selectinload/joinedload) so order
+    # endpoints stay at a fixed number of queries
+    pharmacy = relationship("Pharmacy", lazy="raise")
+    items = relationship("OrderItem", lazy="raise", order_by="OrderItem.created_at")
@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, Float, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
 from app.models.base import Base, TimestampMixin
 
 class OrderItem(TimestampMixin, Base):
@@ -9,3 +10,5 @@ class OrderItem(TimestampMixin, Base):
     price_id = Column(UUID(as_uuid=True), ForeignKey("prices.id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
     subtotal = Column(Float, nullable=False)
+
+    medication = relationship("Medication", lazy="raise")
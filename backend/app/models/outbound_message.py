@@ -0,0 +1,33 @@
+import enum
+from sqlalchemy import Column, String, Integer, Enum, DateTime, JSON, Index, func
+from app.models.base import Base, TimestampMixin
+
+
+class OutboundStatus(str, enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+
+class OutboundMessage(TimestampMixin, Base):
+    """Queued outbound WhatsApp message, delivered by the outbound worker.
+
+    ``next_attempt_at`` doubles as the claim lease for rows in ``sending``:
+    a worker that dies mid-send leaves the row to be reclaimed once it passes.
+    """
+    __tablename__ = "outbound_messages"
+    __table_args__ = (
+        Index("ix_outbound_messages_due", "status", "next_attempt_at"),
+    )
+
+    idempotency_key = Column(String, nullable=False, unique=True)
+    phone_number = Column(String, nullable=False, index=True)
+    message_type = Column(String(16), nullable=False, default="text")
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(OutboundStatus), nullable=False, default=OutboundStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    external_id = Column(String, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,26 @@
+import uuid
+from sqlalchemy import Column, Integer, Boolean, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.base import Base
+
+
+class PriceObservation(Base):
+    """Append-only price history, one row per observed price change.
+
+    Partitioned by month on ``observed_at`` (see ``app.core.partitions``).
+    Rows are never updated; unchanged prices are not re-recorded.
+    """
+    __tablename__ = "price_observations"
+    __table_args__ = (
+        Index("ix_price_observations_observed_at_brin", "observed_at", postgresql_using="brin"),
+        Index("ix_price_observations_medication_observed", "medication_id", "observed_at"),
+        {"postgresql_partition_by": "RANGE (observed_at)"},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    observed_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    medication_id = Column(UUID(as_uuid=True), ForeignKey("medications.id"), nullable=False)
+    pharmacy_id = Column(UUID(as_uuid=True), ForeignKey("pharmacies.id"), nullable=False)
+    price = Column(Integer, nullable=False)  # CLP, no decimals
+    in_stock = Column(Boolean, nullable=False, default=True)
+    source = Column(String(16), nullable=False)
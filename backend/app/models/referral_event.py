@@ -1,7 +1,8 @@
 import enum
-from sqlalchemy import Column, String, Enum, ForeignKey
+import uuid
+from sqlalchemy import Column, String, Enum, ForeignKey, DateTime, Index, func
 from sqlalchemy.dialects.postgresql import UUID
-from app.models.base import Base, TimestampMixin
+from app.models.base import Base
 
 
 class ReferralEventType(str, enum.Enum):
@@ -12,8 +13,21 @@ class ReferralEventType(str, enum.Enum):
     payment_completed = "payment_completed"
 
 
-class ReferralEvent(TimestampMixin, Base):
+class ReferralEvent(Base):
+    """Append-only funnel event, written in batches by ``app.services.event_ingest``.
+
+    Partitioned by month on ``created_at`` (see ``app.core.partitions``) so
+    date-bounded funnel queries only scan the months they cover.
+    """
     __tablename__ = "referral_events"
+    __table_args__ = (
+        Index("ix_referral_events_created_at_brin", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)
     session_id = Column(String, nullable=True, index=True)
     medication_id = Column(UUID(as_uuid=True), ForeignKey("medications.id"), nullable=True, index=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, Date, Enum, ForeignKey, Integer, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.base import Base
+from app.models.referral_event import ReferralEventType
+
+
+class ReferralFunnelDaily(Base):
+    """Daily event counts per (event_type, medication, pharmacy), in UTC days.
+
+    Rebuilt from ``referral_events`` by ``app.services.funnel_rollups``.
+    """
+    __tablename__ = "referral_funnel_daily"
+    __table_args__ = (
+        Index("ix_referral_funnel_daily_day_type", "day", "event_type"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    event_type = Column(Enum(ReferralEventType), nullable=False)
+    medication_id = Column(UUID(as_uuid=True), ForeignKey("medications.id"), nullable=True)
+    pharmacy_id = Column(UUID(as_uuid=True), ForeignKey("pharmacies.id"), nullable=True)
+    events = Column(Integer, nullable=False, default=0)
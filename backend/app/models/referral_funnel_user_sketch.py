@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Enum, SmallInteger
+from app.models.base import Base
+from app.models.referral_event import ReferralEventType
+
+
+class ReferralFunnelUserSketch(Base):
+    """HyperLogLog registers of distinct users per (UTC day, event_type).
+
+    One row per non-empty register; sketches for several days merge by
+    taking the max ``rho`` per register (see ``app.services.funnel_rollups``).
+    """
+    __tablename__ = "referral_funnel_user_sketches"
+
+    day = Column(Date, primary_key=True)
+    event_type = Column(Enum(ReferralEventType), primary_key=True)
+    register = Column(SmallInteger, primary_key=True)
+    rho = Column(SmallInteger, nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, Float, String, func
+from app.models.base import Base
+
+
+class StatCounter(Base):
+    """Named dashboard counter (see ``app.services.stat_counters``).
+
+    Trigger-maintained counters are the row value plus any pending
+    ``StatCounterDelta`` rows; ETL-maintained counters are set outright.
+    """
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, Column, Float, String
+from app.models.base import Base
+
+
+class StatCounterDelta(Base):
+    """Append-only increments written by triggers, folded into StatCounter periodically.
+
+    Appending instead of updating the counter row keeps concurrent writers
+    (e.g. checkouts) from queueing on one row lock.
+    """
+    __tablename__ = "stat_counter_deltas"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, index=True)
+    delta = Column(Float, nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String
+from app.models.base import Base, TimestampMixin
+
+
+class WhatsappChatSession(TimestampMixin, Base):
+    """ServiceTsunami chat session reused for every message from a phone number."""
+    __tablename__ = "whatsapp_chat_sessions"
+
+    phone_number = Column(String, nullable=False, unique=True)
+    session_id = Column(String, nullable=False)
@@ -23,7 +23,19 @@ class PriceAlertOut(BaseModel):
 class PriceHistoryItem(BaseModel):
     date: str
     price: float
+    min_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    max_price: Optional[float] = None
+    pharmacy_chain: Optional[str] = None
+
+
+class PriceTrendItem(BaseModel):
     pharmacy_chain: Optional[str] = None
+    start_price: float
+    current_price: float
+    min_price: float
+    max_price: float
+    change_pct: float
 
 
 class GenericAlternative(BaseModel):
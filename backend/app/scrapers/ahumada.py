@@ -4,6 +4,7 @@ import re
 import httpx
 from bs4 import BeautifulSoup
 
+from app.core import metrics
 from app.scrapers.base import BaseScraper, ScrapedProduct
 
 
@@ -42,13 +43,14 @@ class AhumadaScraper(BaseScraper):
                 )
                 html = resp.text
 
-                # Primary: BeautifulSoup parsing
-                results = self._parse_with_bs4(html, source_url)
+                with metrics.timer(metrics.scraper_parse_duration, chain=self.CHAIN):
+                    # Primary: BeautifulSoup parsing
+                    results = self._parse_with_bs4(html, source_url)
 
-                # Fallback: regex if BS4 found nothing
-                if not results:
-                    self.logger.info("BS4 found 0 products for '%s', falling back to regex", query)
-                    results = self._parse_with_regex(html, source_url)
+                    # Fallback: regex if BS4 found nothing
+                    if not results:
+                        self.logger.info("BS4 found 0 products for '%s', falling back to regex", query)
+                        results = self._parse_with_regex(html, source_url)
 
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 403:
@@ -85,7 +87,8 @@ class AhumadaScraper(BaseScraper):
                     html = resp.text
                     source_url = f"{self.BASE_URL}/medicamentos?start={start}"
 
-                    page_products = self._parse_with_bs4(html, source_url)
+                    with metrics.timer(metrics.scraper_parse_duration, chain=self.CHAIN):
+                        page_products = self._parse_with_bs4(html, source_url)
 
                     if not page_products:
                         consecutive_empty += 1
@@ -5,6 +5,8 @@ from abc import ABC, abstractmethod
 
 import httpx
 
+from app.core import metrics
+
 
 @dataclass
 class ScrapedLocation:
@@ -40,34 +42,37 @@ class BaseLocationScraper(ABC):
         return isinstance(exc, (httpx.ConnectError, httpx.ReadTimeout))
 
     async def _get_with_retry(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                resp = await client.get(url, **kwargs)
-                resp.raise_for_status()
-                return resp
-            except (httpx.HTTPStatusError, httpx.ConnectError, httpx.ReadTimeout) as e:
-                if not self._is_retryable(e) or attempt == self.MAX_RETRIES - 1:
-                    raise
-                wait = 2 ** attempt
-                self.logger.warning("Retry %d/%d for %s: %s", attempt + 1, self.MAX_RETRIES, url, e)
-                await asyncio.sleep(wait)
+        with metrics.timer(metrics.scraper_fetch_duration, chain=self.CHAIN):
+            for attempt in range(self.MAX_RETRIES):
+                try:
+                    resp = await client.get(url, **kwargs)
+                    resp.raise_for_status()
+                    return resp
+                except (httpx.HTTPStatusError, httpx.ConnectError, httpx.ReadTimeout) as e:
+                    if not self._is_retryable(e) or attempt == self.MAX_RETRIES - 1:
+                        raise
+                    wait = 2 ** attempt
+                    self.logger.warning("Retry %d/%d for %s: %s", attempt + 1, self.MAX_RETRIES, url, e)
+                    await asyncio.sleep(wait)
 
     async def _post_with_retry(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                resp = await client.post(url, **kwargs)
-                resp.raise_for_status()
-                return resp
-            except (httpx.HTTPStatusError, httpx.ConnectError, httpx.ReadTimeout) as e:
-                if not self._is_retryable(e) or attempt == self.MAX_RETRIES - 1:
-                    raise
-                wait = 2 ** attempt
-                self.logger.warning("Retry %d/%d: %s", attempt + 1, self.MAX_RETRIES, e)
-                await asyncio.sleep(wait)
+        with metrics.timer(metrics.scraper_fetch_duration, chain=self.CHAIN):
+            for attempt in range(self.MAX_RETRIES):
+                try:
+                    resp = await client.post(url, **kwargs)
+                    resp.raise_for_status()
+                    return resp
+                except (httpx.HTTPStatusError, httpx.ConnectError, httpx.ReadTimeout) as e:
+                    if not self._is_retryable(e) or attempt == self.MAX_RETRIES - 1:
+                        raise
+                    wait = 2 ** attempt
+                    self.logger.warning("Retry %d/%d: %s", attempt + 1, self.MAX_RETRIES, e)
+                    await asyncio.sleep(wait)
 
     def _safe_json(self, response: httpx.Response) -> dict | list | None:
         try:
-            return response.json()
+            with metrics.timer(metrics.scraper_parse_duration, chain=self.CHAIN):
+                return response.json()
         except Exception as e:
             self.logger.error("JSON decode error for %s: %s", response.url, e)
             return None
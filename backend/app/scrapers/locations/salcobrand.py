@@ -4,6 +4,7 @@ import re
 import httpx
 from bs4 import BeautifulSoup
 
+from app.core import metrics
 from app.scrapers.locations.base import BaseLocationScraper, ScrapedLocation
 
 
@@ -44,7 +45,8 @@ class SalcobrandLocationScraper(BaseLocationScraper):
                         headers=self.HEADERS,
                     )
                     html = resp.text
-                    stores_on_page = self._parse_page(html, store_index, seen, seen_coords)
+                    with metrics.timer(metrics.scraper_parse_duration, chain=self.CHAIN):
+                        stores_on_page = self._parse_page(html, store_index, seen, seen_coords)
 
                     if not stores_on_page:
                         self.logger.info(
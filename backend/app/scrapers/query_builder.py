@@ -1,23 +1,7 @@
-import re
-
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.medication import Medication
-
-
-def _clean_ingredient(raw: str) -> str:
-    """Clean Cenabast-style ingredient names for pharmacy search.
-
-    Strips numeric prefixes like '1-' or '1.1-', removes dosage info,
-    and normalizes whitespace.
-    """
-    # Remove leading numeric prefix (e.g., "1-aciclovir", "1.1-escitalopram")
-    cleaned = re.sub(r"^[\d.]+[-]", "", raw.strip())
-    # Remove parenthetical suffixes (e.g., "paracetamol (como sodio)")
-    cleaned = re.sub(r"\s*\(.*?\)\s*", " ", cleaned)
-    # Remove dosage/form info (anything after %, mg, ml, etc.)
-    cleaned = re.sub(r"\s+\d+[\.,]?\d*\s*(%|mg|ml|mcg|ui|g(?!\w)).*", "", cleaned, flags=re.IGNORECASE)
-    return cleaned.strip()
+from app.utils.normalize import clean_ingredient
 
 
 def build_search_queries(db: Session, limit: int = 200) -> list[str]:
@@ -35,7 +19,7 @@ def build_search_queries(db: Session, limit: int = 200) -> list[str]:
     for (ing,) in ingredients:
         if not ing or not ing.strip():
             continue
-        cleaned = _clean_ingredient(ing)
+        cleaned = clean_ingredient(ing)
         if cleaned and len(cleaned) >= 3:
             queries.add(cleaned)
 
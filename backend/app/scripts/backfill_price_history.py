@@ -0,0 +1,52 @@
+"""
+Seed price_observations with the current prices table.
+
+Run once after deploying the price history table so every existing price
+has an opening observation; later ETL runs only append changes.
+
+Usage:
+    python -m app.scripts.backfill_price_history
+"""
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.core.partitions import ensure_monthly_partition
+from app.services.price_history import TABLE, ensure_partitions
+
+OBSERVED_AT = "COALESCE(p.scraped_at, p.updated_at, now())"
+
+
+def backfill_price_history():
+    db: Session = SessionLocal()
+    try:
+        existing = db.execute(text(f"SELECT count(*) FROM {TABLE}")).scalar()
+        if existing:
+            print(f"{TABLE} already has {existing} rows — nothing to do.")
+            return
+
+        ensure_partitions(db)
+        months = db.execute(text(
+            f"SELECT DISTINCT date_trunc('month', {OBSERVED_AT})::date FROM prices p"
+        )).scalars().all()
+        for month in months:
+            ensure_monthly_partition(db, TABLE, month)
+        print(f"Ensured {len(months)} monthly partitions")
+
+        inserted = db.execute(text(f"""
+            INSERT INTO {TABLE}
+                (id, observed_at, medication_id, pharmacy_id, price, in_stock, source)
+            SELECT gen_random_uuid(), {OBSERVED_AT}, p.medication_id, p.pharmacy_id,
+                   round(p.price)::int, COALESCE(p.in_stock, true),
+                   CASE WHEN p.source_url = 'cenabast' THEN 'cenabast' ELSE 'scrape' END
+            FROM prices p
+        """)).rowcount
+        db.commit()
+        print(f"Done. Seeded {inserted} price observations.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    backfill_price_history()
@@ -0,0 +1,91 @@
+"""
+Benchmark product-name normalization on the real invoice product names.
+
+Runs the previous (uncompiled, unmemoized) parser and the shared
+``app.utils.normalize`` parser over every ``nombre_producto_comercial`` in
+cenabast_invoices, checks both agree, and prints throughput.
+
+Usage:
+    python -m app.scripts.benchmark_normalize [--limit N]
+"""
+
+import argparse
+import re
+import time
+
+from app.core.database import SessionLocal
+from app.models.cenabast_invoice import CenabastInvoice
+from app.utils import normalize
+
+
+def _legacy_parse_product_name(name):
+    """Pre-normalize implementation, kept here as the baseline."""
+    if not name:
+        return None, None, None
+    dosage_match = re.search(
+        r'(\d+[\.,]?\d*)\s*(MG|MCG|G|ML|UI|UG)(?:/(\d+[\.,]?\d*)\s*(ML|MG|G))?',
+        name, re.IGNORECASE
+    )
+    dosage = None
+    if dosage_match:
+        amt = dosage_match.group(1).replace(",", ".")
+        unit = dosage_match.group(2).lower()
+        dosage = f"{amt}{unit}"
+        if dosage_match.group(3):
+            amt2 = dosage_match.group(3).replace(",", ".")
+            unit2 = dosage_match.group(4).lower()
+            dosage += f"/{amt2}{unit2}"
+    name_match = re.match(r'^([A-Za-zÁÉÍÓÚÑáéíóúñ\s\-\.]+)', name)
+    drug_name = name_match.group(1).strip().title() if name_match else name.split()[0].title()
+    form = None
+    name_upper = name.upper()
+    for key, value in normalize.FORMS_MAP.items():
+        if key in name_upper:
+            form = value
+            break
+    return drug_name, dosage, form
+
+
+def _load_names(limit: int | None) -> list[str]:
+    db = SessionLocal()
+    try:
+        q = db.query(CenabastInvoice.nombre_producto_comercial).filter(
+            CenabastInvoice.nombre_producto_comercial.isnot(None)
+        )
+        if limit:
+            q = q.limit(limit)
+        return [name for (name,) in q.yield_per(10000)]
+    finally:
+        db.close()
+
+
+def _time(fn, names: list[str]) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = [fn(name) for name in names]
+    return time.perf_counter() - start, results
+
+
+def benchmark(limit: int | None = None) -> None:
+    names = _load_names(limit)
+    if not names:
+        print("No invoice product names found — import cenabast_invoices first.")
+        return
+    print(f"{len(names)} product names ({len(set(names))} distinct)")
+
+    normalize.parse_product_name.cache_clear()
+    legacy_s, legacy = _time(_legacy_parse_product_name, names)
+    cold_s, current = _time(normalize.parse_product_name, names)
+    warm_s, _ = _time(normalize.parse_product_name, names)
+
+    mismatches = sum(1 for a, b in zip(legacy, current) if tuple(a) != tuple(b))
+    for label, seconds in (("legacy", legacy_s), ("compiled (cold cache)", cold_s), ("compiled (warm cache)", warm_s)):
+        print(f"  {label:<22} {seconds:8.3f}s  {len(names) / seconds:>12,.0f} names/s")
+    print(f"  speedup: {legacy_s / cold_s:.1f}x cold, {legacy_s / warm_s:.1f}x warm")
+    print(f"  cache: {normalize.parse_product_name.cache_info()}")
+    print(f"  mismatches vs legacy: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N invoice rows")
+    benchmark(parser.parse_args().limit)
@@ -0,0 +1,91 @@
+"""
+Local stand-in for the ServiceTsunami API, for exercising WhatsApp flows
+without the real orchestration stack.
+
+Implements login, task creation (honouring ``Idempotency-Key``), task lookup
+and chat sessions; created tasks are kept in memory and logged.
+Set STUB_FAIL_RATE (0-1) to make task creation return 503 at random, to
+exercise the outbound queue's retries.
+
+Usage:
+    uvicorn app.scripts.servicetsunami_stub:app --port 8001
+    # then SERVICETSUNAMI_API_URL=http://localhost:8001
+"""
+
+import logging
+import os
+import random
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+logger = logging.getLogger("servicetsunami_stub")
+
+app = FastAPI(title="ServiceTsunami stub")
+
+FAIL_RATE = float(os.environ.get("STUB_FAIL_RATE", "0"))
+TOKEN = "stub-token"
+
+tasks: dict[str, dict] = {}
+tasks_by_key: dict[str, str] = {}
+sessions: dict[str, list[dict]] = {}
+
+
+def _check_auth(authorization: str | None) -> None:
+    if authorization != f"Bearer {TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+@app.post("/api/v1/auth/login")
+async def login():
+    return {"access_token": TOKEN, "token_type": "bearer"}
+
+
+@app.post("/api/v1/tasks")
+async def create_task(
+    request: Request,
+    authorization: str | None = Header(None),
+    idempotency_key: str | None = Header(None),
+):
+    _check_auth(authorization)
+    if idempotency_key and idempotency_key in tasks_by_key:
+        return tasks[tasks_by_key[idempotency_key]]
+    if random.random() < FAIL_RATE:
+        raise HTTPException(status_code=503, detail="Injected failure")
+
+    body = await request.json()
+    task = {"id": str(uuid.uuid4()), "status": "completed", **body}
+    tasks[task["id"]] = task
+    if idempotency_key:
+        tasks_by_key[idempotency_key] = task["id"]
+    payload = body.get("context", {}).get("payload", {})
+    logger.warning("WhatsApp → %s: %s", payload.get("recipient_phone"),
+                   payload.get("message_body") or payload.get("template_name"))
+    return task
+
+
+@app.get("/api/v1/tasks/{task_id}")
+async def get_task(task_id: str, authorization: str | None = Header(None)):
+    _check_auth(authorization)
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return tasks[task_id]
+
+
+@app.post("/api/v1/chat/sessions")
+async def create_chat_session(request: Request, authorization: str | None = Header(None)):
+    _check_auth(authorization)
+    body = await request.json()
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = []
+    return {"id": session_id, "title": body.get("title")}
+
+
+@app.post("/api/v1/chat/sessions/{session_id}/messages")
+async def send_chat_message(session_id: str, request: Request, authorization: str | None = Header(None)):
+    _check_auth(authorization)
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    body = await request.json()
+    sessions[session_id].append(body)
+    return {"assistant_message": {"content": f"(stub) Recibido: {body.get('content', '')[-200:]}"}}
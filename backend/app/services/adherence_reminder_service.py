@@ -1,56 +1,64 @@
 import logging
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from app.models.adherence_enrollment import AdherenceEnrollment, EnrollmentStatus
-from app.models.adherence_refill import AdherenceRefill, RefillStatus
+from app.models.adherence_enrollment import AdherenceEnrollment
+from app.models.adherence_refill import AdherenceRefill
 from app.models.adherence_program import AdherenceProgram
 from app.models.user import User
-from app.services import whatsapp
+from app.services import outbound_queue, whatsapp
 
 logger = logging.getLogger(__name__)
 
 
+ENQUEUE_CHUNK_SIZE = 1000
+
+# Stamps reminder_sent_at and returns what the message needs in one pass, so
+# a refill is reminded once even if two sweeps overlap.
+_CLAIM_REMINDERS_SQL = text("""
+    UPDATE adherence_refills r
+    SET reminder_sent_at = :now, updated_at = now()
+    FROM adherence_enrollments e, users u, adherence_programs p
+    WHERE r.enrollment_id = e.id
+      AND u.id = e.user_id
+      AND p.id = e.program_id
+      AND r.status = 'pending'
+      AND r.due_date > :now
+      AND r.due_date <= :window_end
+      AND r.reminder_sent_at IS NULL
+      AND e.status = 'active'
+      AND e.whatsapp_consent
+    RETURNING r.id, r.due_date, u.phone_number, p.name AS program_name, e.current_discount_pct
+""")
+
+
 async def send_refill_reminders(db: Session):
+    """Queue reminders for refills due within 3 days.
+
+    One UPDATE claims the refills and returns phone, program and discount;
+    messages are queued in chunked INSERTs in the same transaction and sent
+    concurrently by the outbound worker.
+    """
     now = datetime.now(timezone.utc)
-    reminder_window = now + timedelta(days=3)
-
-    pending = db.query(AdherenceRefill, AdherenceEnrollment).join(
-        AdherenceEnrollment, AdherenceRefill.enrollment_id == AdherenceEnrollment.id
-    ).filter(
-        AdherenceRefill.status == RefillStatus.pending,
-        AdherenceRefill.due_date <= reminder_window,
-        AdherenceRefill.due_date > now,
-        AdherenceRefill.reminder_sent_at.is_(None),
-        AdherenceEnrollment.status == EnrollmentStatus.active,
-        AdherenceEnrollment.whatsapp_consent == True,
-    ).all()
-
-    count = 0
-    for refill, enrollment in pending:
-        user = db.query(User).filter(User.id == enrollment.user_id).first()
-        program = db.query(AdherenceProgram).filter(AdherenceProgram.id == enrollment.program_id).first()
-
-        if not user or not program:
-            continue
-
-        days_until = (refill.due_date.replace(tzinfo=timezone.utc) - now).days
-
-        try:
-            await whatsapp.send_refill_reminder(
-                user.phone_number,
-                program.name,
-                days_until,
-                enrollment.current_discount_pct,
-            )
-            refill.reminder_sent_at = now
-            count += 1
-        except Exception:
-            logger.exception("Failed to send reminder to %s", user.phone_number)
-
-    if count > 0:
-        db.commit()
-    return {"reminders_sent": count}
+    rows = db.execute(_CLAIM_REMINDERS_SQL, {
+        "now": now, "window_end": now + timedelta(days=3),
+    }).fetchall()
+
+    messages = [
+        outbound_queue.text_message(
+            r.phone_number,
+            whatsapp.refill_reminder_message(r.program_name, (r.due_date - now).days, r.current_discount_pct),
+            idempotency_key=f"refill_reminder:{r.id}",
+        )
+        for r in rows
+    ]
+    for start in range(0, len(messages), ENQUEUE_CHUNK_SIZE):
+        outbound_queue.enqueue_many(db, messages[start:start + ENQUEUE_CHUNK_SIZE])
+    db.commit()
+    if messages:
+        outbound_queue.notify()
+    return {"reminders_sent": len(messages)}
 
 
 async def send_refill_confirmation(db: Session, refill_id: str):
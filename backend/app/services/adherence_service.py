@@ -1,16 +1,15 @@
 import logging
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import func
+from sqlalchemy import func, text
 from sqlalchemy.orm import Session
 
 from app.models.adherence_program import AdherenceProgram
-from app.models.adherence_discount_tier import AdherenceDiscountTier
 from app.models.adherence_enrollment import AdherenceEnrollment, EnrollmentStatus
 from app.models.adherence_refill import AdherenceRefill, RefillStatus
 from app.models.adherence_sponsor import AdherenceSponsor
 from app.models.adherence_sponsor_charge import AdherenceSponsorCharge, ChargeType
-from app.models.pharmacy_discount_cap import PharmacyDiscountCap
 from app.models.order_item import OrderItem
+from app.services import discount_tiers
 
 logger = logging.getLogger(__name__)
 
@@ -97,7 +96,7 @@ def record_refill(db: Session, enrollment_id: str, order_id: str):
             enrollment.consecutive_on_time = 0
             enrollment.total_late += 1
 
-        discount_pct = get_current_discount(db, enrollment_id)
+        discount_pct = discount_for_enrollment(db, enrollment)
         pending_refill.discount_pct_applied = discount_pct
 
         enrollment.total_refills += 1
@@ -116,7 +115,7 @@ def record_refill(db: Session, enrollment_id: str, order_id: str):
         enrollment.total_refills += 1
 
     enrollment.adherence_score = calculate_adherence_score(enrollment)
-    enrollment.current_discount_pct = get_current_discount(db, enrollment_id)
+    enrollment.current_discount_pct = discount_for_enrollment(db, enrollment)
 
     if program:
         enrollment.next_refill_due = now + timedelta(days=program.refill_interval_days)
@@ -158,36 +157,14 @@ def get_current_discount(db: Session, enrollment_id: str):
     ).first()
     if not enrollment:
         return 0
+    return discount_for_enrollment(db, enrollment)
 
-    tier = db.query(AdherenceDiscountTier).filter(
-        AdherenceDiscountTier.program_id == enrollment.program_id,
-        AdherenceDiscountTier.min_consecutive_refills <= enrollment.consecutive_on_time,
-    ).order_by(
-        AdherenceDiscountTier.min_consecutive_refills.desc()
-    ).first()
-
-    if not tier:
-        return 0
-
-    discount = tier.discount_pct
 
-    # Cap at program max
-    program = db.query(AdherenceProgram).filter(
-        AdherenceProgram.id == enrollment.program_id
-    ).first()
-    if program:
-        discount = min(discount, program.max_discount_pct)
-
-    # Cap at pharmacy partner max
-    if enrollment.pharmacy_partner_id:
-        cap = db.query(PharmacyDiscountCap).filter(
-            PharmacyDiscountCap.pharmacy_partner_id == enrollment.pharmacy_partner_id,
-            PharmacyDiscountCap.program_id == enrollment.program_id,
-        ).first()
-        if cap:
-            discount = min(discount, cap.max_discount_pct)
-
-    return discount
+def discount_for_enrollment(db: Session, enrollment) -> float:
+    """Discount for a loaded enrollment, from the in-memory tier snapshot."""
+    return discount_tiers.resolve(
+        db, enrollment.program_id, enrollment.consecutive_on_time, enrollment.pharmacy_partner_id
+    )
 
 
 def apply_adherence_discount(db: Session, user_id: str, medication_id: str, base_price: float):
@@ -202,7 +179,7 @@ def apply_adherence_discount(db: Session, user_id: str, medication_id: str, base
     if not enrollment:
         return {"discount_pct": 0, "discount_amount": 0, "final_price": base_price}
 
-    discount_pct = get_current_discount(db, str(enrollment.id))
+    discount_pct = discount_for_enrollment(db, enrollment)
     discount_amount = round(base_price * discount_pct, 0)
     final_price = base_price - discount_amount
 
@@ -214,34 +191,67 @@ def apply_adherence_discount(db: Session, user_id: str, medication_id: str, base
     }
 
 
-def check_missed_refills(db: Session):
-    now = datetime.now(timezone.utc)
-    overdue = db.query(AdherenceRefill).join(
-        AdherenceEnrollment, AdherenceRefill.enrollment_id == AdherenceEnrollment.id
-    ).join(
-        AdherenceProgram, AdherenceEnrollment.program_id == AdherenceProgram.id
-    ).filter(
-        AdherenceRefill.status == RefillStatus.pending,
-        AdherenceRefill.due_date < now - timedelta(days=5),
-    ).all()
-
-    count = 0
-    for refill in overdue:
-        refill.status = RefillStatus.missed
+def ensure_adherence_indexes(db: Session) -> None:
+    """Partial index behind the missed-refill and reminder sweeps (idempotent)."""
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_adherence_refills_pending_due "
+        "ON adherence_refills (due_date) WHERE status = 'pending'"
+    ))
+
+
+_MARK_MISSED_SQL = text("""
+    WITH missed AS (
+        UPDATE adherence_refills r
+        SET status = 'missed', updated_at = now()
+        FROM adherence_enrollments e
+        JOIN adherence_programs p ON p.id = e.program_id
+        WHERE r.enrollment_id = e.id
+          AND r.status = 'pending'
+          AND r.due_date < :cutoff
+        RETURNING r.enrollment_id
+    ), per_enrollment AS (
+        SELECT enrollment_id, count(*) AS n FROM missed GROUP BY enrollment_id
+    )
+    UPDATE adherence_enrollments e
+    SET total_missed = e.total_missed + m.n,
+        consecutive_on_time = 0,
+        adherence_score = round(
+            ((e.total_on_time + 0.5 * e.total_late)
+             / (e.total_on_time + e.total_late + e.total_missed + m.n) * 100)::numeric, 1
+        ),
+        updated_at = now()
+    FROM per_enrollment m
+    WHERE e.id = m.enrollment_id
+    RETURNING e.id, e.program_id, e.pharmacy_partner_id, m.n
+""")
 
-        enrollment = db.query(AdherenceEnrollment).filter(
-            AdherenceEnrollment.id == refill.enrollment_id
-        ).first()
-        if enrollment:
-            enrollment.total_missed += 1
-            enrollment.consecutive_on_time = 0
-            enrollment.adherence_score = calculate_adherence_score(enrollment)
-            enrollment.current_discount_pct = get_current_discount(db, str(enrollment.id))
-        count += 1
 
-    if count > 0:
-        db.commit()
-    return {"missed_count": count}
+def check_missed_refills(db: Session):
+    """Mark overdue refills missed and reset their enrollments' streaks.
+
+    Refills, streaks and scores are updated by one set-based statement;
+    the new (streak 0) discounts come from the tier snapshot and are
+    written back with a single ``UPDATE ... FROM unnest``.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=5)
+    rows = db.execute(_MARK_MISSED_SQL, {"cutoff": cutoff}).fetchall()
+    if not rows:
+        return {"missed_count": 0}
+
+    programs = discount_tiers.get_programs(db)
+    ids, discounts = [], []
+    for r in rows:
+        program = programs.get(r.program_id)
+        ids.append(r.id)
+        discounts.append(program.discount_for(0, r.pharmacy_partner_id) if program else 0)
+    db.execute(text("""
+        UPDATE adherence_enrollments e
+        SET current_discount_pct = v.pct
+        FROM unnest(CAST(:ids AS uuid[]), CAST(:pcts AS float8[])) AS v(id, pct)
+        WHERE e.id = v.id
+    """), {"ids": ids, "pcts": discounts})
+    db.commit()
+    return {"missed_count": sum(r.n for r in rows)}
 
 
 def get_user_adherence_dashboard(db: Session, user_id: str):
@@ -2,40 +2,28 @@ from sqlalchemy import func, distinct, case, cast, String
 from sqlalchemy.orm import Session
 
 from app.models.bms_distribution import BmsDistribution
-from app.models.bms_purchase_order import BmsPurchaseOrder
-from app.models.bms_adjudication import BmsAdjudication
-from app.models.bms_institution import BmsInstitution
 from app.models.cenabast_product import CenabastProduct
 from app.models.cenabast_invoice import CenabastInvoice
-from app.models.medication import Medication
+from app.services import stat_counters
+from app.services.demand_grid import REGION_POPULATION, match_region, region_totals
 
 
 # ── BMS Analytics ──────────────────────────────────────────────
 
 
 def get_dashboard_summary(db: Session):
-    bms_dist = db.query(func.count(BmsDistribution.id)).scalar() or 0
-    bms_po = db.query(func.count(BmsPurchaseOrder.id)).scalar() or 0
-    bms_adj = db.query(func.count(BmsAdjudication.id)).scalar() or 0
-    bms_inst = db.query(func.count(BmsInstitution.id)).scalar() or 0
-    bms_rev = db.query(func.coalesce(func.sum(BmsDistribution.net_amount), 0)).scalar()
-
-    cn_prod = db.query(func.count(CenabastProduct.id)).scalar() or 0
-    cn_inv = db.query(func.count(CenabastInvoice.id)).scalar() or 0
-    cn_rev = db.query(func.coalesce(func.sum(CenabastInvoice.monto_bruto), 0)).scalar()
-
-    total_drugs = db.query(func.count(Medication.id)).scalar() or 0
-
+    """Import-time counters for BMS/Cenabast plus the catalog size estimate."""
+    counters = stat_counters.get_snapshot(db)
     return {
-        "bms_distribution_records": bms_dist,
-        "bms_purchase_orders": bms_po,
-        "bms_adjudications": bms_adj,
-        "bms_institutions": bms_inst,
-        "bms_total_revenue": float(bms_rev),
-        "cenabast_products": cn_prod,
-        "cenabast_invoices": cn_inv,
-        "cenabast_total_revenue": float(cn_rev),
-        "total_drugs": total_drugs,
+        "bms_distribution_records": int(counters.get("bms_distributions")),
+        "bms_purchase_orders": int(counters.get("bms_purchase_orders")),
+        "bms_adjudications": int(counters.get("bms_adjudications")),
+        "bms_institutions": int(counters.get("bms_institutions")),
+        "bms_total_revenue": float(counters.get("bms_revenue")),
+        "cenabast_products": int(counters.get("cenabast_products")),
+        "cenabast_invoices": int(counters.get("cenabast_invoices")),
+        "cenabast_total_revenue": float(counters.get("cenabast_revenue")),
+        "total_drugs": counters.row_estimates.get("medications", 0),
     }
 
 
@@ -287,80 +275,28 @@ def get_cenabast_top_products(db: Session, limit: int = 20):
 
 
 def get_regional_demand_heatmap(db: Session, product: str = None):
-    """Combine CenabastInvoice + BmsDistribution by region for demand heatmap."""
-    # Chilean region populations (2024 estimates)
-    region_population = {
-        "METROPOLITANA": 8125072,
-        "VALPARAISO": 1960170,
-        "BIOBIO": 1663696,
-        "MAULE": 1131939,
-        "ARAUCANIA": 1014343,
-        "O'HIGGINS": 991063,
-        "LOS LAGOS": 891440,
-        "COQUIMBO": 836096,
-        "ANTOFAGASTA": 691854,
-        "TARAPACA": 382773,
-        "LOS RIOS": 405835,
-        "ATACAMA": 316692,
-        "NUBLE": 511551,
-        "MAGALLANES": 178362,
-        "ARICA Y PARINACOTA": 252110,
-        "AYSEN": 107334,
-    }
-
-    cenabast_q = db.query(
-        CenabastInvoice.region_solicitante.label("region"),
-        func.sum(CenabastInvoice.cantidad_unitaria).label("cenabast_units"),
-        func.sum(CenabastInvoice.monto_bruto).label("cenabast_revenue"),
-    ).filter(
-        CenabastInvoice.region_solicitante.isnot(None)
-    ).group_by(CenabastInvoice.region_solicitante)
-
-    if product:
-        cenabast_q = cenabast_q.filter(
-            CenabastInvoice.nombre_material_generico.ilike(f"%{product}%")
-        )
-
-    cenabast_data = {r.region: {"units": int(r.cenabast_units or 0), "revenue": float(r.cenabast_revenue or 0)} for r in cenabast_q.all()}
-
-    bms_q = db.query(
-        BmsDistribution.region.label("region"),
-        func.sum(BmsDistribution.unit_quantity).label("bms_units"),
-        func.sum(BmsDistribution.net_amount).label("bms_revenue"),
-    ).filter(
-        BmsDistribution.region.isnot(None)
-    ).group_by(BmsDistribution.region)
-
-    if product:
-        bms_q = bms_q.filter(BmsDistribution.active_ingredient.ilike(f"%{product}%"))
-
-    bms_data = {r.region: {"units": int(r.bms_units or 0), "revenue": float(r.bms_revenue or 0)} for r in bms_q.all()}
+    """Combine CenabastInvoice + BmsDistribution by region for demand heatmap.
 
-    all_regions = set(cenabast_data.keys()) | set(bms_data.keys())
+    Reads the precomputed demand grid (see ``app.services.demand_grid``).
+    """
     results = []
-    for region in all_regions:
-        cn = cenabast_data.get(region, {"units": 0, "revenue": 0})
-        bm = bms_data.get(region, {"units": 0, "revenue": 0})
-        total_units = cn["units"] + bm["units"]
-        total_revenue = cn["revenue"] + bm["revenue"]
-
-        pop = 0
-        region_upper = region.upper() if region else ""
-        for key, val in region_population.items():
-            if key in region_upper or region_upper in key:
-                pop = val
-                break
+    for r in region_totals(db, product=product):
+        cn_units, bm_units = int(r.cenabast_units), int(r.bms_units)
+        cn_revenue, bm_revenue = float(r.cenabast_revenue), float(r.bms_revenue)
+        total_units = cn_units + bm_units
 
+        key = match_region(r.region)
+        pop = REGION_POPULATION[key] if key else 0
         per_capita = round(total_units / pop, 2) if pop > 0 else 0
 
         results.append({
-            "region": region,
-            "cenabast_units": cn["units"],
-            "cenabast_revenue": cn["revenue"],
-            "bms_units": bm["units"],
-            "bms_revenue": bm["revenue"],
+            "region": r.region,
+            "cenabast_units": cn_units,
+            "cenabast_revenue": cn_revenue,
+            "bms_units": bm_units,
+            "bms_revenue": bm_revenue,
             "total_units": total_units,
-            "total_revenue": total_revenue,
+            "total_revenue": cn_revenue + bm_revenue,
             "population": pop,
             "per_capita_units": per_capita,
         })
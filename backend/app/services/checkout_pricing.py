@@ -0,0 +1,146 @@
+"""
+Checkout pricing: price a whole cart in a fixed number of queries.
+
+``price_cart`` resolves every item's price (by ``price_id``, falling back to
+the medication's price at the order's pharmacy) and the user's active
+adherence enrollments for those medications, applies the discount rules
+from the in-memory ``discount_tiers`` snapshot, and returns a ``PricedCart``
+before anything is persisted.
+"""
+
+import uuid
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import Session
+
+from app.models.adherence_enrollment import AdherenceEnrollment, EnrollmentStatus
+from app.models.adherence_program import AdherenceProgram
+from app.models.price import Price
+from app.services import discount_tiers
+
+
+class PriceNotFoundError(LookupError):
+    def __init__(self, medication_id):
+        super().__init__(f"Price not found for medication {medication_id}")
+        self.medication_id = medication_id
+
+
+@dataclass
+class PricedItem:
+    medication_id: uuid.UUID
+    price_id: uuid.UUID
+    quantity: int
+    unit_price: float
+    base_price: float
+    discount_pct: float = 0
+    discount_amount: float = 0
+    enrollment_id: uuid.UUID | None = None
+
+    @property
+    def subtotal(self) -> float:
+        return self.base_price - self.discount_amount
+
+
+@dataclass
+class PricedCart:
+    pharmacy_id: uuid.UUID
+    items: list[PricedItem] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return sum(item.subtotal for item in self.items)
+
+    @property
+    def discount_total(self) -> float:
+        return sum(item.discount_amount for item in self.items)
+
+
+def _load_prices(db: Session, pharmacy_id, items) -> dict:
+    """(price_id, medication_id) -> Price per item: one query, plus one for fallbacks."""
+    by_id = {
+        p.id: p for p in db.query(Price).filter(Price.id.in_({i.price_id for i in items}))
+    }
+    resolved = {}
+    missing = set()
+    for item in items:
+        price = by_id.get(item.price_id)
+        if price is not None:
+            resolved[item.price_id] = price
+        else:
+            missing.add(item.medication_id)
+
+    fallback = {}
+    if missing:
+        rows = db.query(Price).filter(
+            Price.medication_id.in_(missing),
+            Price.pharmacy_id == pharmacy_id,
+        ).distinct(Price.medication_id).order_by(Price.medication_id)
+        fallback = {p.medication_id: p for p in rows}
+
+    prices = {}
+    for item in items:
+        price = resolved.get(item.price_id) or fallback.get(item.medication_id)
+        if price is None:
+            raise PriceNotFoundError(item.medication_id)
+        prices[(item.price_id, item.medication_id)] = price
+    return prices
+
+
+def _enrollment_discounts(db: Session, user_id, medication_ids: set) -> dict:
+    """medication_id -> (enrollment_id, discount_pct) for active enrollments."""
+    enrollments = db.query(
+        AdherenceEnrollment.id,
+        AdherenceEnrollment.program_id,
+        AdherenceEnrollment.pharmacy_partner_id,
+        AdherenceEnrollment.consecutive_on_time,
+        AdherenceProgram.medication_id,
+    ).join(
+        AdherenceProgram, AdherenceEnrollment.program_id == AdherenceProgram.id
+    ).filter(
+        AdherenceEnrollment.user_id == user_id,
+        AdherenceProgram.medication_id.in_(medication_ids),
+        AdherenceEnrollment.status == EnrollmentStatus.active,
+    ).all()
+    if not enrollments:
+        return {}
+
+    programs = discount_tiers.get_programs(db)
+    discounts = {}
+    for e in enrollments:
+        if e.medication_id in discounts:
+            continue
+        program = programs.get(e.program_id)
+        pct = program.discount_for(e.consecutive_on_time, e.pharmacy_partner_id) if program else 0
+        discounts[e.medication_id] = (e.id, pct)
+    return discounts
+
+
+def price_cart(db: Session, user_id, pharmacy_id, items) -> PricedCart:
+    """Price ``items`` (``OrderItemCreate``-like) for ``user_id``.
+
+    Raises ``PriceNotFoundError`` when an item has no price.
+    """
+    if not items:
+        return PricedCart(pharmacy_id=pharmacy_id)
+
+    prices = _load_prices(db, pharmacy_id, items)
+    discounts = _enrollment_discounts(db, user_id, {item.medication_id for item in items})
+
+    cart = PricedCart(pharmacy_id=pharmacy_id)
+    for item in items:
+        price = prices[(item.price_id, item.medication_id)]
+        base_price = price.price * item.quantity
+        priced = PricedItem(
+            medication_id=item.medication_id,
+            price_id=price.id,
+            quantity=item.quantity,
+            unit_price=price.price,
+            base_price=base_price,
+        )
+        enrollment = discounts.get(item.medication_id)
+        if enrollment:
+            priced.enrollment_id, priced.discount_pct = enrollment
+            priced.discount_amount = round(base_price * priced.discount_pct, 0)
+        cart.items.append(priced)
+    return cart
+
@@ -1,8 +1,9 @@
-from sqlalchemy import func, cast, String, distinct
+from sqlalchemy import func, cast, String, text
 from sqlalchemy.orm import Session
 
 from app.models.bms_distribution import BmsDistribution
-from app.models.bms_adjudication import BmsAdjudication
+from app.models.bms_provider_monthly import BmsProviderMonthly
+from app.models.bms_supplier_bids_monthly import BmsSupplierBidsMonthly
 
 
 def get_market_share_trends(db: Session, product: str = None, months: int = 24):
@@ -32,99 +33,91 @@ def get_market_share_trends(db: Session, product: str = None, months: int = 24):
     return results
 
 
-def get_supplier_win_rates(db: Session, supplier: str = None):
-    q = db.query(
-        BmsAdjudication.corp_proveedor.label("supplier"),
-        func.count(BmsAdjudication.id).label("total_bids"),
-        func.sum(
-            func.cast(
-                BmsAdjudication.estado.ilike("%adjudicad%"),
-                db.bind.dialect.type_descriptor(type(1)) if db.bind else type(1),
-            )
-        ),
-    ).filter(
-        BmsAdjudication.corp_proveedor.isnot(None),
-    ).group_by(BmsAdjudication.corp_proveedor)
+def refresh_rollups(db: Session):
+    """Rebuild the per-provider monthly rollups from the raw BMS tables.
+
+    Called by ``bms_import`` inside its transaction; the caller commits.
+    """
+    db.execute(text("DELETE FROM bms_provider_monthly"))
+    db.execute(text("""
+        INSERT INTO bms_provider_monthly
+            (id, provider_name, month, first_delivery, units, revenue, row_count)
+        SELECT gen_random_uuid(), provider_name,
+               date_trunc('month', delivery_date)::date,
+               min(delivery_date),
+               COALESCE(sum(unit_quantity), 0),
+               COALESCE(sum(net_amount), 0),
+               count(*)
+        FROM bms_distributions
+        WHERE provider_name IS NOT NULL
+        GROUP BY provider_name, date_trunc('month', delivery_date)
+    """))
+
+    db.execute(text("DELETE FROM bms_supplier_bids_monthly"))
+    db.execute(text("""
+        INSERT INTO bms_supplier_bids_monthly (id, supplier, month, bids, wins)
+        SELECT gen_random_uuid(), corp_proveedor,
+               date_trunc('month', fecha_adjudicacion)::date,
+               count(*),
+               count(*) FILTER (WHERE estado ILIKE '%adjudicad%')
+        FROM bms_adjudications
+        WHERE corp_proveedor IS NOT NULL
+        GROUP BY corp_proveedor, date_trunc('month', fecha_adjudicacion)
+    """))
 
-    if supplier:
-        q = q.filter(BmsAdjudication.corp_proveedor.ilike(f"%{supplier}%"))
 
-    # Simpler approach: query total and wins separately
-    total_q = db.query(
-        BmsAdjudication.corp_proveedor.label("supplier"),
-        func.count(BmsAdjudication.id).label("total_bids"),
-    ).filter(
-        BmsAdjudication.corp_proveedor.isnot(None),
-    ).group_by(BmsAdjudication.corp_proveedor)
-
-    wins_q = db.query(
-        BmsAdjudication.corp_proveedor.label("supplier"),
-        func.count(BmsAdjudication.id).label("wins"),
-    ).filter(
-        BmsAdjudication.corp_proveedor.isnot(None),
-        BmsAdjudication.estado.ilike("%adjudicad%"),
-    ).group_by(BmsAdjudication.corp_proveedor)
+def get_supplier_win_rates(db: Session, supplier: str = None):
+    total_bids = func.sum(BmsSupplierBidsMonthly.bids)
+    wins = func.sum(BmsSupplierBidsMonthly.wins)
+    q = db.query(
+        BmsSupplierBidsMonthly.supplier,
+        total_bids.label("total_bids"),
+        wins.label("wins"),
+    ).group_by(BmsSupplierBidsMonthly.supplier)
 
     if supplier:
-        total_q = total_q.filter(BmsAdjudication.corp_proveedor.ilike(f"%{supplier}%"))
-        wins_q = wins_q.filter(BmsAdjudication.corp_proveedor.ilike(f"%{supplier}%"))
+        q = q.filter(BmsSupplierBidsMonthly.supplier.ilike(f"%{supplier}%"))
 
-    totals = {r.supplier: r.total_bids for r in total_q.all()}
-    wins = {r.supplier: r.wins for r in wins_q.all()}
+    q = q.order_by((wins * 1.0 / func.nullif(total_bids, 0)).desc().nullslast())
 
-    results = []
-    for s, total in totals.items():
-        w = wins.get(s, 0)
-        results.append({
-            "supplier": s,
-            "total_bids": total,
-            "wins": w,
-            "win_rate_pct": round(w / total * 100, 1) if total > 0 else 0,
-        })
-    results.sort(key=lambda x: x["win_rate_pct"], reverse=True)
-    return results
+    return [
+        {
+            "supplier": r.supplier,
+            "total_bids": int(r.total_bids),
+            "wins": int(r.wins),
+            "win_rate_pct": round(r.wins / r.total_bids * 100, 1) if r.total_bids else 0,
+        }
+        for r in q.all()
+    ]
 
 
 def detect_new_entrants(db: Session, lookback_months: int = 6):
     from datetime import date, timedelta
     cutoff = date.today() - timedelta(days=lookback_months * 30)
 
-    recent = db.query(
-        distinct(BmsDistribution.provider_name)
-    ).filter(
-        BmsDistribution.delivery_date >= cutoff,
-        BmsDistribution.provider_name.isnot(None),
-    ).all()
-    recent_names = {r[0] for r in recent}
-
-    older = db.query(
-        distinct(BmsDistribution.provider_name)
-    ).filter(
-        BmsDistribution.delivery_date < cutoff,
-        BmsDistribution.provider_name.isnot(None),
-    ).all()
-    older_names = {r[0] for r in older}
-
-    new_entrants = recent_names - older_names
-    results = []
-    for name in new_entrants:
-        first_record = db.query(
-            func.min(BmsDistribution.delivery_date).label("first_seen"),
-            func.sum(BmsDistribution.unit_quantity).label("total_units"),
-            func.sum(BmsDistribution.net_amount).label("total_revenue"),
-        ).filter(
-            BmsDistribution.provider_name == name
-        ).first()
-
-        results.append({
-            "supplier": name,
-            "first_seen": str(first_record.first_seen) if first_record.first_seen else None,
-            "total_units": int(first_record.total_units or 0),
-            "total_revenue": float(first_record.total_revenue or 0),
-        })
-
-    results.sort(key=lambda x: x["total_revenue"], reverse=True)
-    return results
+    # A provider is new if its earliest dated delivery falls after the cutoff
+    first_seen = func.min(BmsProviderMonthly.first_delivery)
+    total_revenue = func.sum(BmsProviderMonthly.revenue)
+    rows = db.query(
+        BmsProviderMonthly.provider_name.label("supplier"),
+        first_seen.label("first_seen"),
+        func.sum(BmsProviderMonthly.units).label("total_units"),
+        total_revenue.label("total_revenue"),
+    ).group_by(
+        BmsProviderMonthly.provider_name
+    ).having(
+        first_seen >= cutoff
+    ).order_by(total_revenue.desc()).all()
+
+    return [
+        {
+            "supplier": r.supplier,
+            "first_seen": str(r.first_seen) if r.first_seen else None,
+            "total_units": int(r.total_units or 0),
+            "total_revenue": float(r.total_revenue or 0),
+        }
+        for r in rows
+    ]
 
 
 def get_price_positioning(db: Session, product: str = None, supplier: str = None):
@@ -0,0 +1,255 @@
+"""Precomputed regional demand grid and the GeoJSON heatmap views built on it.
+
+``refresh_demand_grid`` rebuilds one source's cells after its import and
+drops the rendered tiles; ``get_tile`` serves a rendered view (with ETag).
+Only the unfiltered views are stored in ``demand_tiles``; product-filtered
+views are kept briefly in a bounded in-process cache, so arbitrary product
+strings never add rows.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.demand_grid import DemandGridCell
+from app.models.demand_tile import DemandTile
+
+SOURCES = ("cenabast", "bms")
+LEVELS = ("region", "comuna")
+
+# Product-filtered views (matches the endpoint's Cache-Control max-age)
+CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 256
+
+_cache: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+
+# Chilean region populations (2024 estimates)
+REGION_POPULATION = {
+    "METROPOLITANA": 8125072,
+    "VALPARAISO": 1960170,
+    "BIOBIO": 1663696,
+    "MAULE": 1131939,
+    "ARAUCANIA": 1014343,
+    "O'HIGGINS": 991063,
+    "LOS LAGOS": 891440,
+    "COQUIMBO": 836096,
+    "ANTOFAGASTA": 691854,
+    "TARAPACA": 382773,
+    "LOS RIOS": 405835,
+    "ATACAMA": 316692,
+    "NUBLE": 511551,
+    "MAGALLANES": 178362,
+    "ARICA Y PARINACOTA": 252110,
+    "AYSEN": 107334,
+}
+
+# Approximate region centers (lng, lat), same points as the Cenabast ETL fallback
+REGION_CENTROIDS = {
+    "METROPOLITANA": (-70.6506, -33.4378),
+    "VALPARAISO": (-71.6167, -33.0458),
+    "BIOBIO": (-73.0500, -36.8270),
+    "MAULE": (-71.2500, -35.4264),
+    "ARAUCANIA": (-72.6333, -38.7500),
+    "O'HIGGINS": (-70.7333, -34.1708),
+    "LOS LAGOS": (-72.9333, -41.4689),
+    "COQUIMBO": (-71.2500, -30.4000),
+    "ANTOFAGASTA": (-70.4000, -23.6500),
+    "TARAPACA": (-70.1357, -20.2133),
+    "LOS RIOS": (-73.2471, -39.8196),
+    "ATACAMA": (-70.2500, -27.3668),
+    "NUBLE": (-72.1033, -36.6066),
+    "MAGALLANES": (-70.9167, -53.1500),
+    "ARICA Y PARINACOTA": (-70.3000, -18.4783),
+    "AYSEN": (-72.1000, -45.5750),
+}
+
+_SOURCE_SQL = {
+    "cenabast": """
+        SELECT region_solicitante, comuna_solicitante,
+               date_trunc('month', fecha_doc)::date, nombre_material_generico,
+               COALESCE(sum(cantidad_unitaria), 0), COALESCE(sum(monto_bruto), 0)
+        FROM cenabast_invoices
+        WHERE region_solicitante IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """,
+    "bms": """
+        SELECT region, comuna,
+               date_trunc('month', delivery_date)::date, active_ingredient,
+               COALESCE(sum(unit_quantity), 0), COALESCE(sum(net_amount), 0)
+        FROM bms_distributions
+        WHERE region IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """,
+}
+
+
+def match_region(name: str | None) -> str | None:
+    """Canonical region key for a free-form region name, if recognised."""
+    upper = name.upper() if name else ""
+    if not upper:
+        return None
+    for key in REGION_POPULATION:
+        if key in upper or upper in key:
+            return key
+    return None
+
+
+def refresh_demand_grid(db: Session, source: str) -> int:
+    """Rebuild the grid cells for one source and drop rendered tiles.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown demand source: {source}")
+    db.execute(text("DELETE FROM demand_grid WHERE source = :source"), {"source": source})
+    inserted = db.execute(text(f"""
+        INSERT INTO demand_grid (id, source, region, comuna, month, product, units, revenue)
+        SELECT gen_random_uuid(), :source, src.* FROM ({_SOURCE_SQL[source]}) src
+    """), {"source": source}).rowcount
+    db.execute(text("DELETE FROM demand_tiles"))
+    _cache.clear()
+    return inserted
+
+
+def drop_comuna_tiles(db: Session) -> int:
+    """Drop rendered comuna views, whose points are pharmacy centroids.
+
+    Call when pharmacies are added or relocated; runs in the caller's
+    transaction.
+    """
+    for key in [k for k in _cache if k.startswith("comuna:")]:
+        _cache.pop(key, None)
+    return db.execute(text("DELETE FROM demand_tiles WHERE key LIKE 'comuna:%'")).rowcount
+
+
+def region_totals(db: Session, product: str = None) -> list:
+    """Units and revenue per region and source, from the grid."""
+    cenabast = DemandGridCell.source == "cenabast"
+    bms = DemandGridCell.source == "bms"
+    q = db.query(
+        DemandGridCell.region.label("region"),
+        func.coalesce(func.sum(DemandGridCell.units).filter(cenabast), 0).label("cenabast_units"),
+        func.coalesce(func.sum(DemandGridCell.revenue).filter(cenabast), 0).label("cenabast_revenue"),
+        func.coalesce(func.sum(DemandGridCell.units).filter(bms), 0).label("bms_units"),
+        func.coalesce(func.sum(DemandGridCell.revenue).filter(bms), 0).label("bms_revenue"),
+    ).group_by(DemandGridCell.region)
+    if product:
+        q = q.filter(DemandGridCell.product.ilike(f"%{product}%"))
+    return q.all()
+
+
+def _comuna_totals(db: Session, product: str = None) -> list:
+    q = db.query(
+        DemandGridCell.region,
+        func.upper(DemandGridCell.comuna).label("comuna"),
+        func.sum(DemandGridCell.units).label("units"),
+        func.sum(DemandGridCell.revenue).label("revenue"),
+    ).filter(
+        DemandGridCell.comuna.isnot(None)
+    ).group_by(DemandGridCell.region, func.upper(DemandGridCell.comuna))
+    if product:
+        q = q.filter(DemandGridCell.product.ilike(f"%{product}%"))
+    return q.all()
+
+
+def _comuna_centroids(db: Session) -> dict[str, tuple[float, float]]:
+    """Center of each comuna's known pharmacies, as (lng, lat)."""
+    rows = db.execute(text("""
+        SELECT upper(comuna) AS comuna,
+               ST_X(ST_Centroid(ST_Collect(location::geometry))) AS lng,
+               ST_Y(ST_Centroid(ST_Collect(location::geometry))) AS lat
+        FROM pharmacies
+        WHERE comuna IS NOT NULL AND location IS NOT NULL
+        GROUP BY upper(comuna)
+    """)).fetchall()
+    return {r.comuna: (r.lng, r.lat) for r in rows}
+
+
+def _feature(lng: float, lat: float, properties: dict) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [round(lng, 5), round(lat, 5)]},
+        "properties": properties,
+    }
+
+
+def render_geojson(db: Session, level: str, product: str = None) -> dict:
+    """FeatureCollection of demand points at region or comuna level."""
+    features = []
+    if level == "region":
+        for r in region_totals(db, product):
+            key = match_region(r.region)
+            if key is None:
+                continue
+            units = int(r.cenabast_units) + int(r.bms_units)
+            population = REGION_POPULATION[key]
+            features.append(_feature(*REGION_CENTROIDS[key], {
+                "region": r.region,
+                "units": units,
+                "revenue": float(r.cenabast_revenue) + float(r.bms_revenue),
+                "cenabast_units": int(r.cenabast_units),
+                "bms_units": int(r.bms_units),
+                "population": population,
+                "per_capita_units": round(units / population, 2),
+            }))
+    else:
+        centroids = _comuna_centroids(db)
+        for r in _comuna_totals(db, product):
+            point = centroids.get(r.comuna)
+            if point is None:
+                continue
+            features.append(_feature(*point, {
+                "region": r.region,
+                "comuna": r.comuna,
+                "units": int(r.units or 0),
+                "revenue": float(r.revenue or 0),
+            }))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _render(db: Session, level: str, product: str | None) -> tuple[str, dict]:
+    body = render_geojson(db, level, product)
+    etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+    return etag, body
+
+
+def get_tile(db: Session, level: str, product: str = None) -> tuple[str, dict]:
+    """(etag, GeoJSON) for a heatmap view.
+
+    Unfiltered views are rendered once and stored; product-filtered views
+    come from the in-process cache or are rendered for the request.
+    """
+    product = (product or "").strip().lower()
+    key = f"{level}:{product}"
+    if not product:
+        tile = db.get(DemandTile, key)
+        if tile is not None:
+            return tile.etag, tile.body
+        etag, body = _render(db, level, None)
+        db.execute(insert(DemandTile).values(key=key, etag=etag, body=body).on_conflict_do_nothing())
+        db.commit()
+        return etag, body
+
+    now = time.monotonic()
+    hit = _cache.get(key)
+    if hit and now - hit[0] < CACHE_TTL_SECONDS:
+        _cache.move_to_end(key)
+        return hit[1], hit[2]
+
+    etag, body = _render(db, level, product)
+    _cache[key] = (now, etag, body)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return etag, body
+
+
+def prerender_tiles(db: Session) -> None:
+    """Render the unfiltered views right after a refresh."""
+    for level in LEVELS:
+        get_tile(db, level)
@@ -0,0 +1,118 @@
+"""
+In-process snapshot of adherence discount rules.
+
+Tier tables, program maxima and partner caps change only through admin
+edits, so they are loaded whole (three queries) into an immutable snapshot
+and discount resolution is a ``bisect`` over each program's sorted tier
+thresholds. Admin writes call ``invalidate()``, which bumps the version so
+the next lookup in this process reloads; other processes pick the change up
+when their snapshot expires.
+"""
+
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import Session
+
+from app.models.adherence_discount_tier import AdherenceDiscountTier
+from app.models.adherence_program import AdherenceProgram
+from app.models.pharmacy_discount_cap import PharmacyDiscountCap
+
+SNAPSHOT_TTL_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class ProgramDiscounts:
+    max_discount_pct: float
+    thresholds: tuple[int, ...] = ()
+    pcts: tuple[float, ...] = ()
+    caps: dict[uuid.UUID, float] = field(default_factory=dict)
+
+    def discount_for(self, streak: int, pharmacy_partner_id=None) -> float:
+        """Best tier reached by ``streak``, capped by the program and partner maxima."""
+        i = bisect_right(self.thresholds, streak)
+        if i == 0:
+            return 0
+        discount = min(self.pcts[i - 1], self.max_discount_pct)
+        if pharmacy_partner_id is not None:
+            cap = self.caps.get(_as_uuid(pharmacy_partner_id))
+            if cap is not None:
+                discount = min(discount, cap)
+        return discount
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    version: int
+    loaded_at: float
+    programs: dict[uuid.UUID, ProgramDiscounts]
+
+
+_version = 0
+_snapshot: _Snapshot | None = None
+_lock = threading.Lock()
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _load(db: Session, version: int) -> _Snapshot:
+    tiers: dict[uuid.UUID, list[tuple[int, float]]] = {}
+    for program_id, threshold, pct in db.query(
+        AdherenceDiscountTier.program_id,
+        AdherenceDiscountTier.min_consecutive_refills,
+        AdherenceDiscountTier.discount_pct,
+    ).order_by(AdherenceDiscountTier.program_id, AdherenceDiscountTier.min_consecutive_refills):
+        tiers.setdefault(program_id, []).append((threshold, pct))
+
+    caps: dict[uuid.UUID, dict[uuid.UUID, float]] = {}
+    for partner_id, program_id, pct in db.query(
+        PharmacyDiscountCap.pharmacy_partner_id,
+        PharmacyDiscountCap.program_id,
+        PharmacyDiscountCap.max_discount_pct,
+    ):
+        caps.setdefault(program_id, {})[partner_id] = pct
+
+    programs = {}
+    for program_id, max_pct in db.query(AdherenceProgram.id, AdherenceProgram.max_discount_pct):
+        program_tiers = tiers.get(program_id, [])
+        programs[program_id] = ProgramDiscounts(
+            max_discount_pct=max_pct,
+            thresholds=tuple(t for t, _ in program_tiers),
+            pcts=tuple(p for _, p in program_tiers),
+            caps=caps.get(program_id, {}),
+        )
+    return _Snapshot(version=version, loaded_at=time.monotonic(), programs=programs)
+
+
+def get_programs(db: Session) -> dict[uuid.UUID, ProgramDiscounts]:
+    """Current program_id -> ProgramDiscounts, reloading if stale."""
+    global _snapshot
+    snapshot = _snapshot
+    if (snapshot is None or snapshot.version != _version
+            or time.monotonic() - snapshot.loaded_at >= SNAPSHOT_TTL_SECONDS):
+        with _lock:
+            snapshot = _snapshot
+            if (snapshot is None or snapshot.version != _version
+                    or time.monotonic() - snapshot.loaded_at >= SNAPSHOT_TTL_SECONDS):
+                snapshot = _snapshot = _load(db, _version)
+    return snapshot.programs
+
+
+def resolve(db: Session, program_id, streak: int, pharmacy_partner_id=None) -> float:
+    """Discount for an enrollment's program, on-time streak and partner pharmacy."""
+    program = get_programs(db).get(_as_uuid(program_id))
+    if program is None:
+        return 0
+    return program.discount_for(streak, pharmacy_partner_id)
+
+
+def invalidate() -> None:
+    """Call after committing a change to programs, tiers or caps."""
+    global _version
+    with _lock:
+        _version += 1
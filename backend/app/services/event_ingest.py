@@ -0,0 +1,223 @@
+"""
+Buffered ingestion for high-volume tracking events (referral funnel).
+
+``track`` appends an event to a bounded in-process buffer and returns
+without touching the database; ``run_flusher`` (a background task in the
+API process) writes the buffer in multi-row INSERTs of up to
+``EVENT_FLUSH_BATCH`` events every ``EVENT_FLUSH_SECONDS``.
+
+* Backpressure: when the buffer is full, the producer writes a batch itself
+  on the session it was given, instead of dropping events.
+* At-least-once: a batch leaves the buffer only after its INSERT commits.
+  A batch the database rejects (IntegrityError/DataError, e.g. an unknown
+  medication id from a query string) is split in halves until the offending
+  events are isolated; those are logged and dropped. Only transient
+  (connection/operational) failures put a batch back at the front for
+  retry. Event ids and timestamps are fixed at ``track`` time and inserts are
+  ``ON CONFLICT DO NOTHING``, so a retried batch never duplicates rows.
+  Events still buffered when the process is killed without a shutdown are
+  lost.
+* Without a running flusher (scripts, the worker) events are written
+  immediately, as before.
+
+``referral_events`` is partitioned by month; ``ensure_partitions`` also
+converts a pre-partitioning table in place.
+"""
+
+import asyncio
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.partitions import add_months, ensure_monthly_partition, ensure_monthly_partitions, month_start
+from app.models.referral_event import ReferralEvent
+
+logger = logging.getLogger(__name__)
+
+TABLE = ReferralEvent.__tablename__
+
+_COLUMNS = "id, created_at, updated_at, user_id, session_id, medication_id, pharmacy_id, order_id, event_type"
+
+_buffer: deque[dict] = deque()
+_lock = threading.Lock()
+_flusher_running = False
+
+
+# ── Partitions ──────────────────────────────────────────────────────
+
+def _partition_existing_table(db: Session) -> None:
+    """Move a plain (pre-partitioning) referral_events table into monthly partitions."""
+    from app.models import Base
+
+    legacy = f"{TABLE}_unpartitioned"
+    db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    index_names = db.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"
+    ), {"t": legacy}).scalars().all()
+    for name in index_names:
+        db.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"'))
+
+    Base.metadata.create_all(bind=db.connection(), tables=[ReferralEvent.__table__])
+    first, last = db.execute(text(f"SELECT min(created_at), max(created_at) FROM {legacy}")).first()
+    if first is not None:
+        month = month_start(first)
+        while month <= month_start(last):
+            ensure_monthly_partition(db, TABLE, month)
+            month = add_months(month, 1)
+    ensure_monthly_partitions(db, TABLE)
+
+    moved = db.execute(text(f"""
+        INSERT INTO {TABLE} ({_COLUMNS})
+        SELECT id, COALESCE(created_at, now()), updated_at, user_id, session_id,
+               medication_id, pharmacy_id, order_id, event_type
+        FROM {legacy}
+    """)).rowcount
+    db.execute(text(f"DROP TABLE {legacy}"))
+    logger.info("Partitioned %s: moved %d events", TABLE, moved)
+
+
+def ensure_partitions(db: Session) -> None:
+    """Partition a legacy table if needed, then ensure the current month window."""
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"{TABLE}:partitions"})
+    relkind = db.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": TABLE}).scalar()
+    if relkind == "r":
+        _partition_existing_table(db)
+    else:
+        ensure_monthly_partitions(db, TABLE)
+    # Day-range scans for the funnel rollups (app.services.funnel_rollups)
+    db.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_referral_events_created_at_brin ON {TABLE} USING brin (created_at)"
+    ))
+
+
+# ── Producer side ───────────────────────────────────────────────────
+
+def _write(db: Session, events: list[dict]) -> None:
+    for month in {month_start(e["created_at"]) for e in events}:
+        ensure_monthly_partition(db, TABLE, month)
+    db.execute(insert(ReferralEvent).values(events).on_conflict_do_nothing())
+    db.commit()
+
+
+def _write_batch(db: Session, events: list[dict]) -> int:
+    """Write *events*, dropping the ones the database rejects; returns how many were dropped.
+
+    Transient errors propagate (with the session rolled back) so the caller
+    can keep the batch for retry.
+    """
+    try:
+        _write(db, events)
+        return 0
+    except (IntegrityError, DataError) as e:
+        db.rollback()
+        if len(events) == 1:
+            logger.warning("Dropping rejected referral event %s: %s", events[0], e.orig)
+            return 1
+        mid = len(events) // 2
+        return _write_batch(db, events[:mid]) + _write_batch(db, events[mid:])
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _take(n: int) -> list[dict]:
+    with _lock:
+        return [_buffer.popleft() for _ in range(min(n, len(_buffer)))]
+
+
+def _put_back(events: list[dict]) -> None:
+    with _lock:
+        _buffer.extendleft(reversed(events))
+
+
+def track(db: Session, **fields) -> None:
+    """Record one ReferralEvent (``event_type`` plus optional ids).
+
+    Never raises: tracking must not break the request that triggered it.
+    """
+    now = datetime.now(timezone.utc)
+    event = {
+        "id": uuid.uuid4(),
+        "created_at": now,
+        "updated_at": now,
+        "user_id": fields.get("user_id"),
+        "session_id": fields.get("session_id"),
+        "medication_id": fields.get("medication_id"),
+        "pharmacy_id": fields.get("pharmacy_id"),
+        "order_id": fields.get("order_id"),
+        "event_type": fields["event_type"],
+    }
+    try:
+        if not (_flusher_running and settings.EVENT_BUFFER_ENABLED):
+            _write_batch(db, [event])
+            return
+        with _lock:
+            full = len(_buffer) >= settings.EVENT_BUFFER_CAPACITY
+            if not full:
+                _buffer.append(event)
+        if full:
+            # Backpressure: pay for one batch here rather than drop events
+            batch = _take(settings.EVENT_FLUSH_BATCH) + [event]
+            try:
+                _write_batch(db, batch)
+            except Exception:
+                _put_back(batch)
+                raise
+    except Exception:
+        logger.exception("Failed to track referral event")
+        db.rollback()
+
+
+# ── Flusher ─────────────────────────────────────────────────────────
+
+def flush(db: Session, max_batches: int | None = None) -> int:
+    """Write buffered events in batches; returns how many were written."""
+    written = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = _take(settings.EVENT_FLUSH_BATCH)
+        if not batch:
+            break
+        try:
+            dropped = _write_batch(db, batch)
+        except Exception:
+            _put_back(batch)
+            raise
+        written += len(batch) - dropped
+        batches += 1
+    return written
+
+
+async def run_flusher(stop: asyncio.Event) -> None:
+    """Flush the buffer until ``stop`` is set, then drain it."""
+    from app.core.database import SessionLocal
+
+    global _flusher_running
+    _flusher_running = True
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.EVENT_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.to_thread(flush, db, None if stop.is_set() else 10)
+            except Exception:
+                logger.exception("Event flush failed; %d events kept for retry", len(_buffer))
+    finally:
+        # Later track() calls write directly
+        _flusher_running = False
+        try:
+            await asyncio.to_thread(flush, db)
+        except Exception:
+            logger.exception("Final event flush failed; %d events lost", len(_buffer))
+        db.close()
@@ -0,0 +1,143 @@
+"""
+Daily pre-aggregation of the referral funnel.
+
+``refresh`` rebuilds the last two UTC days (and anything not yet rolled up)
+from ``referral_events`` into:
+
+* ``referral_funnel_daily``: event counts per (day, event_type, medication,
+  pharmacy);
+* ``referral_funnel_user_sketches``: a HyperLogLog of distinct users per
+  (day, event_type), stored as one row per register.
+
+Any date range is then answered from the rollups: counts are summed and
+sketches merged by taking the max register value, so distinct users never
+require rescanning raw events. The postgresql-hll extension is not assumed;
+registers are computed in plain SQL from ``hashtextextended`` and estimated
+here (2^11 registers, ~2.3% standard error; exact-ish at small counts via
+linear counting).
+"""
+
+import math
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.models.referral_funnel_daily import ReferralFunnelDaily
+from app.models.referral_funnel_user_sketch import ReferralFunnelUserSketch
+
+HLL_P = 11
+HLL_M = 1 << HLL_P
+
+# Days re-aggregated on every run, to pick up late (buffered) events
+REFRESH_DAYS = 2
+
+_COUNTS_SQL = text("""
+    INSERT INTO referral_funnel_daily (day, event_type, medication_id, pharmacy_id, events)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, event_type, medication_id, pharmacy_id, count(*)
+    FROM referral_events
+    WHERE created_at >= :start AND created_at < :end
+    GROUP BY 1, 2, 3, 4
+""")
+
+# Register = low P bits of a 64-bit hash; rho = position of the first 1 bit
+# in the remaining high bits (64 - P + 1 when they are all zero)
+_SKETCH_SQL = text(f"""
+    INSERT INTO referral_funnel_user_sketches (day, event_type, register, rho)
+    SELECT day, event_type, register, max(rho)
+    FROM (
+        SELECT (created_at AT TIME ZONE 'UTC')::date AS day,
+               event_type,
+               (h & {HLL_M - 1})::smallint AS register,
+               COALESCE(NULLIF(position('1' IN substring(h::bit(64)::text, 1, {64 - HLL_P})), 0),
+                        {64 - HLL_P + 1})::smallint AS rho
+        FROM (
+            SELECT created_at, event_type, hashtextextended(user_id::text, 0) AS h
+            FROM referral_events
+            WHERE user_id IS NOT NULL AND created_at >= :start AND created_at < :end
+        ) e
+    ) r
+    GROUP BY day, event_type, register
+""")
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def _as_day(value) -> date | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def refresh(db: Session) -> dict:
+    """Rebuild the rollups from the last rolled-up days through today, and commit."""
+    today = datetime.now(timezone.utc).date()
+    last = db.query(func.max(ReferralFunnelDaily.day)).scalar()
+    if last is None:
+        first = db.execute(text("SELECT min(created_at) FROM referral_events")).scalar()
+        if first is None:
+            return {"days": 0}
+        start_day = _as_day(first)
+    else:
+        start_day = min(last, today) - timedelta(days=REFRESH_DAYS - 1)
+
+    params = {"start": _day_start(start_day), "end": _day_start(today + timedelta(days=1))}
+    db.query(ReferralFunnelDaily).filter(ReferralFunnelDaily.day >= start_day).delete(synchronize_session=False)
+    db.query(ReferralFunnelUserSketch).filter(ReferralFunnelUserSketch.day >= start_day).delete(
+        synchronize_session=False
+    )
+    rows = db.execute(_COUNTS_SQL, params).rowcount
+    db.execute(_SKETCH_SQL, params)
+    db.commit()
+    return {"days": (today - start_day).days + 1, "rows": rows}
+
+
+def estimate_distinct(registers: dict[int, int]) -> int:
+    """HyperLogLog cardinality estimate from register -> rho."""
+    zeros = HLL_M - len(registers)
+    z = zeros + sum(2.0 ** -rho for rho in registers.values())
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    estimate = alpha * HLL_M * HLL_M / z
+    if estimate <= 2.5 * HLL_M and zeros:
+        estimate = HLL_M * math.log(HLL_M / zeros)
+    return int(round(estimate))
+
+
+def get_funnel(db: Session, start_date=None, end_date=None) -> dict:
+    """event_type -> {count, unique_users} over whole UTC days, bounds inclusive."""
+    start_day, end_day = _as_day(start_date), _as_day(end_date)
+
+    counts = db.query(
+        ReferralFunnelDaily.event_type, func.sum(ReferralFunnelDaily.events)
+    ).group_by(ReferralFunnelDaily.event_type)
+    registers = db.query(
+        ReferralFunnelUserSketch.event_type,
+        ReferralFunnelUserSketch.register,
+        func.max(ReferralFunnelUserSketch.rho),
+    ).group_by(ReferralFunnelUserSketch.event_type, ReferralFunnelUserSketch.register)
+    if start_day:
+        counts = counts.filter(ReferralFunnelDaily.day >= start_day)
+        registers = registers.filter(ReferralFunnelUserSketch.day >= start_day)
+    if end_day:
+        counts = counts.filter(ReferralFunnelDaily.day <= end_day)
+        registers = registers.filter(ReferralFunnelUserSketch.day <= end_day)
+
+    sketches: dict = {}
+    for event_type, register, rho in registers:
+        sketches.setdefault(event_type, {})[register] = rho
+
+    results = {}
+    for event_type, count in counts:
+        results[event_type.value] = {
+            "count": int(count),
+            "unique_users": estimate_distinct(sketches.get(event_type, {})),
+        }
+    return results
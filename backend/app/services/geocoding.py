@@ -0,0 +1,177 @@
+"""Address geocoding: pluggable providers plus a persistent result cache.
+
+Providers return ``(lng, lat)`` for a match, ``None`` when the address is
+unknown (cached as a negative result), and raise on transport errors (not
+cached, retried next run).
+"""
+import asyncio
+import csv
+import logging
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.geocode_cache import GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+Coords = tuple[float, float]
+
+
+def normalize_key(address: str) -> str:
+    """Cache key for an address: accent-free, lowercase, single-spaced."""
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^\w,]+", " ", text)
+    return re.sub(r"\s*,\s*", ", ", re.sub(r"\s+", " ", text)).strip(" ,")
+
+
+class GeocodeProvider(ABC):
+    NAME: str = ""
+    CONCURRENCY: int = 1
+    RATE_LIMIT_DELAY: float = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    @abstractmethod
+    async def geocode(self, address: str) -> Coords | None:
+        ...
+
+    async def geocode_many(self, addresses: list[str]) -> tuple[dict[str, Coords | None], list[str]]:
+        """Geocode addresses with bounded concurrency.
+
+        Returns ``(results, errors)``; addresses that raised are left out of
+        ``results`` so they are not cached.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.CONCURRENCY))
+        results: dict[str, Coords | None] = {}
+        errors: list[str] = []
+
+        async def worker(address: str):
+            async with semaphore:
+                try:
+                    results[address] = await self.geocode(address)
+                except Exception as e:
+                    errors.append(f"{address}: {e}")
+                    logger.warning("Geocode failed for '%s': %s", address, e)
+                if self.RATE_LIMIT_DELAY:
+                    await asyncio.sleep(self.RATE_LIMIT_DELAY)
+
+        await asyncio.gather(*(worker(a) for a in addresses))
+        return results, errors
+
+
+class NominatimProvider(GeocodeProvider):
+    """Public or self-hosted Nominatim (OpenStreetMap)."""
+    NAME = "nominatim"
+
+    def __init__(self, url: str, concurrency: int = 1, rate_limit: float = 1.1):
+        self.url = url
+        self.CONCURRENCY = concurrency
+        self.RATE_LIMIT_DELAY = rate_limit
+        self.client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            timeout=15,
+            headers={"User-Agent": "Remedia/1.0 (pharmacy geocoding)"},
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def geocode(self, address: str) -> Coords | None:
+        resp = await self.client.get(self.url, params={
+            "q": address,
+            "format": "json",
+            "limit": 1,
+            "countrycodes": "cl",
+        })
+        resp.raise_for_status()
+        results = resp.json()
+        if not results:
+            return None
+        return (float(results[0]["lon"]), float(results[0]["lat"]))
+
+
+class GazetteerProvider(GeocodeProvider):
+    """Local lookup table (CSV with ``address,lat,lng`` columns); no network."""
+    NAME = "gazetteer"
+    CONCURRENCY = 64
+
+    def __init__(self, path: str):
+        self.entries: dict[str, Coords] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.entries[normalize_key(row["address"])] = (float(row["lng"]), float(row["lat"]))
+
+    async def geocode(self, address: str) -> Coords | None:
+        return self.entries.get(normalize_key(address))
+
+
+def get_provider() -> GeocodeProvider:
+    """Build the provider selected by ``GEOCODER_PROVIDER``."""
+    name = settings.GEOCODER_PROVIDER
+    if name == "nominatim":
+        return NominatimProvider(
+            settings.GEOCODER_URL,
+            concurrency=settings.GEOCODER_CONCURRENCY,
+            rate_limit=settings.GEOCODER_RATE_LIMIT_SECONDS,
+        )
+    if name == "gazetteer":
+        return GazetteerProvider(settings.GEOCODER_GAZETTEER_PATH)
+    raise ValueError(f"Unknown geocoder provider: {name}")
+
+
+def get_cached(db: Session, keys: list[str]) -> dict[str, Coords | None]:
+    """Unexpired cache entries for the given keys (``None`` = negative)."""
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(GeocodeCache.address_key, GeocodeCache.lng, GeocodeCache.lat)
+        .where(
+            GeocodeCache.address_key.in_(keys),
+            GeocodeCache.expires_at > datetime.now(timezone.utc),
+        )
+    ).all()
+    return {
+        r.address_key: (r.lng, r.lat) if r.lng is not None else None
+        for r in rows
+    }
+
+
+def store_results(db: Session, provider: str, results: dict[str, Coords | None]) -> None:
+    """Upsert provider results into the cache with positive/negative TTLs."""
+    if not results:
+        return
+    now = datetime.now(timezone.utc)
+    hit_ttl = timedelta(days=settings.GEOCODE_CACHE_TTL_DAYS)
+    miss_ttl = timedelta(days=settings.GEOCODE_NEGATIVE_TTL_DAYS)
+    rows = [
+        {
+            "address_key": key,
+            "provider": provider,
+            "lng": coords[0] if coords else None,
+            "lat": coords[1] if coords else None,
+            "created_at": now,
+            "expires_at": now + (hit_ttl if coords else miss_ttl),
+        }
+        for key, coords in results.items()
+    ]
+    stmt = insert(GeocodeCache).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[GeocodeCache.address_key],
+        set_={c: stmt.excluded[c] for c in ("provider", "lng", "lat", "created_at", "expires_at")},
+    ))
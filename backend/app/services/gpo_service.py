@@ -1,151 +1,174 @@
 import logging
-from sqlalchemy import func
+from sqlalchemy import func, text
 from sqlalchemy.orm import Session
 
 from app.models.gpo_group import GpoGroup
 from app.models.gpo_member import GpoMember
 from app.models.gpo_purchase_intent import GpoPurchaseIntent, IntentStatus
-from app.models.gpo_group_order import GpoGroupOrder, GroupOrderStatus
-from app.models.gpo_allocation import GpoAllocation
-from app.models.gpo_facilitation_fee import GpoFacilitationFee
-from app.models.cenabast_product import CenabastProduct
+from app.models.gpo_group_order import GpoGroupOrder
+from app.models.gpo_member_savings import GpoMemberSavings
 
 logger = logging.getLogger(__name__)
 
 
 def get_aggregated_demand(db: Session, gpo_group_id: str, target_month: str):
-    members = db.query(GpoMember.id).filter(
-        GpoMember.gpo_group_id == gpo_group_id
-    ).all()
-    member_ids = [m.id for m in members]
-    if not member_ids:
-        return []
-
-    group = db.query(GpoGroup).filter(GpoGroup.id == gpo_group_id).first()
-    threshold = group.min_aggregation_threshold if group else 100
-
+    """Submitted demand per product for one month, in a single grouped query."""
     rows = db.query(
         GpoPurchaseIntent.product_name,
         GpoPurchaseIntent.cenabast_product_id,
         func.sum(GpoPurchaseIntent.quantity_units).label("total_quantity"),
         func.count(func.distinct(GpoPurchaseIntent.gpo_member_id)).label("member_count"),
+        GpoGroup.min_aggregation_threshold.label("threshold"),
+    ).join(
+        GpoMember, GpoMember.id == GpoPurchaseIntent.gpo_member_id
+    ).join(
+        GpoGroup, GpoGroup.id == GpoMember.gpo_group_id
     ).filter(
-        GpoPurchaseIntent.gpo_member_id.in_(member_ids),
+        GpoMember.gpo_group_id == gpo_group_id,
         GpoPurchaseIntent.target_month == target_month,
         GpoPurchaseIntent.status == IntentStatus.submitted,
     ).group_by(
         GpoPurchaseIntent.product_name,
         GpoPurchaseIntent.cenabast_product_id,
+        GpoGroup.min_aggregation_threshold,
+    ).order_by(
+        func.sum(GpoPurchaseIntent.quantity_units).desc()
     ).all()
 
-    results = []
-    for row in rows:
-        total = int(row.total_quantity or 0)
-        results.append({
+    return [
+        {
             "product_name": row.product_name,
             "cenabast_product_id": str(row.cenabast_product_id) if row.cenabast_product_id else None,
-            "total_quantity": total,
+            "total_quantity": int(row.total_quantity or 0),
             "member_count": int(row.member_count or 0),
-            "threshold": threshold,
-            "threshold_met": total >= threshold,
-        })
-    results.sort(key=lambda x: x["total_quantity"], reverse=True)
-    return results
+            "threshold": row.threshold,
+            "threshold_met": int(row.total_quantity or 0) >= row.threshold,
+        }
+        for row in rows
+    ]
+
+
+# One statement per run: aggregate submitted intents per product, create the
+# group orders (priced at PMVP, no markup), mark and link the intents, and
+# write one allocation per intent and one facilitation fee per order.
+_AGGREGATE_MONTH_SQL = text("""
+    WITH demand AS (
+        SELECT i.product_name,
+               COALESCE(CAST(:cenabast_product_id AS uuid),
+                        (array_agg(i.cenabast_product_id) FILTER (WHERE i.cenabast_product_id IS NOT NULL))[1])
+                   AS cenabast_product_id,
+               sum(i.quantity_units) AS total_quantity,
+               count(DISTINCT i.gpo_member_id) AS member_count
+        FROM gpo_purchase_intents i
+        JOIN gpo_members m ON m.id = i.gpo_member_id
+        WHERE m.gpo_group_id = :group_id
+          AND i.target_month = :month
+          AND i.status = 'submitted'
+          AND i.product_name IS NOT NULL
+          AND (CAST(:product_name AS text) IS NULL OR i.product_name = :product_name)
+        GROUP BY i.product_name
+        HAVING sum(i.quantity_units) >= :min_quantity
+    ), orders AS (
+        INSERT INTO gpo_group_orders (
+            id, gpo_group_id, cenabast_product_id, product_name, target_month, status,
+            total_quantity, member_count, unit_price_pmvp, unit_price_group, facilitation_fee,
+            created_at, updated_at
+        )
+        SELECT gen_random_uuid(), :group_id, d.cenabast_product_id, d.product_name, :month, 'aggregated',
+               d.total_quantity, d.member_count, cp.precio_maximo_publico, cp.precio_maximo_publico,
+               COALESCE(cp.precio_maximo_publico, 0) * d.total_quantity * :fee_rate,
+               now(), now()
+        FROM demand d
+        LEFT JOIN cenabast_products cp ON cp.id = d.cenabast_product_id
+        RETURNING id, product_name, unit_price_group, total_quantity, facilitation_fee
+    ), linked AS (
+        UPDATE gpo_purchase_intents i
+        SET status = 'aggregated', group_order_id = o.id, updated_at = now()
+        FROM orders o, gpo_members m
+        WHERE m.id = i.gpo_member_id
+          AND m.gpo_group_id = :group_id
+          AND i.target_month = :month
+          AND i.status = 'submitted'
+          AND i.product_name = o.product_name
+        RETURNING i.gpo_member_id, i.quantity_units, o.id AS group_order_id,
+                  COALESCE(o.unit_price_group, 0) AS unit_price
+    ), allocations AS (
+        INSERT INTO gpo_allocations (
+            id, group_order_id, gpo_member_id, quantity_allocated, unit_price, subtotal,
+            facilitation_fee, status, created_at, updated_at
+        )
+        SELECT gen_random_uuid(), group_order_id, gpo_member_id, quantity_units, unit_price,
+               unit_price * quantity_units, unit_price * quantity_units * :fee_rate,
+               'pending', now(), now()
+        FROM linked
+    ), fees AS (
+        INSERT INTO gpo_facilitation_fees (
+            id, group_order_id, order_total, fee_rate, fee_amount, status, created_at, updated_at
+        )
+        SELECT gen_random_uuid(), id, COALESCE(unit_price_group, 0) * total_quantity, :fee_rate,
+               facilitation_fee, 'pending', now(), now()
+        FROM orders
+    )
+    SELECT id FROM orders
+""")
 
 
-def create_group_order_from_demand(
+def create_group_orders_for_month(
     db: Session,
     gpo_group_id: str,
-    product_name: str,
+    target_month: str,
+    threshold_only: bool = True,
+    product_name: str = None,
     cenabast_product_id: str = None,
-    target_month: str = "",
-):
+) -> list:
+    """Turn a month's submitted intents into group orders, one per product.
+
+    Orders, intent updates, allocations and fee rows are written by one
+    set-based statement in a single transaction. With ``threshold_only``,
+    products below the group's aggregation threshold are left for later.
+    """
     group = db.query(GpoGroup).filter(GpoGroup.id == gpo_group_id).first()
     if not group:
-        return None
+        return []
 
-    demand = get_aggregated_demand(db, gpo_group_id, target_month)
-    product_demand = next(
-        (d for d in demand if d["product_name"] == product_name),
-        None,
+    # Serialise runs for the same group and month so intents aggregate once
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+        {"key": f"gpo:{gpo_group_id}:{target_month}"},
     )
-    if not product_demand:
-        return None
+    order_ids = db.execute(_AGGREGATE_MONTH_SQL, {
+        "group_id": gpo_group_id,
+        "month": target_month,
+        "product_name": product_name,
+        "cenabast_product_id": cenabast_product_id,
+        "min_quantity": group.min_aggregation_threshold if threshold_only else 1,
+        "fee_rate": group.facilitation_fee_rate,
+    }).scalars().all()
+    if order_ids:
+        refresh_savings_ledger(db, gpo_group_id)
+    db.commit()
 
-    # Get PMVP for the product
-    unit_price_pmvp = None
-    if cenabast_product_id:
-        cp = db.query(CenabastProduct).filter(CenabastProduct.id == cenabast_product_id).first()
-        if cp:
-            unit_price_pmvp = cp.precio_maximo_publico
+    if not order_ids:
+        return []
+    return db.query(GpoGroupOrder).filter(
+        GpoGroupOrder.id.in_(order_ids)
+    ).order_by(GpoGroupOrder.total_quantity.desc()).all()
 
-    # Group price = PMVP (if available), no markup
-    unit_price_group = unit_price_pmvp
 
-    order = GpoGroupOrder(
-        gpo_group_id=gpo_group_id,
-        cenabast_product_id=cenabast_product_id,
+def create_group_order_from_demand(
+    db: Session,
+    gpo_group_id: str,
+    product_name: str,
+    cenabast_product_id: str = None,
+    target_month: str = "",
+):
+    orders = create_group_orders_for_month(
+        db, gpo_group_id, target_month,
+        threshold_only=False,
         product_name=product_name,
-        target_month=target_month,
-        status=GroupOrderStatus.aggregated,
-        total_quantity=product_demand["total_quantity"],
-        member_count=product_demand["member_count"],
-        unit_price_pmvp=unit_price_pmvp,
-        unit_price_group=unit_price_group,
-    )
-    db.add(order)
-    db.flush()
-
-    # Link intents to order
-    member_ids = [m.id for m in db.query(GpoMember.id).filter(GpoMember.gpo_group_id == gpo_group_id).all()]
-    intents = db.query(GpoPurchaseIntent).filter(
-        GpoPurchaseIntent.gpo_member_id.in_(member_ids),
-        GpoPurchaseIntent.product_name == product_name,
-        GpoPurchaseIntent.target_month == target_month,
-        GpoPurchaseIntent.status == IntentStatus.submitted,
-    ).all()
-
-    for intent in intents:
-        intent.status = IntentStatus.aggregated
-        intent.group_order_id = order.id
-
-    # Create allocations
-    calculate_allocations(db, order, intents, group.facilitation_fee_rate)
-
-    # Create facilitation fee record
-    order_total = (unit_price_group or 0) * product_demand["total_quantity"]
-    fee_amount = order_total * group.facilitation_fee_rate
-    order.facilitation_fee = fee_amount
-
-    fee = GpoFacilitationFee(
-        group_order_id=order.id,
-        order_total=order_total,
-        fee_rate=group.facilitation_fee_rate,
-        fee_amount=fee_amount,
+        cenabast_product_id=cenabast_product_id,
     )
-    db.add(fee)
-
-    db.commit()
-    db.refresh(order)
-    return order
-
-
-def calculate_allocations(db: Session, order, intents, fee_rate):
-    unit_price = order.unit_price_group or 0
-
-    for intent in intents:
-        subtotal = unit_price * intent.quantity_units
-        fee = subtotal * fee_rate
-
-        allocation = GpoAllocation(
-            group_order_id=order.id,
-            gpo_member_id=intent.gpo_member_id,
-            quantity_allocated=intent.quantity_units,
-            unit_price=unit_price,
-            subtotal=subtotal,
-            facilitation_fee=fee,
-        )
-        db.add(allocation)
+    return orders[0] if orders else None
 
 
 def update_group_order_status(db: Session, group_order_id: str, new_status: str):
@@ -154,49 +177,100 @@ def update_group_order_status(db: Session, group_order_id: str, new_status: str)
         return None
 
     order.status = new_status
+    refresh_savings_ledger(db, order.gpo_group_id)
     db.commit()
     db.refresh(order)
     return order
 
 
-def get_member_savings(db: Session, gpo_member_id: str):
-    allocations = db.query(GpoAllocation).filter(
-        GpoAllocation.gpo_member_id == gpo_member_id,
-    ).all()
-
-    total_pmvp = 0
-    total_group = 0
-    order_count = 0
-
-    for alloc in allocations:
-        order = db.query(GpoGroupOrder).filter(GpoGroupOrder.id == alloc.group_order_id).first()
-        if order and order.unit_price_pmvp and order.unit_price_group:
-            total_pmvp += order.unit_price_pmvp * alloc.quantity_allocated
-            total_group += alloc.subtotal
-            order_count += 1
+# ── Savings ──
 
+# Allocations only count towards savings when their order has both prices
+_REFRESH_SAVINGS_SQL = text("""
+    INSERT INTO gpo_member_savings (
+        gpo_member_id, gpo_group_id, order_count, total_pmvp_cost, total_group_cost, updated_at
+    )
+    SELECT m.id, m.gpo_group_id,
+           count(o.id),
+           COALESCE(sum(o.unit_price_pmvp * a.quantity_allocated) FILTER (WHERE o.id IS NOT NULL), 0),
+           COALESCE(sum(a.subtotal) FILTER (WHERE o.id IS NOT NULL), 0),
+           now()
+    FROM gpo_members m
+    LEFT JOIN gpo_allocations a ON a.gpo_member_id = m.id
+    LEFT JOIN gpo_group_orders o ON o.id = a.group_order_id
+         AND o.unit_price_pmvp <> 0 AND o.unit_price_group <> 0
+    WHERE (CAST(:group_id AS uuid) IS NULL OR m.gpo_group_id = CAST(:group_id AS uuid))
+    GROUP BY m.id, m.gpo_group_id
+    ON CONFLICT (gpo_member_id) DO UPDATE SET
+        gpo_group_id = EXCLUDED.gpo_group_id,
+        order_count = EXCLUDED.order_count,
+        total_pmvp_cost = EXCLUDED.total_pmvp_cost,
+        total_group_cost = EXCLUDED.total_group_cost,
+        updated_at = EXCLUDED.updated_at
+""")
+
+
+def _lock_savings_ledger(db: Session, gpo_group_id=None) -> None:
+    """Serialise ledger rebuilds per group until the caller's transaction ends.
+
+    A group rebuild holds ``gpo:savings`` shared plus its own group key; a
+    full rebuild holds ``gpo:savings`` exclusively. The rebuild statement runs
+    after the lock is granted, so it sees every allocation committed by the
+    transaction it waited for and cannot overwrite newer totals with older ones.
+    """
+    if gpo_group_id is None:
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext('gpo:savings'))"))
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock_shared(hashtext('gpo:savings'))"))
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"gpo:{gpo_group_id}"})
+
+
+def refresh_savings_ledger(db: Session, gpo_group_id=None) -> None:
+    """Recompute the savings ledger for one group's members (or all groups)
+    with a single grouped upsert. Runs in the caller's transaction."""
+    _lock_savings_ledger(db, gpo_group_id)
+    db.execute(_REFRESH_SAVINGS_SQL, {"group_id": str(gpo_group_id) if gpo_group_id else None})
+
+
+def ensure_savings_ledger(db: Session) -> None:
+    """Build the ledger once for deployments that predate it."""
+    if db.query(GpoMemberSavings.gpo_member_id).first() is None:
+        refresh_savings_ledger(db)
+
+
+def _savings_summary(order_count, total_pmvp, total_group) -> dict:
     savings = total_pmvp - total_group
-    savings_pct = round(savings / total_pmvp * 100, 1) if total_pmvp > 0 else 0
-
     return {
         "total_orders": order_count,
         "total_pmvp_cost": round(total_pmvp, 0),
         "total_group_cost": round(total_group, 0),
         "total_savings": round(savings, 0),
-        "savings_pct": savings_pct,
+        "savings_pct": round(savings / total_pmvp * 100, 1) if total_pmvp > 0 else 0,
     }
 
 
+def get_member_savings(db: Session, gpo_member_id: str):
+    row = db.query(GpoMemberSavings).filter(GpoMemberSavings.gpo_member_id == gpo_member_id).first()
+    if not row:
+        return _savings_summary(0, 0, 0)
+    return _savings_summary(row.order_count, row.total_pmvp_cost, row.total_group_cost)
+
+
 def get_group_savings(db: Session, gpo_group_id: str):
-    members = db.query(GpoMember).filter(GpoMember.gpo_group_id == gpo_group_id).all()
-    summaries = []
-    for member in members:
-        savings = get_member_savings(db, str(member.id))
-        if savings["total_orders"] > 0:
-            summaries.append({
-                "member_id": str(member.id),
-                "institution_name": member.institution_name,
-                "total_savings": savings["total_savings"],
-                "order_count": savings["total_orders"],
-            })
-    return summaries
+    rows = db.query(
+        GpoMemberSavings, GpoMember.institution_name,
+    ).join(
+        GpoMember, GpoMember.id == GpoMemberSavings.gpo_member_id
+    ).filter(
+        GpoMemberSavings.gpo_group_id == gpo_group_id,
+        GpoMemberSavings.order_count > 0,
+    ).order_by(GpoMember.created_at).all()
+    return [
+        {
+            "member_id": str(ledger.gpo_member_id),
+            "institution_name": institution_name,
+            "total_savings": round(ledger.total_pmvp_cost - ledger.total_group_cost, 0),
+            "order_count": ledger.order_count,
+        }
+        for ledger, institution_name in rows
+    ]
@@ -0,0 +1,159 @@
+"""
+Inbound WhatsApp pipeline.
+
+The webhook only verifies, deduplicates on the WhatsApp ``message_id`` and
+stores messages in ``inbound_messages``; the worker then runs
+``whatsapp.handle_incoming_message`` for them. Each claim takes at most the
+oldest due message per sender, and a sender with a message still being
+handled (or waiting to retry) is skipped, so replies keep the order in which
+messages arrived while different senders are processed concurrently.
+A claim never takes more than ``INBOUND_CONCURRENCY`` messages, all handled
+at once, so no claimed message waits for a slot while its lease runs out.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.polling import poll_loop
+from app.models.inbound_message import InboundMessage, InboundStatus
+
+logger = logging.getLogger(__name__)
+
+# Must exceed the handling of one message (AI calls can take ~60-120s)
+CLAIM_LEASE_SECONDS = 300
+RETRY_BASE_SECONDS = 10
+
+_wakeup: asyncio.Event | None = None
+
+
+def parse_webhook(body: dict) -> list[dict]:
+    """Extract text messages from a WhatsApp Cloud API payload."""
+    rows = []
+    for entry in body.get("entry", []):
+        for change in entry.get("changes", []):
+            for msg in change.get("value", {}).get("messages", []):
+                sender_phone = msg.get("from", "")
+                message_body = msg.get("text", {}).get("body", "")
+                if not sender_phone or not message_body:
+                    continue
+                rows.append({
+                    "message_id": msg.get("id") or str(uuid.uuid4()),
+                    "sender_phone": sender_phone,
+                    "body": message_body,
+                })
+    return rows
+
+
+def enqueue_many(db: Session, rows: list[dict]) -> int:
+    """Store incoming messages, ignoring ids already seen. Returns rows added."""
+    if not rows:
+        return 0
+    stmt = insert(InboundMessage).values([
+        {"id": uuid.uuid4(), "status": InboundStatus.pending, "attempts": 0, **row}
+        for row in rows
+    ]).on_conflict_do_nothing(index_elements=[InboundMessage.message_id])
+    return db.execute(stmt).rowcount
+
+
+def notify() -> None:
+    """Wake the in-process worker."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+# ── Worker ──────────────────────────────────────────────────────────
+
+_CLAIM_SQL = text("""
+    UPDATE inbound_messages m
+    SET status = 'processing',
+        attempts = m.attempts + 1,
+        next_attempt_at = now() + make_interval(secs => :lease),
+        updated_at = now()
+    WHERE m.id IN (
+        SELECT id FROM inbound_messages
+        WHERE id IN (
+            SELECT DISTINCT ON (sender_phone) id
+            FROM inbound_messages
+            WHERE status IN ('pending', 'processing')
+            ORDER BY sender_phone, received_at
+        )
+        AND next_attempt_at <= now()
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING m.id, m.message_id, m.sender_phone, m.body, m.attempts
+""")
+
+
+def _claim_batch(db: Session, limit: int) -> list:
+    rows = db.execute(_CLAIM_SQL, {"lease": CLAIM_LEASE_SECONDS, "limit": limit}).fetchall()
+    db.commit()
+    return rows
+
+
+def _record_results(db: Session, results: list[tuple]) -> None:
+    now = datetime.now(timezone.utc)
+    for row, error in results:
+        msg = db.get(InboundMessage, row.id)
+        if msg is None:
+            continue
+        if error is None:
+            msg.status = InboundStatus.done
+            msg.processed_at = now
+            msg.last_error = None
+        elif row.attempts >= settings.INBOUND_MAX_ATTEMPTS:
+            msg.status = InboundStatus.failed
+            msg.processed_at = now
+            msg.last_error = str(error)[:500]
+        else:
+            msg.status = InboundStatus.pending
+            msg.next_attempt_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (row.attempts - 1))
+            msg.last_error = str(error)[:500]
+    db.commit()
+
+
+async def _handle(row) -> tuple:
+    from app.services import whatsapp
+
+    try:
+        await whatsapp.handle_incoming_message(
+            sender_phone=row.sender_phone,
+            message_body=row.body,
+            message_id=row.message_id,
+        )
+        return row, None
+    except Exception as e:
+        logger.exception("Error handling WhatsApp from %s", row.sender_phone)
+        return row, e
+
+
+async def process_batch(limit: int | None = None) -> int:
+    """Claim and handle one batch (at most one message per sender)."""
+    from app.core.database import SessionLocal
+
+    # Claim only what is handled concurrently, so every lease covers one message
+    limit = min(limit or settings.INBOUND_CONCURRENCY, settings.INBOUND_CONCURRENCY)
+    db = SessionLocal()
+    try:
+        rows = await asyncio.to_thread(_claim_batch, db, limit)
+        if not rows:
+            return 0
+        results = await asyncio.gather(*(_handle(row) for row in rows))
+        await asyncio.to_thread(_record_results, db, results)
+        return len(rows)
+    finally:
+        db.close()
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Handle incoming messages until ``stop`` is set."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    await poll_loop("Inbound WhatsApp", process_batch, stop, _wakeup, settings.INBOUND_POLL_SECONDS)
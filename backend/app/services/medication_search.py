@@ -0,0 +1,117 @@
+"""Medication search with each result's cheapest in-stock offer, in one query.
+
+Name/ingredient matching uses ``ILIKE`` backed by pg_trgm GIN indexes
+(created at startup by ``ensure_search_indexes``), ranked exact match first,
+then prefix, then trigram similarity. Hot queries are cached briefly in
+process since bot traffic is dominated by a handful of common drug names.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 256
+
+_cache: OrderedDict[tuple[str, int], tuple[float, list["SearchResult"]]] = OrderedDict()
+
+
+@dataclass
+class SearchResult:
+    medication_id: str
+    name: str
+    slug: str | None
+    price: float | None = None
+    pharmacy_name: str | None = None
+    pharmacy_chain: str | None = None
+
+
+_SEARCH_SQL = text(r"""
+    WITH matches AS (
+        SELECT m.id, m.name, m.slug,
+               CASE WHEN lower(m.name) = lower(:q) THEN 0
+                    WHEN m.name ILIKE :prefix THEN 1
+                    ELSE 2 END AS rank,
+               similarity(m.name, :q) AS sim
+        FROM medications m
+        WHERE m.name ILIKE :pattern OR m.active_ingredient ILIKE :pattern
+        ORDER BY rank, sim DESC, m.name
+        LIMIT :limit
+    )
+    SELECT matches.id, matches.name, matches.slug,
+           best.price, best.pharmacy_name, best.pharmacy_chain
+    FROM matches
+    LEFT JOIN LATERAL (
+        SELECT p.price, ph.name AS pharmacy_name, ph.chain AS pharmacy_chain
+        FROM prices p
+        JOIN pharmacies ph ON ph.id = p.pharmacy_id
+        WHERE p.medication_id = matches.id AND p.in_stock AND p.price > 0
+        ORDER BY p.price
+        LIMIT 1
+    ) best ON true
+    ORDER BY matches.rank, matches.sim DESC, matches.name
+""")
+
+
+def ensure_search_indexes(db: Session) -> None:
+    """Create pg_trgm and the trigram indexes used by ILIKE search (idempotent)."""
+    db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medications_name_trgm "
+        "ON medications USING gin (name gin_trgm_ops)"
+    ))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medications_active_ingredient_trgm "
+        "ON medications USING gin (active_ingredient gin_trgm_ops)"
+    ))
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", r"\%").replace("_", r"\_")
+
+
+def search_best_offers(db: Session, query: str, limit: int = 5) -> list[SearchResult]:
+    """Ranked medications matching ``query`` with their cheapest in-stock offer."""
+    q = query.strip()
+    escaped = _like_escape(q)
+    rows = db.execute(_SEARCH_SQL, {
+        "q": q,
+        "prefix": f"{escaped}%",
+        "pattern": f"%{escaped}%",
+        "limit": limit,
+    }).fetchall()
+    return [
+        SearchResult(
+            medication_id=str(r.id),
+            name=r.name,
+            slug=r.slug,
+            price=r.price,
+            pharmacy_name=r.pharmacy_name,
+            pharmacy_chain=r.pharmacy_chain,
+        )
+        for r in rows
+    ]
+
+
+async def search_best_offers_cached(query: str, limit: int = 5) -> list[SearchResult]:
+    """``search_best_offers`` through a small in-process TTL cache."""
+    from app.core.database import AsyncSessionLocal
+
+    key = (" ".join(query.lower().split()), limit)
+    now = time.monotonic()
+    hit = _cache.get(key)
+    if hit and now - hit[0] < CACHE_TTL_SECONDS:
+        _cache.move_to_end(key)
+        return hit[1]
+
+    async with AsyncSessionLocal() as db:
+        results = await db.run_sync(search_best_offers, query, limit)
+
+    _cache[key] = (now, results)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return results
@@ -2,49 +2,48 @@ import asyncio
 import logging
 
 from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.order import Order, OrderStatus
 from app.models.order_item import OrderItem
-from app.models.price import Price
 from app.schemas.order import OrderCreate
 from app.services.payment_service import create_mercadopago_preference, create_transbank_transaction
-from app.services.adherence_service import apply_adherence_discount
-from app.services import whatsapp
+from app.services.checkout_pricing import PriceNotFoundError, price_cart
+from app.services import site_settings, whatsapp
 
 logger = logging.getLogger(__name__)
 
 
-async def create_order(db: Session, user_id: str, phone_number: str, data: OrderCreate) -> Order:
-    total = 0.0
-    items = []
-    for item_data in data.items:
-        # Look up price — try by price_id first, fall back to medication+pharmacy match
-        price = db.query(Price).filter(Price.id == item_data.price_id).first()
-        if not price:
-            price = db.query(Price).filter(
-                Price.medication_id == item_data.medication_id,
-                Price.pharmacy_id == data.pharmacy_id,
-            ).first()
-        if not price:
-            raise HTTPException(status_code=404, detail=f"Price not found for medication {item_data.medication_id}")
+def ensure_order_indexes(db: Session) -> None:
+    """Indexes behind the keyset-paginated admin order list (idempotent)."""
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders (created_at DESC, id DESC)"
+    ))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_orders_status_created_at_id "
+        "ON orders (status, created_at DESC, id DESC)"
+    ))
 
-        base_price = price.price * item_data.quantity
 
-        # Apply adherence discount if enrolled
-        try:
-            discount_info = apply_adherence_discount(db, user_id, str(item_data.medication_id), base_price)
-            subtotal = discount_info["final_price"]
-        except Exception:
-            subtotal = base_price
+async def create_order(db: AsyncSession, user_id: str, phone_number: str, data: OrderCreate) -> Order:
+    # Prices, enrollments, tiers and caps for the whole cart in a few queries
+    try:
+        cart = await db.run_sync(price_cart, user_id, data.pharmacy_id, data.items)
+    except PriceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-        total += subtotal
-        items.append(OrderItem(
-            medication_id=item_data.medication_id,
-            price_id=price.id,
-            quantity=item_data.quantity,
-            subtotal=subtotal,
-        ))
+    total = cart.total
+    items = [
+        OrderItem(
+            medication_id=item.medication_id,
+            price_id=item.price_id,
+            quantity=item.quantity,
+            subtotal=item.subtotal,
+        )
+        for item in cart.items
+    ]
 
     order = Order(
         user_id=user_id,
@@ -53,7 +52,7 @@ async def create_order(db: Session, user_id: str, phone_number: str, data: Order
         total=total,
     )
     db.add(order)
-    db.flush()
+    await db.flush()
 
     for item in items:
         item.order_id = order.id
@@ -63,10 +62,15 @@ async def create_order(db: Session, user_id: str, phone_number: str, data: Order
 
     if data.payment_provider in ("mercadopago", "transbank"):
         try:
+            # Provider SDKs are blocking HTTP clients — keep them off the event loop
             if data.payment_provider == "mercadopago":
-                order.payment_url = create_mercadopago_preference(order_id_str, items, total)
+                order.payment_url = await asyncio.to_thread(
+                    create_mercadopago_preference, order_id_str, items, total
+                )
             elif data.payment_provider == "transbank":
-                order.payment_url = create_transbank_transaction(order_id_str, total)
+                order.payment_url = await asyncio.to_thread(
+                    create_transbank_transaction, order_id_str, total
+                )
         except Exception as e:
             logger.warning("Payment provider error (order still created): %s", e)
         order.status = OrderStatus.payment_sent
@@ -77,28 +81,20 @@ async def create_order(db: Session, user_id: str, phone_number: str, data: Order
     else:
         order.status = OrderStatus.payment_sent
 
-    # Send WhatsApp for offline payments (fire-and-forget in background)
+    await db.commit()
+    await db.refresh(order)
+
+    # Queue WhatsApp for offline payments (delivered by the outbound worker)
     if data.payment_provider == "cash_on_delivery":
         try:
-            asyncio.ensure_future(
-                whatsapp.send_cash_on_delivery_confirmation(phone_number, order_id_str, total)
-            )
+            await whatsapp.send_cash_on_delivery_confirmation(phone_number, order_id_str, total)
         except Exception:
-            logger.warning("Failed to send cash-on-delivery WhatsApp for order %s", order_id_str)
+            logger.warning("Failed to queue cash-on-delivery WhatsApp for order %s", order_id_str)
     elif data.payment_provider == "bank_transfer":
         try:
-            from app.models.site_setting import SiteSetting
-            bank_rows = db.query(SiteSetting).filter(
-                SiteSetting.key.in_(["bank_name", "bank_account_type", "bank_account_number",
-                                     "bank_rut", "bank_holder_name", "bank_email"])
-            ).all()
-            bank_details = {r.key: r.value for r in bank_rows}
-            asyncio.ensure_future(
-                whatsapp.send_bank_transfer_details(phone_number, order_id_str, total, bank_details)
-            )
+            bank_details = await db.run_sync(site_settings.get_bank_details)
+            await whatsapp.send_bank_transfer_details(phone_number, order_id_str, total, bank_details)
         except Exception:
-            logger.warning("Failed to send bank-transfer WhatsApp for order %s", order_id_str)
+            logger.warning("Failed to queue bank-transfer WhatsApp for order %s", order_id_str)
 
-    db.commit()
-    db.refresh(order)
     return order
@@ -0,0 +1,196 @@
+"""
+Durable outbound WhatsApp queue.
+
+Senders insert rows into ``outbound_messages`` and return immediately; the
+worker claims due rows with ``FOR UPDATE SKIP LOCKED`` (safe with several
+API processes), sends them through the shared ServiceTsunami client with
+bounded concurrency, and retries failures with exponential backoff.
+
+A batch is never larger than ``OUTBOUND_CONCURRENCY``: every claimed row is
+sent at once, so no row waits for a free slot while its lease runs out.
+
+Every message carries an idempotency key: enqueueing the same key twice is
+a no-op, and the key is forwarded to ServiceTsunami so a retried send is
+not delivered twice.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.polling import poll_loop
+from app.models.outbound_message import OutboundMessage, OutboundStatus
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed row stays invisible to other workers while sending;
+# must exceed one send, including a re-authenticated retry (2 x 60s timeout)
+CLAIM_LEASE_SECONDS = 180
+MAX_BACKOFF_SECONDS = 3600
+
+_wakeup: asyncio.Event | None = None
+
+
+def text_message(phone_number: str, message: str, idempotency_key: str | None = None) -> dict:
+    """Row for a plain text message."""
+    return {
+        "idempotency_key": idempotency_key or str(uuid.uuid4()),
+        "phone_number": phone_number,
+        "message_type": "text",
+        "payload": {"message": message},
+    }
+
+
+def template_message(
+    phone_number: str, template_name: str, template_params: dict | None = None,
+    idempotency_key: str | None = None,
+) -> dict:
+    """Row for an approved WhatsApp business template."""
+    return {
+        "idempotency_key": idempotency_key or str(uuid.uuid4()),
+        "phone_number": phone_number,
+        "message_type": "template",
+        "payload": {"template_name": template_name, "template_params": template_params or {}},
+    }
+
+
+def enqueue_many(db: Session, rows: list[dict]) -> int:
+    """Queue messages in the caller's transaction (one INSERT). Returns rows added.
+
+    The caller commits; call ``notify()`` afterwards to wake a local worker.
+    """
+    if not rows:
+        return 0
+    stmt = insert(OutboundMessage).values([
+        {"id": uuid.uuid4(), "status": OutboundStatus.pending, "attempts": 0, **row}
+        for row in rows
+    ]).on_conflict_do_nothing(index_elements=[OutboundMessage.idempotency_key])
+    return db.execute(stmt).rowcount
+
+
+async def enqueue(row: dict) -> None:
+    """Queue a single message in its own transaction and wake the worker."""
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(enqueue_many, [row])
+        await db.commit()
+    notify()
+
+
+def notify() -> None:
+    """Wake the in-process worker so new messages go out without waiting a poll."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+# ── Worker ──────────────────────────────────────────────────────────
+
+_CLAIM_SQL = text("""
+    UPDATE outbound_messages m
+    SET status = 'sending',
+        attempts = m.attempts + 1,
+        next_attempt_at = now() + make_interval(secs => :lease),
+        updated_at = now()
+    WHERE m.id IN (
+        SELECT id FROM outbound_messages
+        WHERE status IN ('pending', 'sending') AND next_attempt_at <= now()
+        ORDER BY next_attempt_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING m.id, m.idempotency_key, m.phone_number, m.message_type, m.payload, m.attempts
+""")
+
+
+def _claim_batch(db: Session, limit: int) -> list:
+    rows = db.execute(_CLAIM_SQL, {"lease": CLAIM_LEASE_SECONDS, "limit": limit}).fetchall()
+    db.commit()
+    return rows
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """Client errors other than auth/throttling will not succeed on retry."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return 400 <= code < 500 and code not in (401, 408, 429)
+    return False
+
+
+def _record_results(db: Session, results: list[tuple]) -> None:
+    now = datetime.now(timezone.utc)
+    for row, external_id, error in results:
+        msg = db.get(OutboundMessage, row.id)
+        if msg is None:
+            continue
+        if error is None:
+            msg.status = OutboundStatus.sent
+            msg.sent_at = now
+            msg.external_id = external_id
+            msg.last_error = None
+        elif _is_permanent(error) or row.attempts >= settings.OUTBOUND_MAX_ATTEMPTS:
+            msg.status = OutboundStatus.failed
+            msg.last_error = str(error)[:500]
+        else:
+            backoff = min(settings.OUTBOUND_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), MAX_BACKOFF_SECONDS)
+            msg.status = OutboundStatus.pending
+            msg.next_attempt_at = now + timedelta(seconds=backoff)
+            msg.last_error = str(error)[:500]
+    db.commit()
+
+
+async def _send(row) -> tuple:
+    from app.services.servicetsunami import tsunami_client
+
+    try:
+        if row.message_type == "template":
+            result = await tsunami_client.send_whatsapp_template(
+                row.phone_number,
+                row.payload["template_name"],
+                row.payload.get("template_params"),
+                idempotency_key=row.idempotency_key,
+            )
+        else:
+            result = await tsunami_client.send_whatsapp(
+                row.phone_number,
+                row.payload["message"],
+                idempotency_key=row.idempotency_key,
+            )
+        return row, str(result.get("id") or ""), None
+    except Exception as e:
+        return row, None, e
+
+
+async def process_batch(limit: int | None = None) -> int:
+    """Claim and send one batch of due messages. Returns messages attempted."""
+    from app.core.database import SessionLocal
+
+    # Claim only what is sent concurrently, so every lease covers one send
+    limit = min(limit or settings.OUTBOUND_CONCURRENCY, settings.OUTBOUND_CONCURRENCY)
+    db = SessionLocal()
+    try:
+        rows = await asyncio.to_thread(_claim_batch, db, limit)
+        if not rows:
+            return 0
+        results = await asyncio.gather(*(_send(row) for row in rows))
+        await asyncio.to_thread(_record_results, db, results)
+        failed = sum(1 for _, _, error in results if error is not None)
+        if failed:
+            logger.warning("Outbound batch: %d sent, %d failed", len(rows) - failed, failed)
+        return len(rows)
+    finally:
+        db.close()
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Drain the queue until ``stop`` is set."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    await poll_loop("Outbound WhatsApp", process_batch, stop, _wakeup, settings.OUTBOUND_POLL_SECONDS)
@@ -0,0 +1,83 @@
+"""
+Retail / non-retail classification of pharmacies.
+
+Retail pharmacies are consumer-facing stores where individuals can buy medicines.
+Non-retail entities include hospitals, clinics, foundations, municipal health centers,
+and other institutional buyers that appear in Cenabast data but are not pharmacies.
+
+All name patterns are compiled into one regex, so a pharmacy is classified
+with a single match. ``is_retail`` is used inline by the ETLs so new rows
+arrive classified; ``classify_all`` re-applies the rules to the whole table
+in one scan and one bulk update.
+"""
+
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Known retail pharmacy chains (scraped sources) — always retail
+RETAIL_CHAINS = {"cruz_verde", "salcobrand", "ahumada", "dr_simi"}
+
+# Patterns in pharmacy name that indicate non-retail institutional entities
+NON_RETAIL_PATTERNS = [
+    "ASOC",
+    "FUNDACION",
+    "CORPORACION",
+    "HOSPITAL",
+    "CLINICA",
+    "CESFAM",
+    "CONSULTORIO",
+    "MUNICIPALI",
+    "SERVICIO DE SALUD",
+    "INSTITUTO",
+    "HOGAR",
+    "CENTRO DE SALUD",
+]
+
+_NON_RETAIL_RE = re.compile("|".join(re.escape(p) for p in NON_RETAIL_PATTERNS))
+
+_UPDATE_SQL = text("""
+    UPDATE pharmacies p
+    SET is_retail = v.is_retail, updated_at = now()
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:flags AS boolean[])) AS v(id, is_retail)
+    WHERE p.id = v.id
+""")
+
+
+def is_retail(chain: str, name: str | None, default: bool = True) -> bool:
+    """Classify one pharmacy; ``default`` applies when no rule matches."""
+    if chain in RETAIL_CHAINS:
+        return True
+    if chain == "cenabast":
+        upper = (name or "").upper()
+        # The blocklist wins over "FARMACIA" (e.g. "FARMACIA HOSPITAL ...")
+        if _NON_RETAIL_RE.search(upper):
+            return False
+        if "FARMACIA" in upper:
+            return True
+    return default
+
+
+def classify_all(db: Session) -> dict:
+    """Reclassify every pharmacy, writing only rows whose flag changes.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    ids, flags = [], []
+    retail = non_retail = 0
+    for row_id, chain, name, current in db.execute(
+        text("SELECT id, chain, name, is_retail FROM pharmacies")
+    ):
+        flag = is_retail(chain, name, default=current if current is not None else True)
+        if flag:
+            retail += 1
+        else:
+            non_retail += 1
+        if flag != current:
+            ids.append(row_id)
+            flags.append(flag)
+
+    if ids:
+        db.execute(_UPDATE_SQL, {"ids": ids, "flags": flags})
+    return {"retail": retail, "non_retail": non_retail, "changed": len(ids)}
@@ -6,31 +6,19 @@ from sqlalchemy.orm import Session
 
 from app.models.price import Price
 from app.models.medication import Medication
-from app.models.pharmacy import Pharmacy
 from app.models.price_alert import PriceAlert
 from app.models.user import User
+from app.services import price_history
 
 logger = logging.getLogger(__name__)
 
 
-def get_price_history(db: Session, medication_id: str, limit: int = 100):
-    rows = db.query(
-        Price.scraped_at,
-        Price.price,
-        Pharmacy.chain,
-    ).join(Pharmacy, Price.pharmacy_id == Pharmacy.id).filter(
-        Price.medication_id == medication_id,
-        Price.scraped_at.isnot(None),
-    ).order_by(Price.scraped_at.desc()).limit(limit).all()
-
-    return [
-        {
-            "date": str(r.scraped_at)[:10] if r.scraped_at else "",
-            "price": float(r.price),
-            "pharmacy_chain": r.chain,
-        }
-        for r in rows
-    ]
+def get_price_history(db: Session, medication_id: str, bucket: str = "day", days: int = 90):
+    return price_history.get_price_history(db, medication_id, bucket=bucket, days=days)
+
+
+def get_price_trend(db: Session, medication_id: str, days: int = 90):
+    return price_history.get_price_trend(db, medication_id, days=days)
 
 
 def get_generic_alternatives(db: Session, medication_id: str):
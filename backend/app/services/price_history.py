@@ -0,0 +1,166 @@
+"""Append-only price history backed by the partitioned ``price_observations`` table.
+
+ETLs call ``record_observations`` with the prices that actually changed;
+premium endpoints read downsampled (daily/weekly) min/avg/max series.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import exists, func, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.partitions import ensure_monthly_partition, ensure_monthly_partitions, month_start
+from app.models.pharmacy import Pharmacy
+from app.models.price import Price
+from app.models.price_observation import PriceObservation
+
+logger = logging.getLogger(__name__)
+
+TABLE = PriceObservation.__tablename__
+BUCKETS = ("day", "week")
+# How far before a history window to look for each pharmacy's opening price
+OPENING_LOOKBACK_DAYS = 31
+
+
+def ensure_partitions(db: Session) -> None:
+    ensure_monthly_partitions(db, TABLE)
+
+
+def price_changed(old_price: float | None, old_in_stock: bool | None, price: float, in_stock: bool) -> bool:
+    """True when a (price, in_stock) pair differs from the last known one."""
+    if old_price is None:
+        return True
+    return round(old_price) != round(price) or bool(old_in_stock) != bool(in_stock)
+
+
+def observation(
+    medication_id, pharmacy_id, price: float, in_stock: bool, source: str, observed_at: datetime
+) -> dict:
+    return {
+        "medication_id": medication_id,
+        "pharmacy_id": pharmacy_id,
+        "price": int(round(price)),
+        "in_stock": bool(in_stock),
+        "source": source,
+        "observed_at": observed_at,
+    }
+
+
+def record_observations(db: Session, rows: list[dict]) -> int:
+    """Append observation rows (built with ``observation``) in one multi-row INSERT."""
+    if not rows:
+        return 0
+    for month in {month_start(r["observed_at"]) for r in rows}:
+        ensure_monthly_partition(db, TABLE, month)
+    db.execute(insert(PriceObservation), rows)
+    logger.info("Recorded %d price observations", len(rows))
+    return len(rows)
+
+
+def _opening_prices(db: Session, medication_id: str, since: datetime):
+    """Per-chain min/avg/max of each pharmacy's price at *since*.
+
+    Only the ``OPENING_LOOKBACK_DAYS`` before *since* are scanned, so the cost
+    does not grow with the amount of history. A pharmacy with no observation
+    from the lookback start until now has not changed price since then (ETLs
+    record every change), so its current ``prices`` row is its opening price.
+    A pharmacy whose last change before *since* is older than the lookback
+    but that changed inside the window has no opening price.
+    """
+    lookback = since - timedelta(days=OPENING_LOOKBACK_DAYS)
+    observed = (
+        db.query(PriceObservation.pharmacy_id, PriceObservation.price)
+        .filter(
+            PriceObservation.medication_id == medication_id,
+            PriceObservation.observed_at >= lookback,
+            PriceObservation.observed_at < since,
+        )
+        .distinct(PriceObservation.pharmacy_id)
+        .order_by(PriceObservation.pharmacy_id, PriceObservation.observed_at.desc())
+        .subquery()
+    )
+    changed_since_lookback = exists().where(
+        PriceObservation.medication_id == Price.medication_id,
+        PriceObservation.pharmacy_id == Price.pharmacy_id,
+        PriceObservation.observed_at >= lookback,
+    )
+    unchanged = select(Price.pharmacy_id, func.round(Price.price).label("price")).where(
+        Price.medication_id == medication_id, ~changed_since_lookback,
+    )
+    latest = union_all(select(observed.c.pharmacy_id, observed.c.price), unchanged).subquery()
+    return db.query(
+        Pharmacy.chain,
+        func.min(latest.c.price).label("min_price"),
+        func.avg(latest.c.price).label("avg_price"),
+        func.max(latest.c.price).label("max_price"),
+    ).join(latest, latest.c.pharmacy_id == Pharmacy.id).group_by(Pharmacy.chain).all()
+
+
+def get_price_history(db: Session, medication_id: str, bucket: str = "day", days: int = 90):
+    """Downsampled price series per chain over the last *days*.
+
+    Each point carries the min/avg/max of the observations in its bucket; the
+    first point of each chain is the price carried in from before the window.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unsupported bucket: {bucket}")
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    period = func.date_trunc(bucket, PriceObservation.observed_at).label("period")
+
+    rows = db.query(
+        period,
+        Pharmacy.chain,
+        func.min(PriceObservation.price).label("min_price"),
+        func.avg(PriceObservation.price).label("avg_price"),
+        func.max(PriceObservation.price).label("max_price"),
+    ).join(Pharmacy, PriceObservation.pharmacy_id == Pharmacy.id).filter(
+        PriceObservation.medication_id == medication_id,
+        PriceObservation.observed_at >= since,
+    ).group_by(period, Pharmacy.chain).order_by(period).all()
+
+    def _point(date_str, r):
+        avg = round(float(r.avg_price), 0)
+        return {
+            "date": date_str,
+            "price": avg,
+            "min_price": float(r.min_price),
+            "avg_price": avg,
+            "max_price": float(r.max_price),
+            "pharmacy_chain": r.chain,
+        }
+
+    start = str(since.date())
+    results = [_point(start, r) for r in _opening_prices(db, medication_id, since)]
+    results.extend(_point(str(r.period)[:10], r) for r in rows)
+    return results
+
+
+def get_price_trend(db: Session, medication_id: str, days: int = 90):
+    """Per-chain change between the first and last point of the history window,
+    with the min/max over the whole window."""
+    first: dict[str, float] = {}
+    last: dict[str, dict] = {}
+    lows: dict[str, float] = {}
+    highs: dict[str, float] = {}
+    for point in get_price_history(db, medication_id, bucket="week", days=days):
+        chain = point["pharmacy_chain"]
+        first.setdefault(chain, point["avg_price"])
+        last[chain] = point
+        lows[chain] = min(lows.get(chain, point["min_price"]), point["min_price"])
+        highs[chain] = max(highs.get(chain, point["max_price"]), point["max_price"])
+
+    results = []
+    for chain, point in last.items():
+        start = first[chain]
+        change_pct = round((point["avg_price"] - start) / start * 100, 1) if start else 0
+        results.append({
+            "pharmacy_chain": chain,
+            "start_price": start,
+            "current_price": point["avg_price"],
+            "min_price": lows[chain],
+            "max_price": highs[chain],
+            "change_pct": change_pct,
+        })
+    results.sort(key=lambda x: x["current_price"])
+    return results
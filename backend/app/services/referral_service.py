@@ -1,8 +1,8 @@
 import logging
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models.referral_event import ReferralEvent, ReferralEventType
+from app.models.referral_event import ReferralEventType
+from app.services import event_ingest, funnel_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -16,38 +16,21 @@ def track_event(
     pharmacy_id: str = None,
     order_id: str = None,
 ):
-    try:
-        event = ReferralEvent(
-            event_type=event_type,
-            user_id=user_id,
-            session_id=session_id,
-            medication_id=medication_id,
-            pharmacy_id=pharmacy_id,
-            order_id=order_id,
-        )
-        db.add(event)
-        db.commit()
-    except Exception:
-        logger.exception("Failed to track referral event")
-        db.rollback()
+    """Buffer a funnel event; ``db`` is only used when the event is written inline."""
+    event_ingest.track(
+        db,
+        event_type=event_type,
+        user_id=user_id,
+        session_id=session_id,
+        medication_id=medication_id,
+        pharmacy_id=pharmacy_id,
+        order_id=order_id,
+    )
 
 
 def get_conversion_funnel(db: Session, start_date=None, end_date=None):
-    q = db.query(
-        ReferralEvent.event_type,
-        func.count(ReferralEvent.id).label("count"),
-        func.count(func.distinct(ReferralEvent.user_id)).label("unique_users"),
-    ).group_by(ReferralEvent.event_type)
+    """Event counts and distinct users per funnel step, from the daily rollups.
 
-    if start_date:
-        q = q.filter(ReferralEvent.created_at >= start_date)
-    if end_date:
-        q = q.filter(ReferralEvent.created_at <= end_date)
-
-    results = {}
-    for row in q.all():
-        results[row.event_type.value] = {
-            "count": int(row.count),
-            "unique_users": int(row.unique_users),
-        }
-    return results
+    Bounds are whole UTC days, inclusive; see ``funnel_rollups``.
+    """
+    return funnel_rollups.get_funnel(db, start_date, end_date)
@@ -10,6 +10,7 @@ Flow:
   5. OpenClaw executes the WhatsApp skill (sends via WhatsApp Cloud API)
 """
 
+import asyncio
 import logging
 from typing import Any
 
@@ -22,19 +23,42 @@ _API = settings.SERVICETSUNAMI_API_URL.rstrip("/")
 
 
 class ServiceTsunamiClient:
-    """Thin async wrapper around the ServiceTsunami orchestration API."""
+    """Thin async wrapper around the ServiceTsunami orchestration API.
 
-    def __init__(self) -> None:
+    Requests share one pooled ``httpx.AsyncClient``; call ``aclose()`` on
+    shutdown.
+    """
+
+    def __init__(self, max_connections: int = 20) -> None:
         self._token: str | None = None
+        self._token_lock = asyncio.Lock()
+        self._client: httpx.AsyncClient | None = None
+        self._limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=_API, timeout=60, limits=self._limits)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     # ── Auth ──────────────────────────────────────────────────────────
 
     async def _get_token(self) -> str:
         if self._token:
             return self._token
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{_API}/api/v1/auth/login",
+        # Concurrent senders share a single login
+        async with self._token_lock:
+            if self._token:
+                return self._token
+            resp = await self.client.post(
+                "/api/v1/auth/login",
                 data={
                     "username": settings.SERVICETSUNAMI_EMAIL,
                     "password": settings.SERVICETSUNAMI_PASSWORD,
@@ -53,41 +77,41 @@ class ServiceTsunamiClient:
 
     # ── Generic helpers ──────────────────────────────────────────────
 
-    async def _post(self, path: str, json: dict) -> dict:
-        """POST with auto-retry on 401 (token expired)."""
-        async with httpx.AsyncClient(timeout=60) as client:
-            headers = await self._headers()
-            resp = await client.post(f"{_API}{path}", headers=headers, json=json)
-
-            if resp.status_code == 401:
-                self.invalidate_token()
-                headers = await self._headers()
-                resp = await client.post(f"{_API}{path}", headers=headers, json=json)
+    async def _request(self, method: str, path: str, timeout: float, **kwargs) -> dict:
+        """Send a request, re-authenticating once on 401 (token expired)."""
+        extra_headers = kwargs.pop("headers", None) or {}
+        headers = {**await self._headers(), **extra_headers}
+        resp = await self.client.request(method, path, headers=headers, timeout=timeout, **kwargs)
 
-            resp.raise_for_status()
-            return resp.json()
+        if resp.status_code == 401:
+            self.invalidate_token()
+            headers = {**await self._headers(), **extra_headers}
+            resp = await self.client.request(method, path, headers=headers, timeout=timeout, **kwargs)
 
-    async def _get(self, path: str) -> dict:
-        async with httpx.AsyncClient(timeout=30) as client:
-            headers = await self._headers()
-            resp = await client.get(f"{_API}{path}", headers=headers)
+        resp.raise_for_status()
+        return resp.json()
 
-            if resp.status_code == 401:
-                self.invalidate_token()
-                headers = await self._headers()
-                resp = await client.get(f"{_API}{path}", headers=headers)
+    async def _post(self, path: str, json: dict, headers: dict | None = None) -> dict:
+        return await self._request("POST", path, timeout=60, json=json, headers=headers)
 
-            resp.raise_for_status()
-            return resp.json()
+    async def _get(self, path: str) -> dict:
+        return await self._request("GET", path, timeout=30)
 
     # ── WhatsApp via OpenClaw skill ──────────────────────────────────
 
-    async def send_whatsapp(self, phone_number: str, message: str, message_type: str = "text") -> dict:
+    async def send_whatsapp(
+        self,
+        phone_number: str,
+        message: str,
+        message_type: str = "text",
+        idempotency_key: str | None = None,
+    ) -> dict:
         """
         Send a WhatsApp message through the OpenClaw WhatsApp skill.
 
         Creates an AgentTask that the SkillRouter dispatches to the
-        tenant's running OpenClaw instance.
+        tenant's running OpenClaw instance. ``idempotency_key`` is passed
+        as the ``Idempotency-Key`` header so retried sends are not duplicated.
         """
         task_payload = {
             "assigned_agent_id": settings.SERVICETSUNAMI_AGENT_ID or None,
@@ -105,8 +129,9 @@ class ServiceTsunamiClient:
             "requires_approval": False,
             "priority": "high",
         }
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
         try:
-            result = await self._post("/api/v1/tasks", json=task_payload)
+            result = await self._post("/api/v1/tasks", json=task_payload, headers=headers)
             logger.info("WhatsApp task created: %s → %s", result.get("id"), phone_number)
             return result
         except httpx.HTTPStatusError as exc:
@@ -121,6 +146,7 @@ class ServiceTsunamiClient:
         phone_number: str,
         template_name: str,
         template_params: dict[str, Any] | None = None,
+        idempotency_key: str | None = None,
     ) -> dict:
         """Send a WhatsApp template message (for approved business templates)."""
         task_payload = {
@@ -139,8 +165,9 @@ class ServiceTsunamiClient:
             "requires_approval": False,
             "priority": "high",
         }
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
         try:
-            return await self._post("/api/v1/tasks", json=task_payload)
+            return await self._post("/api/v1/tasks", json=task_payload, headers=headers)
         except Exception:
             logger.exception("Failed to send template '%s' to %s", template_name, phone_number)
             raise
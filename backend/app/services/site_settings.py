@@ -0,0 +1,42 @@
+"""Site settings (bank details and similar) behind a short in-process cache.
+
+Settings are read on every checkout and change only through admin edits,
+which call ``invalidate()`` after committing.
+"""
+
+import time
+
+from sqlalchemy.orm import Session
+
+from app.models.site_setting import SiteSetting
+
+CACHE_TTL_SECONDS = 300
+
+BANK_KEYS = [
+    "bank_name", "bank_account_type", "bank_account_number",
+    "bank_rut", "bank_holder_name", "bank_email",
+]
+
+_cache: dict[str, str] = {}
+_loaded_at: float | None = None
+
+
+def get_settings(db: Session, keys: list[str]) -> dict[str, str]:
+    """Values for ``keys`` that are set, from the cache when fresh."""
+    global _cache, _loaded_at
+    now = time.monotonic()
+    if _loaded_at is None or now - _loaded_at >= CACHE_TTL_SECONDS:
+        # The table is a handful of rows; load it whole so any key is a hit
+        _cache = {row.key: row.value for row in db.query(SiteSetting).all()}
+        _loaded_at = now
+    return {key: _cache[key] for key in keys if key in _cache}
+
+
+def get_bank_details(db: Session) -> dict[str, str]:
+    return get_settings(db, BANK_KEYS)
+
+
+def invalidate() -> None:
+    """Drop cached settings; the next read reloads them."""
+    global _loaded_at
+    _loaded_at = None
@@ -0,0 +1,238 @@
+"""
+Dashboard counters without full-table COUNT/SUM on every page load.
+
+Three sources, read together through a short-TTL in-process snapshot:
+
+* Trigger-maintained (exact): users and orders. Row triggers append
+  increments to ``stat_counter_deltas``; ``compact`` (a scheduled job) folds
+  them into ``stat_counters``. Reads add the two, so they are exact at once.
+* ETL-maintained (exact as of the last import): BMS and Cenabast row counts
+  and revenue, recomputed by ``refresh_source_counters`` after each import.
+* Estimates: ``pg_class.reltuples`` for scrape-fed catalog tables where an
+  approximate size is enough.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+CACHE_TTL_SECONDS = 30
+
+PAID_STATUSES = ("confirmed", "delivering", "completed")
+
+TRIGGER_COUNTERS = ("users_total", "orders_total", "orders_paid", "orders_paid_revenue")
+
+ESTIMATED_TABLES = ("medications", "pharmacies", "prices")
+
+_PAID_SQL_LIST = ", ".join(f"'{s}'" for s in PAID_STATUSES)
+
+_FUNCTIONS = [
+    f"""
+    CREATE OR REPLACE FUNCTION stat_counters_orders() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO stat_counter_deltas (name, delta) VALUES ('orders_total', 1);
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO stat_counter_deltas (name, delta) VALUES ('orders_total', -1);
+        END IF;
+        IF TG_OP <> 'INSERT' AND OLD.status::text IN ({_PAID_SQL_LIST}) THEN
+            INSERT INTO stat_counter_deltas (name, delta)
+            VALUES ('orders_paid', -1), ('orders_paid_revenue', -COALESCE(OLD.total, 0));
+        END IF;
+        IF TG_OP <> 'DELETE' AND NEW.status::text IN ({_PAID_SQL_LIST}) THEN
+            INSERT INTO stat_counter_deltas (name, delta)
+            VALUES ('orders_paid', 1), ('orders_paid_revenue', COALESCE(NEW.total, 0));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION stat_counters_users() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO stat_counter_deltas (name, delta)
+        VALUES ('users_total', CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+_TRIGGERS = {
+    "stat_counters_orders_ins_del": """
+        CREATE TRIGGER stat_counters_orders_ins_del
+        AFTER INSERT OR DELETE ON orders
+        FOR EACH ROW EXECUTE FUNCTION stat_counters_orders()
+    """,
+    "stat_counters_orders_upd": """
+        CREATE TRIGGER stat_counters_orders_upd
+        AFTER UPDATE OF status, total ON orders
+        FOR EACH ROW
+        WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.total IS DISTINCT FROM NEW.total)
+        EXECUTE FUNCTION stat_counters_orders()
+    """,
+    "stat_counters_users": """
+        CREATE TRIGGER stat_counters_users
+        AFTER INSERT OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION stat_counters_users()
+    """,
+}
+
+_SEED_TRIGGER_COUNTERS_SQL = text(f"""
+    INSERT INTO stat_counters (name, value, updated_at)
+    SELECT name, value, now() FROM (
+        SELECT 'users_total' AS name, count(*)::float8 AS value FROM users
+        UNION ALL
+        SELECT 'orders_total', count(*) FROM orders
+        UNION ALL
+        SELECT 'orders_paid', count(*) FROM orders WHERE status::text IN ({_PAID_SQL_LIST})
+        UNION ALL
+        SELECT 'orders_paid_revenue', COALESCE(sum(total), 0) FROM orders
+        WHERE status::text IN ({_PAID_SQL_LIST})
+    ) v
+    ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+""")
+
+_SOURCE_COUNTERS_SQL = {
+    "bms": """
+        SELECT 'bms_distributions' AS name, count(*)::float8 AS value FROM bms_distributions
+        UNION ALL SELECT 'bms_revenue', COALESCE(sum(net_amount), 0) FROM bms_distributions
+        UNION ALL SELECT 'bms_purchase_orders', count(*) FROM bms_purchase_orders
+        UNION ALL SELECT 'bms_adjudications', count(*) FROM bms_adjudications
+        UNION ALL SELECT 'bms_institutions', count(*) FROM bms_institutions
+    """,
+    "cenabast": """
+        SELECT 'cenabast_products' AS name, count(*)::float8 AS value FROM cenabast_products
+        UNION ALL SELECT 'cenabast_invoices', count(*) FROM cenabast_invoices
+        UNION ALL SELECT 'cenabast_revenue', COALESCE(sum(monto_bruto), 0) FROM cenabast_invoices
+    """,
+}
+
+_COMPACT_SQL = text("""
+    WITH moved AS (
+        DELETE FROM stat_counter_deltas RETURNING name, delta
+    ), summed AS (
+        SELECT name, sum(delta) AS delta FROM moved GROUP BY name
+    )
+    INSERT INTO stat_counters (name, value, updated_at)
+    SELECT name, delta, now() FROM summed
+    ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value, updated_at = now()
+""")
+
+_READ_SQL = text("""
+    SELECT name, sum(value) AS value FROM (
+        SELECT name, value FROM stat_counters
+        UNION ALL
+        SELECT name, delta FROM stat_counter_deltas
+    ) c
+    GROUP BY name
+""")
+
+_ESTIMATE_SQL = text("""
+    SELECT c.relname, c.reltuples
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema() AND c.relname = ANY(:tables)
+""")
+
+
+@dataclass(frozen=True)
+class CounterSnapshot:
+    loaded_at: float
+    counters: dict[str, float] = field(default_factory=dict)
+    row_estimates: dict[str, int] = field(default_factory=dict)
+
+    def get(self, name: str, default: float = 0) -> float:
+        return self.counters.get(name, default)
+
+
+_snapshot: CounterSnapshot | None = None
+_lock = threading.Lock()
+
+
+# ── Maintenance ─────────────────────────────────────────────────────
+
+def seed_trigger_counters(db: Session) -> None:
+    """Recount users and orders exactly, discarding pending deltas.
+
+    Locks both tables against writes for the rest of the transaction so the
+    count and the deltas cannot drift apart; the caller commits.
+    """
+    db.execute(text("LOCK TABLE users, orders IN SHARE MODE"))
+    db.execute(text("DELETE FROM stat_counter_deltas WHERE name = ANY(:names)"),
+               {"names": list(TRIGGER_COUNTERS)})
+    db.execute(_SEED_TRIGGER_COUNTERS_SQL)
+
+
+def refresh_source_counters(db: Session, source: str) -> None:
+    """Recompute one import source's counters; runs in the caller's transaction."""
+    if source not in _SOURCE_COUNTERS_SQL:
+        raise ValueError(f"Unknown counter source: {source}")
+    db.execute(text(f"""
+        INSERT INTO stat_counters (name, value, updated_at)
+        SELECT name, value, now() FROM ({_SOURCE_COUNTERS_SQL[source]}) v
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+    """))
+
+
+def ensure_counters(db: Session) -> None:
+    """Install the counter triggers and seed any missing counters (idempotent)."""
+    for ddl in _FUNCTIONS:
+        db.execute(text(ddl))
+    installed = set(db.execute(
+        text("SELECT tgname FROM pg_trigger WHERE tgname = ANY(:names) AND NOT tgisinternal"),
+        {"names": list(_TRIGGERS)},
+    ).scalars())
+    for name, ddl in _TRIGGERS.items():
+        if name not in installed:
+            db.execute(text(ddl))
+
+    present = set(db.execute(text("SELECT name FROM stat_counters")).scalars())
+    if not set(TRIGGER_COUNTERS) <= present:
+        seed_trigger_counters(db)
+    if "bms_distributions" not in present:
+        refresh_source_counters(db, "bms")
+    if "cenabast_invoices" not in present:
+        refresh_source_counters(db, "cenabast")
+
+
+def compact(db: Session) -> None:
+    """Fold pending trigger deltas into their counters and commit."""
+    db.execute(_COMPACT_SQL)
+    db.commit()
+
+
+# ── Reads ───────────────────────────────────────────────────────────
+
+def _load(db: Session) -> CounterSnapshot:
+    counters = {row.name: row.value for row in db.execute(_READ_SQL)}
+    estimates = {}
+    for relname, reltuples in db.execute(_ESTIMATE_SQL, {"tables": list(ESTIMATED_TABLES)}):
+        if reltuples is not None and reltuples >= 0:
+            estimates[relname] = int(reltuples)
+    for table in ESTIMATED_TABLES:
+        if table not in estimates:
+            # Never analyzed (reltuples = -1): count once
+            estimates[table] = db.execute(text(f"SELECT count(*) FROM {table}")).scalar() or 0
+    return CounterSnapshot(loaded_at=time.monotonic(), counters=counters, row_estimates=estimates)
+
+
+def get_snapshot(db: Session) -> CounterSnapshot:
+    """Current counters and row estimates, reloading if older than the TTL."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at >= CACHE_TTL_SECONDS:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or time.monotonic() - snapshot.loaded_at >= CACHE_TTL_SECONDS:
+                snapshot = _snapshot = _load(db)
+    return snapshot
+
+
+def invalidate() -> None:
+    """Drop the cached snapshot; the next read reloads it."""
+    global _snapshot
+    _snapshot = None
@@ -3,15 +3,28 @@ WhatsApp messaging service — Remedia-specific message templates
 dispatched through ServiceTsunami's OpenClaw WhatsApp skill.
 
 All outbound WhatsApp messages go through this service so we have
-a single place to manage message copy and formatting.
+a single place to manage message copy and formatting. Messages are
+queued in ``outbound_messages`` and delivered by the outbound worker
+(see ``app.services.outbound_queue``), so sending never blocks on
+ServiceTsunami.
 """
 
 import logging
+
+import httpx
+from app.services import outbound_queue
 from app.services.servicetsunami import tsunami_client
 
 logger = logging.getLogger(__name__)
 
 
+async def send_text(phone_number: str, message: str, idempotency_key: str | None = None) -> dict:
+    """Queue a free-form text message."""
+    row = outbound_queue.text_message(phone_number, message, idempotency_key)
+    await outbound_queue.enqueue(row)
+    return {"queued": row["idempotency_key"]}
+
+
 async def send_otp(phone_number: str, code: str) -> dict:
     """Send OTP verification code via WhatsApp."""
     message = (
@@ -19,7 +32,7 @@ async def send_otp(phone_number: str, code: str) -> dict:
         f"Tu código es: *{code}*\n\n"
         f"Expira en 5 minutos. No compartas este código con nadie."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
 async def send_order_confirmation(phone_number: str, order_id: str, total: float, payment_url: str) -> dict:
@@ -31,7 +44,7 @@ async def send_order_confirmation(phone_number: str, order_id: str, total: float
         f"Completa tu pago aquí:\n{payment_url}\n\n"
         f"Una vez confirmado el pago, coordinaremos el delivery."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message, f"order_confirmation:{order_id}")
 
 
 async def send_payment_confirmed(phone_number: str, order_id: str) -> dict:
@@ -42,7 +55,7 @@ async def send_payment_confirmed(phone_number: str, order_id: str) -> dict:
         f"Pedido #{short_id}: tu pago fue recibido.\n"
         f"Estamos preparando tu pedido para delivery."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message, f"payment_confirmed:{order_id}")
 
 
 async def send_cash_on_delivery_confirmation(phone_number: str, order_id: str, total: float) -> dict:
@@ -54,7 +67,7 @@ async def send_cash_on_delivery_confirmation(phone_number: str, order_id: str, t
         f"Total: ${int(total):,} CLP\n\n"
         f"Paga en efectivo al momento de la entrega."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message, f"order_confirmation:{order_id}")
 
 
 async def send_bank_transfer_details(
@@ -75,7 +88,7 @@ async def send_bank_transfer_details(
         f"Email: {bank_details.get('bank_email', '-')}\n\n"
         f"Tu pedido sera confirmado al verificar el pago."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message, f"order_confirmation:{order_id}")
 
 
 async def send_delivery_update(phone_number: str, order_id: str, status: str, rider_name: str | None = None, eta_minutes: int | None = None) -> dict:
@@ -101,18 +114,22 @@ async def send_delivery_update(phone_number: str, order_id: str, status: str, ri
             f"Pedido #{short_id}: estado actualizado a *{status}*."
         )
 
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message, f"delivery:{order_id}:{status}")
 
 
-async def send_price_alert(phone_number: str, medication_name: str, pharmacy_name: str, price: float) -> dict:
-    """Notify user about a price drop on a favorited medication."""
-    message = (
+def price_alert_message(medication_name: str, pharmacy_name: str, price: float) -> str:
+    return (
         f"💊 *Remedia — Alerta de precio*\n\n"
         f"*{medication_name}* bajó a *${price:,.0f} CLP*\n"
         f"en {pharmacy_name}.\n\n"
         f"Busca en Remedia para comparar precios."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+
+
+async def send_price_alert(phone_number: str, medication_name: str, pharmacy_name: str, price: float) -> dict:
+    """Notify user about a price drop on a favorited medication."""
+    message = price_alert_message(medication_name, pharmacy_name, price)
+    return await send_text(phone_number, message)
 
 
 async def send_gpo_threshold_reached(phone_number: str, product_name: str, quantity: int, member_count: int) -> dict:
@@ -123,7 +140,7 @@ async def send_gpo_threshold_reached(phone_number: str, product_name: str, quant
         f"Miembros participantes: *{member_count}*\n\n"
         f"Ya puedes crear la orden grupal."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
 async def send_gpo_order_status_update(phone_number: str, order_ref: str, new_status: str) -> dict:
@@ -131,7 +148,7 @@ async def send_gpo_order_status_update(phone_number: str, order_ref: str, new_st
         f"📦 *Remedia GPO — Actualización de orden*\n\n"
         f"Orden *{order_ref[:8]}*: estado actualizado a *{new_status}*."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
 async def send_gpo_allocation_ready(phone_number: str, product_name: str, quantity: int, price: float) -> dict:
@@ -141,17 +158,21 @@ async def send_gpo_allocation_ready(phone_number: str, product_name: str, quanti
         f"Cantidad: *{quantity:,} unidades*\n"
         f"Precio unitario: *${price:,.0f} CLP*"
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
-async def send_refill_reminder(phone_number: str, medication_name: str, days_until: int, current_discount: float) -> dict:
+def refill_reminder_message(medication_name: str, days_until: int, current_discount: float) -> str:
     discount_text = f" (descuento actual: {round(current_discount * 100)}%)" if current_discount > 0 else ""
-    message = (
+    return (
         f"💊 *Remedia — Recordatorio de recarga*\n\n"
         f"Tu recarga de *{medication_name}* vence en *{days_until} días*{discount_text}.\n\n"
         f"Recarga a tiempo para mantener tu racha y descuento."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+
+
+async def send_refill_reminder(phone_number: str, medication_name: str, days_until: int, current_discount: float) -> dict:
+    message = refill_reminder_message(medication_name, days_until, current_discount)
+    return await send_text(phone_number, message)
 
 
 async def send_refill_completed(phone_number: str, medication_name: str, discount_pct: float, savings: float, streak: int, next_due: str) -> dict:
@@ -162,7 +183,7 @@ async def send_refill_completed(phone_number: str, medication_name: str, discoun
         f"Racha: *{streak} recargas consecutivas*\n"
         f"Próxima recarga: *{next_due}*"
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
 async def send_streak_broken(phone_number: str, medication_name: str, lost_discount_pct: float) -> dict:
@@ -172,7 +193,7 @@ async def send_streak_broken(phone_number: str, medication_name: str, lost_disco
         f"Tu racha se reinició y perdiste el descuento de *{round(lost_discount_pct * 100)}%*.\n\n"
         f"Vuelve a recargar para comenzar a acumular descuentos nuevamente."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
 async def send_tier_upgrade(phone_number: str, medication_name: str, new_discount_pct: float, streak: int) -> dict:
@@ -181,59 +202,66 @@ async def send_tier_upgrade(phone_number: str, medication_name: str, new_discoun
         f"¡Felicidades! Alcanzaste *{streak} recargas consecutivas* de *{medication_name}*.\n"
         f"Tu nuevo descuento es *{round(new_discount_pct * 100)}%*."
     )
-    return await tsunami_client.send_whatsapp(phone_number, message)
+    return await send_text(phone_number, message)
 
 
-async def _handle_medication_search(sender_phone: str, query: str) -> dict | None:
+async def _handle_medication_search(sender_phone: str, query: str, message_id: str) -> dict | None:
     """Search medications and send price comparison via WhatsApp. Returns result or None."""
-    from app.core.database import SessionLocal
-    from app.models.medication import Medication
-    from app.models.price import Price
-    from app.models.pharmacy import Pharmacy
+    from app.services.medication_search import search_best_offers_cached
 
-    db = SessionLocal()
     try:
-        # Search by name
-        meds = db.query(Medication).filter(
-            Medication.name.ilike(f"%{query}%")
-        ).limit(5).all()
+        results = await search_best_offers_cached(query, limit=5)
 
-        if not meds:
-            await tsunami_client.send_whatsapp(
+        if not results:
+            await send_text(
                 sender_phone,
                 f"No encontramos resultados para *{query}*.\n"
-                f"Intenta con otro nombre o principio activo."
+                f"Intenta con otro nombre o principio activo.",
+                f"reply:{message_id}:search",
             )
             return {"action": "search", "results": 0}
 
-        # For each medication, find cheapest price
         lines = [f"*Resultados para \"{query}\":*\n"]
-        for i, med in enumerate(meds, 1):
-            best = (
-                db.query(Price, Pharmacy)
-                .join(Pharmacy, Price.pharmacy_id == Pharmacy.id)
-                .filter(Price.medication_id == med.id, Price.in_stock == True, Price.price > 0)
-                .order_by(Price.price.asc())
-                .first()
-            )
-            if best:
-                price, pharmacy = best
+        for i, r in enumerate(results, 1):
+            if r.price is not None:
                 lines.append(
-                    f"{i}. *{med.name}*\n"
-                    f"   ${price.price:,.0f} CLP en {pharmacy.name}"
+                    f"{i}. *{r.name}*\n"
+                    f"   ${r.price:,.0f} CLP en {r.pharmacy_name}"
                 )
             else:
-                lines.append(f"{i}. *{med.name}* — Sin stock")
+                lines.append(f"{i}. *{r.name}* — Sin stock")
 
         lines.append("\nBusca en remedia.cl para ver todas las opciones y comprar.")
-        await tsunami_client.send_whatsapp(sender_phone, "\n".join(lines))
-        return {"action": "search", "results": len(meds)}
+        await send_text(sender_phone, "\n".join(lines), f"reply:{message_id}:search")
+        return {"action": "search", "results": len(results)}
 
     except Exception:
         logger.exception("WhatsApp medication search failed for %s", query)
         return None
-    finally:
-        db.close()
+
+
+async def _chat_session_for(phone_number: str, renew: bool = False) -> str:
+    """ServiceTsunami chat session for a phone number, created on first use."""
+    from sqlalchemy import select
+    from app.core.database import AsyncSessionLocal
+    from app.models.whatsapp_chat_session import WhatsappChatSession
+
+    async with AsyncSessionLocal() as db:
+        row = await db.scalar(
+            select(WhatsappChatSession).where(WhatsappChatSession.phone_number == phone_number)
+        )
+        if row and not renew:
+            return row.session_id
+
+        session = await tsunami_client.create_chat_session(
+            title=f"Remedia WhatsApp — {phone_number}",
+        )
+        if row:
+            row.session_id = session["id"]
+        else:
+            db.add(WhatsappChatSession(phone_number=phone_number, session_id=session["id"]))
+        await db.commit()
+        return session["id"]
 
 
 async def handle_incoming_message(sender_phone: str, message_body: str, message_id: str) -> dict:
@@ -250,27 +278,28 @@ async def handle_incoming_message(sender_phone: str, message_body: str, message_
     for prefix in ("buscar ", "precio ", "comprar "):
         if text.startswith(prefix):
             query = message_body.strip()[len(prefix):]
-            result = await _handle_medication_search(sender_phone, query)
+            result = await _handle_medication_search(sender_phone, query, message_id)
             if result:
                 return result
 
     # Order status: "orden abc123" — find latest order for this user
     if text.startswith("orden"):
-        from app.core.database import SessionLocal
+        from sqlalchemy import select
+        from app.core.database import AsyncSessionLocal
         from app.models.order import Order
         from app.models.user import User
 
-        db = SessionLocal()
         try:
-            user = db.query(User).filter(User.phone_number == sender_phone).first()
-            if user:
+            async with AsyncSessionLocal() as db:
+                user = await db.scalar(select(User).where(User.phone_number == sender_phone))
                 # Get most recent order
-                order = (
-                    db.query(Order)
-                    .filter(Order.user_id == user.id)
+                order = await db.scalar(
+                    select(Order)
+                    .where(Order.user_id == user.id)
                     .order_by(Order.created_at.desc())
-                    .first()
-                )
+                    .limit(1)
+                ) if user else None
+            if user:
                 if order:
                     status_labels = {
                         "pending": "Pendiente",
@@ -281,30 +310,24 @@ async def handle_incoming_message(sender_phone: str, message_body: str, message_
                         "cancelled": "Cancelado",
                     }
                     status_label = status_labels.get(order.status.value, order.status.value)
-                    await tsunami_client.send_whatsapp(
+                    await send_text(
                         sender_phone,
                         f"*Orden #{str(order.id)[:8]}*\n"
                         f"Estado: *{status_label}*\n"
-                        f"Total: *${order.total:,.0f} CLP*"
+                        f"Total: *${order.total:,.0f} CLP*",
+                        f"reply:{message_id}:order",
                     )
                     return {"action": "order_status", "order_id": str(order.id)}
                 else:
-                    await tsunami_client.send_whatsapp(
-                        sender_phone, "No tienes ordenes recientes."
+                    await send_text(
+                        sender_phone, "No tienes ordenes recientes.", f"reply:{message_id}:order"
                     )
                     return {"action": "order_status", "order_id": None}
         except Exception:
             logger.exception("WhatsApp order status lookup failed")
-        finally:
-            db.close()
 
     # Fallback: route to ServiceTsunami conversational AI
     try:
-        session = await tsunami_client.create_chat_session(
-            title=f"Remedia WhatsApp — {sender_phone}",
-        )
-        session_id = session["id"]
-
         context_message = (
             f"[Remedia WhatsApp]\n"
             f"From: {sender_phone}\n"
@@ -312,21 +335,30 @@ async def handle_incoming_message(sender_phone: str, message_body: str, message_
             f"{message_body}"
         )
 
-        response = await tsunami_client.send_chat_message(session_id, context_message)
+        session_id = await _chat_session_for(sender_phone)
+        try:
+            response = await tsunami_client.send_chat_message(session_id, context_message)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 404:
+                raise
+            # Session expired upstream: start a new one for this number
+            session_id = await _chat_session_for(sender_phone, renew=True)
+            response = await tsunami_client.send_chat_message(session_id, context_message)
         assistant_reply = response.get("assistant_message", {}).get("content", "")
 
         if assistant_reply:
-            await tsunami_client.send_whatsapp(sender_phone, assistant_reply)
+            await send_text(sender_phone, assistant_reply, f"reply:{message_id}")
 
         return {"session_id": session_id, "reply": assistant_reply}
     except Exception:
         logger.exception("ServiceTsunami fallback failed for %s", sender_phone)
         # Send a helpful fallback message
-        await tsunami_client.send_whatsapp(
+        await send_text(
             sender_phone,
             "Hola, soy *Remedia*. Puedo ayudarte a:\n\n"
             "- *buscar [medicamento]* — buscar precios\n"
             "- *orden [id]* — ver estado de tu orden\n\n"
-            "O visita remedia.cl para comparar precios."
+            "O visita remedia.cl para comparar precios.",
+            f"reply:{message_id}",
         )
         return {"action": "fallback"}
@@ -0,0 +1,332 @@
+"""
+Postgres-backed queue for scraping and ETL jobs.
+
+The API (and the scheduler) only insert ``background_jobs`` rows; the worker
+process (``python -m app.worker``) claims them with ``FOR UPDATE SKIP
+LOCKED`` and runs them, so multi-hour crawls and imports never share the API
+server's event loop or connection pool.
+
+Claims are serialised with a transaction-level advisory lock so the
+per-job-type concurrency limits in ``JOB_TYPES`` hold across all workers.
+Each worker renews the lease of its running jobs on a heartbeat and picks up
+cancellation requests in the same statement. Scrape jobs link their
+``ScrapeRun`` (see ``attach_scrape_run``), which carries their progress.
+"""
+
+import asyncio
+import inspect
+import logging
+import socket
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.background_job import BackgroundJob, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key serialising claims (see module docstring)
+CLAIM_LOCK_KEY = 7_220_517_004
+
+_WORKER = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+
+_current_job: ContextVar[uuid.UUID | None] = ContextVar("current_job", default=None)
+
+
+# ── Job types ───────────────────────────────────────────────────────
+
+async def _scrape(chains: list[str] | None = None, query_limit: int = 200):
+    from app.tasks.scraping import run_scrape_with_session
+    return await run_scrape_with_session(chains, query_limit)
+
+
+async def _locations(chains: list[str] | None = None):
+    from app.tasks.scraping import run_location_scrape_with_session
+    return await run_location_scrape_with_session(chains)
+
+
+async def _catalog(chains: list[str] | None = None):
+    from app.tasks.scraping import run_catalog_scrape_with_session
+    return await run_catalog_scrape_with_session(chains)
+
+
+async def _cenabast_import(products_file: str | None = None, active_pmvp_file: str | None = None,
+                           invoices_file: str | None = None):
+    from app.etl import cenabast_import
+    await asyncio.to_thread(cenabast_import.import_all, products_file, active_pmvp_file, invoices_file)
+
+
+async def _cenabast_sync():
+    from app.etl import cenabast_to_marketplace
+    return await asyncio.to_thread(cenabast_to_marketplace.sync_all)
+
+
+async def _bms_import(file_path: str | None = None, rollups_only: bool = False):
+    from app.etl import bms_import
+    if rollups_only:
+        await asyncio.to_thread(bms_import.refresh_rollups_only)
+    else:
+        await asyncio.to_thread(bms_import.import_all, file_path)
+
+
+async def _geocode():
+    from app.etl.geocode_pharmacies import geocode_all
+    return await geocode_all()
+
+
+@dataclass(frozen=True)
+class JobType:
+    handler: Callable[..., Awaitable]
+    max_running: int = 1
+    # Thread-based imports cannot be interrupted once started
+    cancellable: bool = True
+
+
+JOB_TYPES: dict[str, JobType] = {
+    "scrape": JobType(_scrape, max_running=2),
+    "locations": JobType(_locations),
+    "catalog": JobType(_catalog),
+    "cenabast_import": JobType(_cenabast_import, cancellable=False),
+    "cenabast_sync": JobType(_cenabast_sync, cancellable=False),
+    "bms_import": JobType(_bms_import, cancellable=False),
+    "geocode": JobType(_geocode),
+}
+
+
+# ── Enqueue / cancel (API side) ─────────────────────────────────────
+
+def enqueue(db: Session, job_type: str, params: dict | None = None, dedupe: bool = False) -> BackgroundJob:
+    """Queue a job and commit. With ``dedupe``, return an already queued or
+    running job of the same type and parameters instead of adding another."""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    params = params or {}
+    try:
+        inspect.signature(JOB_TYPES[job_type].handler).bind(**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid params for {job_type}: {e}") from None
+    if dedupe:
+        existing = db.query(BackgroundJob).filter(
+            BackgroundJob.job_type == job_type,
+            BackgroundJob.status.in_([JobStatus.queued, JobStatus.running]),
+        ).order_by(BackgroundJob.created_at).all()
+        for job in existing:
+            if job.params == params:
+                return job
+    job = BackgroundJob(job_type=job_type, params=params, status=JobStatus.queued, attempts=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def request_cancel(db: Session, job_id) -> BackgroundJob | None:
+    """Cancel a queued job now, or ask the worker to stop a running one.
+
+    Raises ``ValueError`` for a running job whose type cannot be interrupted.
+    """
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).with_for_update().first()
+    if job is None:
+        return None
+    if job.status == JobStatus.queued:
+        job.status = JobStatus.cancelled
+        job.finished_at = datetime.now(timezone.utc)
+    elif job.status == JobStatus.running:
+        if not JOB_TYPES[job.job_type].cancellable:
+            db.rollback()
+            raise ValueError(f"{job.job_type} jobs cannot be cancelled once started")
+        job.cancel_requested = True
+    db.commit()
+    return job
+
+
+def attach_scrape_run(db: Session, scrape_run_id) -> None:
+    """Link the current job (if any) to its ScrapeRun, in the caller's transaction."""
+    job_id = _current_job.get()
+    if job_id is None:
+        return
+    db.execute(
+        text("UPDATE background_jobs SET scrape_run_id = :run_id WHERE id = :id"),
+        {"run_id": scrape_run_id, "id": job_id},
+    )
+
+
+# ── Worker ──────────────────────────────────────────────────────────
+
+_CLAIM_SQL = text("""
+    WITH limits AS (
+        SELECT * FROM unnest(CAST(:types AS text[]), CAST(:limits AS int[])) AS l(job_type, max_running)
+    ), running AS (
+        SELECT job_type, count(*) AS n
+        FROM background_jobs
+        WHERE status = 'running' AND lease_expires_at > now()
+        GROUP BY job_type
+    )
+    UPDATE background_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        worker = :worker,
+        lease_expires_at = now() + make_interval(secs => :lease),
+        started_at = now(),
+        updated_at = now()
+    WHERE j.id = (
+        SELECT q.id
+        FROM background_jobs q
+        JOIN limits l ON l.job_type = q.job_type
+        LEFT JOIN running r ON r.job_type = q.job_type
+        WHERE (
+            (q.status = 'queued' AND q.run_after <= now())
+            OR (q.status = 'running' AND q.lease_expires_at <= now() AND q.attempts < :max_attempts)
+        )
+        AND COALESCE(r.n, 0) < l.max_running
+        ORDER BY q.created_at
+        LIMIT 1
+        FOR UPDATE OF q SKIP LOCKED
+    )
+    RETURNING j.id, j.job_type, j.params, j.attempts
+""")
+
+# Jobs whose worker died on their last attempt
+_EXPIRE_SQL = text("""
+    UPDATE background_jobs
+    SET status = 'failed', error = 'Lease expired (worker lost)', finished_at = now(), updated_at = now()
+    WHERE status = 'running' AND lease_expires_at <= now() AND attempts >= :max_attempts
+""")
+
+_HEARTBEAT_SQL = text("""
+    UPDATE background_jobs
+    SET lease_expires_at = now() + make_interval(secs => :lease)
+    WHERE id = ANY(:ids) AND status = 'running'
+    RETURNING id, cancel_requested
+""")
+
+
+def _claim_one(db: Session):
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+    db.execute(_EXPIRE_SQL, {"max_attempts": settings.JOB_MAX_ATTEMPTS})
+    row = db.execute(_CLAIM_SQL, {
+        "types": list(JOB_TYPES),
+        "limits": [t.max_running for t in JOB_TYPES.values()],
+        "worker": _WORKER,
+        "lease": settings.JOB_LEASE_SECONDS,
+        "max_attempts": settings.JOB_MAX_ATTEMPTS,
+    }).first()
+    db.commit()
+    return row
+
+
+def _heartbeat(db: Session, job_ids: list) -> list:
+    """Renew leases; returns ids of jobs with a pending cancel request."""
+    rows = db.execute(_HEARTBEAT_SQL, {"ids": job_ids, "lease": settings.JOB_LEASE_SECONDS}).fetchall()
+    db.commit()
+    return [r.id for r in rows if r.cancel_requested]
+
+
+def _finish(db: Session, job_id, status: JobStatus, result=None, error: str | None = None) -> None:
+    job = db.get(BackgroundJob, job_id)
+    if job is None:
+        return
+    job.status = status
+    if status == JobStatus.queued:
+        # Interrupted by a worker shutdown; the attempt does not count
+        job.attempts = max(job.attempts - 1, 0)
+        job.finished_at = None
+    else:
+        job.finished_at = datetime.now(timezone.utc)
+    job.lease_expires_at = None
+    job.result = result if isinstance(result, dict) else None
+    job.error = error[:500] if error else None
+    db.commit()
+
+
+async def _execute(row, stop: asyncio.Event) -> None:
+    from app.core.database import SessionLocal
+
+    token = _current_job.set(row.id)
+    start = time.perf_counter()
+    try:
+        result = await JOB_TYPES[row.job_type].handler(**(row.params or {}))
+        outcome = (JobStatus.succeeded, result, None)
+    except asyncio.CancelledError:
+        # Shutdown puts the job back for another worker; otherwise a user cancelled it
+        outcome = (JobStatus.queued, None, None) if stop.is_set() else (JobStatus.cancelled, None, "Cancelled")
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", row.id, row.job_type)
+        outcome = (JobStatus.failed, None, str(e))
+    finally:
+        _current_job.reset(token)
+
+    db = SessionLocal()
+    try:
+        await asyncio.to_thread(_finish, db, row.id, *outcome)
+    finally:
+        db.close()
+    logger.info("Job %s (%s) %s in %.1fs", row.id, row.job_type, outcome[0].value, time.perf_counter() - start)
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Claim and run jobs (up to JOB_WORKER_SLOTS at once) until ``stop`` is set.
+
+    On stop, interruptible jobs are cancelled and requeued; thread-based
+    imports are left to finish (their leases kept alive) before returning.
+    """
+    from app.core.database import SessionLocal
+
+    running: dict[uuid.UUID, tuple[asyncio.Task, str]] = {}
+    last_heartbeat = 0.0
+    draining = False
+    logger.info("Job worker %s started", _WORKER)
+    db = SessionLocal()
+    try:
+        while running or not stop.is_set():
+            for job_id, (task, _) in list(running.items()):
+                if task.done():
+                    del running[job_id]
+
+            if stop.is_set() and not draining:
+                draining = True
+                for task, job_type in running.values():
+                    if JOB_TYPES[job_type].cancellable:
+                        task.cancel()
+
+            try:
+                while not stop.is_set() and len(running) < settings.JOB_WORKER_SLOTS:
+                    row = await asyncio.to_thread(_claim_one, db)
+                    if row is None:
+                        break
+                    logger.info("Job %s (%s) claimed, attempt %d", row.id, row.job_type, row.attempts)
+                    running[row.id] = (asyncio.create_task(_execute(row, stop)), row.job_type)
+
+                if running and time.monotonic() - last_heartbeat >= settings.JOB_HEARTBEAT_SECONDS:
+                    cancel_ids = await asyncio.to_thread(_heartbeat, db, list(running))
+                    last_heartbeat = time.monotonic()
+                    for job_id in cancel_ids:
+                        task, job_type = running[job_id]
+                        if JOB_TYPES[job_type].cancellable and not task.done():
+                            logger.info("Cancelling job %s (%s)", job_id, job_type)
+                            task.cancel()
+            except Exception:
+                db.rollback()
+                logger.exception("Job worker poll failed")
+
+            if running and stop.is_set():
+                await asyncio.wait([task for task, _ in running.values()], timeout=settings.JOB_POLL_SECONDS)
+            else:
+                await _wait(stop, settings.JOB_POLL_SECONDS)
+    finally:
+        db.close()
+    logger.info("Job worker %s stopped", _WORKER)
@@ -2,87 +2,63 @@
 import logging
 from datetime import datetime, timezone, timedelta
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from app.models.price_alert import PriceAlert
-from app.models.price import Price
-from app.models.medication import Medication
-from app.models.pharmacy import Pharmacy
-from app.models.user import User
+from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+# Active alerts out of cooldown whose cheapest in-stock offer meets the target
+_MATCHES_SQL = text("""
+    SELECT a.id, u.phone_number, m.name AS medication_name,
+           best.price, best.pharmacy_name
+    FROM price_alerts a
+    JOIN users u ON u.id = a.user_id
+    JOIN medications m ON m.id = a.medication_id
+    JOIN LATERAL (
+        SELECT p.price, ph.name AS pharmacy_name
+        FROM prices p
+        JOIN pharmacies ph ON ph.id = p.pharmacy_id
+        WHERE p.medication_id = a.medication_id AND p.in_stock AND p.price > 0
+        ORDER BY p.price
+        LIMIT 1
+    ) best ON true
+    WHERE a.is_active
+      AND (a.last_notified_at IS NULL OR a.last_notified_at < :cutoff)
+      AND best.price <= a.target_price
+""")
 
-async def check_price_alerts():
-    """Check all active price alerts and send WhatsApp notifications for matches."""
-    from app.core.database import SessionLocal
-    from app.services import whatsapp
-
-    db = SessionLocal()
-    try:
-        alerts = db.query(PriceAlert).filter(PriceAlert.is_active == True).all()
-        if not alerts:
-            logger.info("No active price alerts to check")
-            return
-
-        logger.info("Checking %d active price alerts...", len(alerts))
-        notified = 0
-        now = datetime.now(timezone.utc)
-        cooldown = timedelta(hours=24)
-
-        for alert in alerts:
-            # Skip if notified recently
-            if alert.last_notified_at and (now - alert.last_notified_at) < cooldown:
-                continue
 
-            # Find minimum price for this medication
-            best = (
-                db.query(Price, Pharmacy)
-                .join(Pharmacy, Price.pharmacy_id == Pharmacy.id)
-                .filter(
-                    Price.medication_id == alert.medication_id,
-                    Price.in_stock == True,
-                    Price.price > 0,
+async def check_price_alerts():
+    """Queue WhatsApp notifications for all matching price alerts (enqueue-only)."""
+    from app.core.database import AsyncSessionLocal
+    from app.services import outbound_queue, whatsapp
+
+    now = datetime.now(timezone.utc)
+    cooldown = timedelta(hours=24)
+
+    async with AsyncSessionLocal() as db:
+        try:
+            matches = (await db.execute(_MATCHES_SQL, {"cutoff": now - cooldown})).fetchall()
+            if not matches:
+                logger.info("Price alerts: no matches")
+                return
+
+            messages = [
+                outbound_queue.text_message(
+                    m.phone_number,
+                    whatsapp.price_alert_message(m.medication_name, m.pharmacy_name, m.price),
+                    idempotency_key=f"price_alert:{m.id}:{now.date()}",
                 )
-                .order_by(Price.price.asc())
-                .first()
+                for m in matches
+            ]
+            await db.run_sync(outbound_queue.enqueue_many, messages)
+            await db.execute(
+                text("UPDATE price_alerts SET last_notified_at = :now WHERE id = ANY(:ids)"),
+                {"now": now, "ids": [m.id for m in matches]},
             )
+            await db.commit()
+            outbound_queue.notify()
+            logger.info("Price alerts: queued %d notifications", len(messages))
 
-            if not best:
-                continue
-
-            price_record, pharmacy = best
-
-            if price_record.price <= alert.target_price:
-                # Get medication name and user phone
-                medication = db.query(Medication).filter(
-                    Medication.id == alert.medication_id
-                ).first()
-                user = db.query(User).filter(User.id == alert.user_id).first()
-
-                if not medication or not user:
-                    continue
-
-                try:
-                    await whatsapp.send_price_alert(
-                        user.phone_number,
-                        medication.name,
-                        pharmacy.name,
-                        price_record.price,
-                    )
-                    alert.last_notified_at = now
-                    notified += 1
-                except Exception:
-                    logger.exception(
-                        "Failed to send price alert for user %s, med %s",
-                        alert.user_id, alert.medication_id,
-                    )
-
-        db.commit()
-        logger.info("Price alerts: checked %d, notified %d", len(alerts), notified)
-
-    except Exception:
-        logger.exception("Price alert check failed")
-    finally:
-        db.close()
+        except Exception:
+            logger.exception("Price alert check failed")
+            raise
@@ -1,16 +1,61 @@
 """Scheduled tasks for automated scraping and maintenance."""
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 async def run_scheduled_scrape():
-    """Run daily catalog scrape for all chains. Called by APScheduler."""
-    from app.tasks.scraping import run_catalog_scrape_with_session
+    """Queue the daily catalog scrape for all chains. Called by the job scheduler.
 
-    logger.info("Starting scheduled catalog scrape...")
+    The crawl itself runs in the job queue worker, not in the scheduler.
+    """
+    from app.core.database import SessionLocal
+    from app.tasks import job_queue
+
+    db = SessionLocal()
+    try:
+        job = await asyncio.to_thread(job_queue.enqueue, db, "catalog", {"chains": None}, True)
+        logger.info("Scheduled catalog scrape queued as job %s", job.id)
+    finally:
+        db.close()
+
+
+async def compact_stat_counters():
+    """Fold trigger deltas into the dashboard counters."""
+    from app.core.database import SessionLocal
+    from app.services import stat_counters
+
+    db = SessionLocal()
+    try:
+        await asyncio.to_thread(stat_counters.compact, db)
+    finally:
+        db.close()
+
+
+async def refresh_funnel_rollups():
+    """Re-aggregate recent referral events into the daily funnel rollups."""
+    from app.core.database import SessionLocal
+    from app.services import funnel_rollups
+
+    db = SessionLocal()
+    try:
+        stats = await asyncio.to_thread(funnel_rollups.refresh, db)
+        logger.info("Funnel rollups refreshed: %s", stats)
+    finally:
+        db.close()
+
+
+async def run_adherence_sweeps():
+    """Mark missed refills, then queue reminders for refills due soon."""
+    from app.core.database import SessionLocal
+    from app.services.adherence_reminder_service import send_refill_reminders
+    from app.services.adherence_service import check_missed_refills
+
+    db = SessionLocal()
     try:
-        result = await run_catalog_scrape_with_session(chains=None)
-        logger.info("Scheduled scrape completed: %s", result)
-    except Exception:
-        logger.exception("Scheduled scrape failed")
+        missed = await asyncio.to_thread(check_missed_refills, db)
+        reminders = await send_refill_reminders(db)
+        logger.info("Adherence sweeps: %s, %s", missed, reminders)
+    finally:
+        db.close()
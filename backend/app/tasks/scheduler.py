@@ -0,0 +1,187 @@
+"""
+Scheduled jobs, run by exactly one process at a time.
+
+Every process that calls ``run_scheduler`` (normally only the worker,
+``python -m app.worker``) competes for a Postgres session-level advisory
+lock. The holder runs the APScheduler jobs; the others retry periodically
+and take over if the leader's connection goes away, which releases the
+lock. Each execution is recorded in ``job_runs`` with its timing and error.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.job_run import JobRun, JobRunStatus
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key for pg_try_advisory_lock
+LEADER_LOCK_KEY = 7_220_517_003
+
+_HOST = socket.gethostname()
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    name: str
+    func: Callable[[], Awaitable]
+    trigger: str
+    trigger_args: dict = field(default_factory=dict)
+
+
+def job_specs() -> list[JobSpec]:
+    from app.tasks.price_alerts import check_price_alerts
+    from app.tasks.scheduled import (
+        compact_stat_counters, refresh_funnel_rollups, run_adherence_sweeps, run_scheduled_scrape,
+    )
+
+    return [
+        JobSpec("price_alerts", check_price_alerts, "interval", {"hours": 6}),
+        JobSpec("daily_scrape", run_scheduled_scrape, "cron", {"hour": 3}),
+        JobSpec("adherence_sweeps", run_adherence_sweeps, "cron", {"hour": 9}),
+        JobSpec("stat_counters", compact_stat_counters, "interval", {"minutes": 10}),
+        JobSpec("funnel_rollups", refresh_funnel_rollups, "interval", {"minutes": 15}),
+    ]
+
+
+# ── Run history ─────────────────────────────────────────────────────
+
+def _record_start(name: str) -> uuid.UUID:
+    db = SessionLocal()
+    try:
+        run_id = uuid.uuid4()
+        db.add(JobRun(id=run_id, job_name=name, host=_HOST, started_at=datetime.now(timezone.utc)))
+        db.commit()
+        return run_id
+    finally:
+        db.close()
+
+
+def _record_finish(run_id: uuid.UUID, duration: float, error: Exception | None) -> None:
+    db = SessionLocal()
+    try:
+        run = db.get(JobRun, run_id)
+        if run is None:
+            return
+        run.status = JobRunStatus.failed if error else JobRunStatus.succeeded
+        run.finished_at = datetime.now(timezone.utc)
+        run.duration_ms = int(duration * 1000)
+        run.error = str(error)[:500] if error else None
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_job(spec: JobSpec) -> None:
+    """Run one job and record it in ``job_runs``."""
+    run_id = await asyncio.to_thread(_record_start, spec.name)
+    start = time.perf_counter()
+    error = None
+    try:
+        await spec.func()
+    except Exception as e:
+        logger.exception("Scheduled job %s failed", spec.name)
+        error = e
+    duration = time.perf_counter() - start
+    await asyncio.to_thread(_record_finish, run_id, duration, error)
+    logger.info("Scheduled job %s %s in %.1fs", spec.name, "failed" if error else "finished", duration)
+
+
+# ── Leader election ─────────────────────────────────────────────────
+
+class LeaderLock:
+    """Session-level advisory lock held on a dedicated connection."""
+
+    def __init__(self, key: int):
+        self.key = key
+        self._conn = None
+
+    def try_acquire(self) -> bool:
+        conn = engine.connect()
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def is_held(self) -> bool:
+        """Ping the lock's connection; a dead connection means the lock is gone."""
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            logger.warning("Scheduler leader connection lost", exc_info=True)
+            return False
+
+    def release(self) -> None:
+        # Discard the DBAPI connection instead of returning it to the pool, so
+        # the lock cannot outlive us on a pooled connection.
+        if self._conn is None:
+            return
+        try:
+            self._conn.invalidate()
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_scheduler(stop: asyncio.Event) -> None:
+    """Compete for leadership and run the scheduled jobs while leader."""
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    lock = LeaderLock(LEADER_LOCK_KEY)
+    interval = settings.SCHEDULER_LEADER_CHECK_SECONDS
+    while not stop.is_set():
+        try:
+            leader = await asyncio.to_thread(lock.try_acquire)
+        except Exception:
+            logger.warning("Scheduler leader election failed", exc_info=True)
+            leader = False
+        if not leader:
+            await _wait(stop, interval)
+            continue
+
+        scheduler = AsyncIOScheduler(job_defaults={
+            "coalesce": True, "max_instances": 1, "misfire_grace_time": 600,
+        })
+        specs = job_specs()
+        for spec in specs:
+            scheduler.add_job(run_job, spec.trigger, args=[spec], id=spec.name, **spec.trigger_args)
+        scheduler.start()
+        logger.info("Scheduler leader on %s: %s", _HOST, ", ".join(s.name for s in specs))
+        try:
+            while not stop.is_set() and await asyncio.to_thread(lock.is_held):
+                await _wait(stop, interval)
+        finally:
+            # Jobs already running finish on their own; no new ones start here
+            scheduler.shutdown(wait=False)
+            await asyncio.to_thread(lock.release)
+        if not stop.is_set():
+            logger.warning("Scheduler gave up leadership; retrying in %ss", interval)
@@ -1,4 +1,5 @@
 """Pharmacy chain price scraping orchestration."""
+import asyncio
 import logging
 from datetime import datetime, timezone
 
@@ -11,6 +12,8 @@ from app.scrapers.ahumada import AhumadaScraper
 from app.scrapers.query_builder import build_search_queries
 from app.etl.scrape_to_marketplace import upsert_scraped_products
 from app.models.scrape_run import ScrapeRun
+from app.core.metrics import etl_stage
+from app.tasks.job_queue import attach_scrape_run
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,17 @@ SCRAPERS = {
 }
 
 
+async def _to_thread_uninterrupted(func, *args, **kwargs):
+    """``asyncio.to_thread`` that lets the thread finish before a cancellation
+    propagates, so the session it uses is never touched concurrently."""
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await task
+        raise
+
+
 async def run_scrape_with_session(chains: list[str] | None = None, query_limit: int = 200):
     """Entry point for background tasks — creates its own DB session."""
     from app.core.database import SessionLocal
@@ -41,7 +55,7 @@ async def run_scrape(db: Session, chains: list[str] | None = None, query_limit:
     4. Record ScrapeRun for monitoring
     """
     chains = chains or list(SCRAPERS.keys())
-    queries = build_search_queries(db, limit=query_limit)
+    queries = await _to_thread_uninterrupted(build_search_queries, db, limit=query_limit)
 
     run = ScrapeRun(
         chain=",".join(chains),
@@ -49,6 +63,8 @@ async def run_scrape(db: Session, chains: list[str] | None = None, query_limit:
         queries_total=len(queries) * len(chains),
     )
     db.add(run)
+    db.flush()
+    attach_scrape_run(db, run.id)
     db.commit()
 
     total_products = []
@@ -63,7 +79,9 @@ async def run_scrape(db: Session, chains: list[str] | None = None, query_limit:
             scraper = SCRAPERS[chain]()
             logger.info("Scraping %s with %d queries...", chain, len(queries))
 
-            products = await scraper.search_batch(queries)
+            with etl_stage("scrape", f"fetch_{chain}") as stage:
+                products = await scraper.search_batch(queries)
+                stage["rows"] = len(products)
             total_products.extend(products)
             total_errors.extend(scraper.errors)
 
@@ -73,7 +91,9 @@ async def run_scrape(db: Session, chains: list[str] | None = None, query_limit:
 
         # ETL: normalize into marketplace
         logger.info("Upserting %d products into marketplace...", len(total_products))
-        stats = upsert_scraped_products(db, total_products)
+        with etl_stage("scrape", "upsert") as stage:
+            stats = await _to_thread_uninterrupted(upsert_scraped_products, db, total_products)
+            stage["rows"] = stats["prices_upserted"]
 
         run.status = "completed"
         run.prices_upserted = stats["prices_upserted"]
@@ -91,6 +111,14 @@ async def run_scrape(db: Session, chains: list[str] | None = None, query_limit:
             "errors": len(total_errors),
         }
 
+    except asyncio.CancelledError:
+        run.status = "cancelled"
+        run.errors = total_errors[:100]
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.warning("Scrape cancelled")
+        raise
+
     except Exception as e:
         run.status = "failed"
         run.errors = total_errors[:99] + [str(e)]
@@ -136,6 +164,7 @@ async def run_location_scrape(db: Session, chains: list[str] | None = None):
     3. Record ScrapeRun for monitoring
     """
     from app.etl.locations_to_marketplace import upsert_scraped_locations
+    from app.services import demand_grid
 
     chains = chains or list(LOCATION_SCRAPERS.keys())
 
@@ -145,6 +174,8 @@ async def run_location_scrape(db: Session, chains: list[str] | None = None):
         run_type="locations",
     )
     db.add(run)
+    db.flush()
+    attach_scrape_run(db, run.id)
     db.commit()
 
     total_locations = []
@@ -160,7 +191,9 @@ async def run_location_scrape(db: Session, chains: list[str] | None = None):
             scraper = scraper_cls()
             logger.info("Scraping %s locations...", chain)
 
-            locations = await scraper.scrape_locations()
+            with etl_stage("locations", f"fetch_{chain}") as stage:
+                locations = await scraper.scrape_locations()
+                stage["rows"] = len(locations)
             total_locations.extend(locations)
             total_errors.extend(scraper.errors)
 
@@ -168,10 +201,17 @@ async def run_location_scrape(db: Session, chains: list[str] | None = None):
             db.commit()
 
         logger.info("Upserting %d locations into marketplace...", len(total_locations))
-        stats = upsert_scraped_locations(db, total_locations)
+        with etl_stage("locations", "upsert") as stage:
+            stats = await _to_thread_uninterrupted(upsert_scraped_locations, db, total_locations)
+            stage["rows"] = len(total_locations)
+
+        changed = stats.pop("changed_pharmacy_ids")
+        if stats.pop("moved_pharmacy_ids"):
+            # Only new or relocated pharmacies shift the comuna heatmap points
+            demand_grid.drop_comuna_tiles(db)
 
         run.status = "completed"
-        run.prices_upserted = stats["pharmacies_created"] + stats["pharmacies_updated"]
+        run.prices_upserted = len(changed)
         run.pharmacies_created = stats["pharmacies_created"]
         run.errors = total_errors[:100]
         run.finished_at = datetime.now(timezone.utc)
@@ -185,6 +225,14 @@ async def run_location_scrape(db: Session, chains: list[str] | None = None):
             "errors": len(total_errors),
         }
 
+    except asyncio.CancelledError:
+        run.status = "cancelled"
+        run.errors = total_errors[:100]
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.warning("Location scrape cancelled")
+        raise
+
     except Exception as e:
         run.status = "failed"
         run.errors = total_errors[:99] + [str(e)]
@@ -222,6 +270,8 @@ async def run_catalog_scrape(db: Session, chains: list[str] | None = None):
         run_type="catalog",
     )
     db.add(run)
+    db.flush()
+    attach_scrape_run(db, run.id)
     db.commit()
 
     total_products = []
@@ -237,7 +287,9 @@ async def run_catalog_scrape(db: Session, chains: list[str] | None = None):
             logger.info("Browsing %s catalog...", chain)
 
             try:
-                products = await scraper.browse_catalog()
+                with etl_stage("catalog", f"fetch_{chain}") as stage:
+                    products = await scraper.browse_catalog()
+                    stage["rows"] = len(products)
             except NotImplementedError:
                 logger.warning("%s does not support catalog browsing, skipping", chain)
                 continue
@@ -250,7 +302,9 @@ async def run_catalog_scrape(db: Session, chains: list[str] | None = None):
 
         # ETL: normalize into marketplace
         logger.info("Upserting %d catalog products into marketplace...", len(total_products))
-        stats = upsert_scraped_products(db, total_products)
+        with etl_stage("catalog", "upsert") as stage:
+            stats = await _to_thread_uninterrupted(upsert_scraped_products, db, total_products)
+            stage["rows"] = stats["prices_upserted"]
 
         run.status = "completed"
         run.prices_upserted = stats["prices_upserted"]
@@ -268,6 +322,14 @@ async def run_catalog_scrape(db: Session, chains: list[str] | None = None):
             "errors": len(total_errors),
         }
 
+    except asyncio.CancelledError:
+        run.status = "cancelled"
+        run.errors = total_errors[:100]
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.warning("Catalog scrape cancelled")
+        raise
+
     except Exception as e:
         run.status = "failed"
         run.errors = total_errors[:99] + [str(e)]
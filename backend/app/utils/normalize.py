@@ -0,0 +1,118 @@
+"""
+Shared normalization for Cenabast product names and scraper queries.
+
+The same product names recur across the product catalog, ~680K invoice
+rows and every scrape, so patterns are compiled once and parse results are
+memoized. Pharmaceutical forms are matched with a single alternation pass
+instead of one substring scan per ``FORMS_MAP`` entry.
+
+Benchmark against the uncompiled implementation with
+``python -m app.scripts.benchmark_normalize``.
+"""
+
+import re
+from functools import lru_cache
+
+# Common pharmaceutical forms in Spanish, in matching priority order
+FORMS_MAP = {
+    "CM REC": "comprimido recubierto",
+    "CM": "comprimido",
+    "CP": "cápsula",
+    "CAP": "cápsula",
+    "SOL INY": "solución inyectable",
+    "S.INY": "solución inyectable",
+    "P. LIOF": "polvo liofilizado",
+    "SOL. INY": "solución inyectable",
+    "SOL ORAL": "solución oral",
+    "SUSP": "suspensión",
+    "UNG": "ungüento",
+    "CMA": "crema",
+    "GEL": "gel",
+    "JBE": "jarabe",
+    "GOT": "gotas",
+    "INH": "inhalador",
+    "PARCHE": "parche",
+    "SUP": "supositorio",
+    "AMP": "ampolla",
+    "FAM": "frasco ampolla",
+    "FRA": "frasco",
+    "DISP": "dispositivo",
+    "CGE": "cartucho",
+    "TU": "tubo",
+}
+
+PARSE_CACHE_SIZE = 65536
+
+_DOSAGE_RE = re.compile(
+    r'(\d+[\.,]?\d*)\s*(MG|MCG|G|ML|UI|UG)(?:/(\d+[\.,]?\d*)\s*(ML|MG|G))?',
+    re.IGNORECASE,
+)
+_DRUG_NAME_RE = re.compile(r'^([A-Za-zÁÉÍÓÚÑáéíóúñ\s\-\.]+)')
+
+# Zero-width lookahead so every position reports its highest-priority key,
+# including keys that overlap (e.g. "CM REC" / "CM" / "CMA")
+_FORM_KEYS = list(FORMS_MAP)
+_FORM_PRIORITY = {key: i for i, key in enumerate(_FORM_KEYS)}
+_FORMS_RE = re.compile("(?=(" + "|".join(re.escape(key) for key in _FORM_KEYS) + "))")
+
+_NUMERIC_PREFIX_RE = re.compile(r"^[\d.]+[-]")
+_PARENTHETICAL_RE = re.compile(r"\s*\(.*?\)\s*")
+_DOSAGE_SUFFIX_RE = re.compile(r"\s+\d+[\.,]?\d*\s*(%|mg|ml|mcg|ui|g(?!\w)).*", re.IGNORECASE)
+
+
+def match_form(name: str) -> str | None:
+    """The ``FORMS_MAP`` form whose key appears in ``name`` with the highest priority."""
+    best = None
+    for m in _FORMS_RE.finditer(name.upper()):
+        priority = _FORM_PRIORITY[m.group(1)]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+    return FORMS_MAP[_FORM_KEYS[best]] if best is not None else None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_product_name(name):
+    """Parse a Cenabast product name into medication components.
+
+    Examples:
+        "JARDIANCE 25 MG CAJ 30 CM REC" → ("Jardiance", "25mg", "comprimido recubierto")
+        "OMNITROPE 10 MG/1,5 ML SOL INY CGE 30 UI" → ("Omnitrope", "10mg/1.5ml", "solución inyectable")
+    """
+    if not name:
+        return None, None, None
+
+    # Extract dosage pattern (e.g., "25 MG", "10 MG/1,5 ML", "100 MCG")
+    dosage_match = _DOSAGE_RE.search(name)
+    dosage = None
+    if dosage_match:
+        amt = dosage_match.group(1).replace(",", ".")
+        unit = dosage_match.group(2).lower()
+        dosage = f"{amt}{unit}"
+        if dosage_match.group(3):
+            amt2 = dosage_match.group(3).replace(",", ".")
+            unit2 = dosage_match.group(4).lower()
+            dosage += f"/{amt2}{unit2}"
+
+    # Extract drug name (everything before the first number)
+    name_match = _DRUG_NAME_RE.match(name)
+    drug_name = name_match.group(1).strip().title() if name_match else name.split()[0].title()
+
+    return drug_name, dosage, match_form(name)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def clean_ingredient(raw: str) -> str:
+    """Clean Cenabast-style ingredient names for pharmacy search.
+
+    Strips numeric prefixes like '1-' or '1.1-', removes dosage info,
+    and normalizes whitespace.
+    """
+    # Remove leading numeric prefix (e.g., "1-aciclovir", "1.1-escitalopram")
+    cleaned = _NUMERIC_PREFIX_RE.sub("", raw.strip())
+    # Remove parenthetical suffixes (e.g., "paracetamol (como sodio)")
+    cleaned = _PARENTHETICAL_RE.sub(" ", cleaned)
+    # Remove dosage/form info (anything after %, mg, ml, etc.)
+    cleaned = _DOSAGE_SUFFIX_RE.sub("", cleaned)
+    return cleaned.strip()
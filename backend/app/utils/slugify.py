@@ -1,15 +1,21 @@
 import re
 import unicodedata
+from functools import lru_cache
 
+_NON_SLUG_RE = re.compile(r"[^a-z0-9\s-]")
+_SEPARATOR_RE = re.compile(r"[\s_]+")
+_DASHES_RE = re.compile(r"-+")
 
+
+@lru_cache(maxsize=65536)
 def slugify(text: str) -> str:
     """Convert text to URL-safe slug. Handles Spanish characters."""
     text = unicodedata.normalize("NFKD", text)
     text = text.encode("ascii", "ignore").decode("ascii")
     text = text.lower().strip()
-    text = re.sub(r"[^a-z0-9\s-]", "", text)
-    text = re.sub(r"[\s_]+", "-", text)
-    text = re.sub(r"-+", "-", text)
+    text = _NON_SLUG_RE.sub("", text)
+    text = _SEPARATOR_RE.sub("-", text)
+    text = _DASHES_RE.sub("-", text)
     return text.strip("-")
 
 
@@ -0,0 +1,37 @@
+"""
+Background worker process: runs scheduled jobs and the scrape/ETL job queue
+outside the API server.
+
+Any number of workers can run; Postgres advisory-lock leader election makes
+sure each scheduled job fires once (app.tasks.scheduler), and queued jobs are
+claimed with SKIP LOCKED under per-type concurrency limits
+(app.tasks.job_queue).
+
+Usage:
+    python -m app.worker
+"""
+
+import asyncio
+import logging
+import signal
+
+from app.tasks import job_queue
+from app.tasks.scheduler import run_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Worker started")
+    await asyncio.gather(run_scheduler(stop), job_queue.run_worker(stop))
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
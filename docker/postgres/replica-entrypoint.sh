@@ -0,0 +1,17 @@
+#!/bin/bash
+# Streaming standby of the db service. On first start the data directory is
+# cloned from the primary with pg_basebackup; -R writes standby.signal and
+# primary_conninfo, so the server starts read-only and follows the primary.
+set -euo pipefail
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_isready -h "$PRIMARY_HOST" -U "$PRIMARY_USER" -q; do
+        echo "Waiting for primary $PRIMARY_HOST ..."
+        sleep 2
+    done
+    PGPASSWORD="$PRIMARY_PASSWORD" pg_basebackup \
+        -h "$PRIMARY_HOST" -U "$PRIMARY_USER" -D "$PGDATA" -R -X stream -P
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres